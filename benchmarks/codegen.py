@@ -0,0 +1,313 @@
+# codegen.py
+# ----------
+# Generates a checker specialized to the locked Achievements: their
+# declared conditions (node_types, tier thresholds and tree patterns)
+# are compiled into a single traversal function with inlined type
+# checks, counters and flags, instead of NodeVisitor dispatch, a full
+# node table and a method call per Achievement per round. Checkers are
+# cached per catalog and store state.
+#
+# The checker is compared against the Visitor by the benchmarks (see
+# run.py); it isn't used when processing scripts, so it doesn't
+# record check statistics or skip quarantined Achievements.
+
+import ast
+import functools
+
+from dev_achievements.achievements import Achievement, TieredAchievement
+from dev_achievements.processing.patterns import NodeTable, compile_pattern
+from dev_achievements.processing.visitor import build_table
+
+
+class _Builder:
+    """ Accumulates the generated code: per node class statements, and
+    the setup, per node and return parts of the traversal function.
+    """
+    def __init__(self):
+        self.names = {}
+        self.counts = set()
+        self.setup = []
+        self.per_node = []
+        self.after_node = []
+        self.contexts = []
+        self.by_class = {}
+        self.results = []
+        self.deferred = []
+
+    def name(self, obj, prefix):
+        """ Binds an object into the generated code's namespace """
+        for name, value in self.names.items():
+            if value is obj:
+                return name
+        name = f'{prefix}{len(self.names)}'
+        self.names[name] = obj
+        return name
+
+    def on_class(self, node_class, line):
+        """ Adds a statement run on every node of the class """
+        self.by_class.setdefault(node_class, []).append(line)
+        return
+
+    def source(self):
+        """ Gives the source of the traversal function """
+        ctx = ''.join(f', {d}, {e}' for d, e in self.contexts)
+        lines = ['def check(tree):']
+        lines += [f'    {line}' for line in self.setup]
+        lines.append(f'    stack = [(tree{", 0, 0" * len(self.contexts)})]'
+                     if self.contexts else '    stack = [tree]')
+        lines += ['    pop = stack.pop', '    push = stack.append',
+                  '    while stack:']
+        lines.append(f'        (node{ctx}) = pop()' if ctx
+                     else '        node = pop()')
+        lines.append('        cls = node.__class__')
+        lines += [f'        {line}' for line in self.per_node]
+        keyword = 'if'
+        for node_class, body in self.by_class.items():
+            lines.append(f'        {keyword} cls is {self.name(node_class, "T")}:')
+            lines += [f'            {line}' for line in body]
+            keyword = 'elif'
+        lines += [f'        {line}' for line in self.after_node]
+        lines.append('        for child in iter_child_nodes(node):')
+        if self.contexts:
+            child_ctx = ''.join(f', c{d}, c{e}' for d, e in self.contexts)
+            lines.append(f'            push((child{child_ctx}))')
+        else:
+            lines.append('            push(child)')
+        lines.append('    return {')
+        lines += [f'        {name!r}: {expr},' for name, expr in self.results]
+        lines.append('    }, {')
+        lines += [f'        {i}: {expr},' for i, expr in self.deferred]
+        lines.append('    }')
+        return '\n'.join(lines) + '\n'
+
+
+class Checker:
+    """ Checker specialized to a set of locked Achievements, created by
+    compile_checker.
+
+    Attributes:
+        achievements (tuple[type]): locked Achievements checked
+        source (str): generated source of the traversal function
+    """
+    def __init__(self, achievements, source, namespace, fallbacks, deferred):
+        self.achievements = achievements
+        self.source = source
+        self._check = namespace['check']
+        self._fallbacks = fallbacks
+        self._deferred = deferred
+
+    def __call__(self, tree, table=None):
+        """ Evaluates the declared conditions of the Achievements.
+
+        Args:
+            tree (ast.AST): AST syntax tree
+            table (NodeTable, optional): node table of the tree, for
+                patterns the traversal can't evaluate (built if needed)
+
+        Returns:
+            dict: whether each declared condition holds, by Achievement
+                name (custom conditions aren't included)
+        """
+        results, collected = self._check(tree)
+        for i, (ach, step, keys) in enumerate(self._deferred):
+            candidates, values = collected[i]
+            joined = NodeTable()
+            joined.values.update(zip(keys, values))
+            results[ach.__name__] = any(step.match(n, joined)
+                                        for n in candidates)
+        for ach in self._fallbacks:
+            if table is None:
+                table = build_table(tree)
+            results[ach.__name__] = compile_pattern(ach.pattern).exists(table)
+        return results
+
+    def unlocks(self, tree, unlocked=(), project=None):
+        """ Gives the Achievements the tree unlocks, in the same order
+        as AchievementTree.check (rounds over the frontier until nothing
+        more unlocks). Custom conditions are checked as they reach the
+        frontier, on a node table built only if one needs it.
+
+        Args:
+            tree (ast.AST): AST syntax tree
+            unlocked (iterable[str]): names of unlocked Achievements
+            project (Project, optional): import graph, for cross-file
+                Achievements
+
+        Returns:
+            list[type]: newly unlocked Achievement classes
+        """
+        results = self(tree)
+        unlocked = set(unlocked)
+        tables = {}
+        new = []
+        changed = True
+        while changed:
+            queue = [a for a in self.achievements
+                     if a.__name__ not in unlocked
+                     and all(d.__name__ in unlocked for d in a.dependencies)]
+            met = [a for a in queue
+                   if self._met(a, results, tree, project, tables)]
+            unlocked.update(a.__name__ for a in met)
+            new += met
+            changed = bool(met)
+        return new
+
+    def _met(self, ach, results, tree, project, tables):
+        """ Whether the Achievement's (declared or custom) condition holds """
+        if ach.__name__ in results:
+            return results[ach.__name__]
+        key = ach.needs_nodes
+        if key not in tables:
+            tables[key] = build_table(tree) if key else NodeTable()
+            tables[key].project = project
+        return bool(ach()._check_condition(tables[key]))
+
+
+def _add_presence(builder, ach):
+    """ Generates a flag set on any node of the Achievement's types """
+    flag = f'f_{ach.__name__}'
+    builder.setup.append(f'{flag} = False')
+    for node_class in ach.node_types:
+        builder.on_class(node_class, f'{flag} = True')
+    builder.results.append((ach.__name__, flag))
+    return
+
+
+def _add_tier(builder, ach, counters):
+    """ Generates counters of the Achievement's types, compared to its
+    threshold less the stored totals
+    """
+    counts = []
+    for node_class in ach.node_types:
+        count = f'n_{node_class.__name__}'
+        if count not in builder.counts:
+            builder.counts.add(count)
+            builder.setup.append(f'{count} = 0')
+            builder.on_class(node_class, f'{count} += 1')
+        counts.append(count)
+    stored = sum(counters.get(t.__name__, 0) for t in ach.node_types)
+    builder.results.append(
+        (ach.__name__, f'{" + ".join(counts)} >= {ach.threshold - stored}'))
+    return
+
+
+def _add_single_step(builder, ach, query, deferred):
+    """ Generates a flag for a single step pattern, or collects its
+    candidates (and joined values) to match after the traversal
+    """
+    step = query.steps[0]
+    match = builder.name(step.match, 'M')
+    if not query.joins:
+        flag = f'f_{ach.__name__}'
+        builder.setup.append(f'{flag} = False')
+        for node_class in step.types:
+            builder.on_class(node_class,
+                             f'if not {flag} and {match}(node, None):')
+            builder.on_class(node_class, f'    {flag} = True')
+        builder.results.append((ach.__name__, flag))
+        return
+    i = len(deferred)
+    keys = sorted(query.joins, key=lambda k: (k[0].__name__, k[1]))
+    candidates = f'c{i}'
+    builder.setup.append(f'{candidates} = []')
+    for node_class in step.types:
+        builder.on_class(node_class, f'{candidates}.append(node)')
+    values = []
+    for j, (node_class, field) in enumerate(keys):
+        name = f'v{i}_{j}'
+        builder.setup.append(f'{name} = set()')
+        builder.on_class(node_class, f'{name}.add(node.{field})')
+        values.append(name)
+    builder.deferred.append((i, f'({candidates}, [{", ".join(values)}])'))
+    deferred.append((ach, step, keys))
+    return
+
+
+def _add_multi_step(builder, ach, query):
+    """ Generates the pattern as bit masks of matched steps, passed down
+    the traversal: d holds steps matched by any ancestor (followed by
+    '>>'), e those matched by the parent (followed by '>')
+    """
+    i = len(builder.contexts)
+    d, e, done = f'd{i}', f'e{i}', f'm{i}'
+    builder.contexts.append((d, e))
+    flag = f'f_{ach.__name__}'
+    builder.setup.append(f'{flag} = False')
+    builder.per_node.append(f'{done} = 0')
+    deep = direct = 0
+    last = len(query.steps) - 1
+    for j, step in enumerate(query.steps):
+        conds = []
+        if j:
+            ctx = d if query.relations[j - 1] == '>>' else e
+            conds.append(f'{ctx} & {1 << (j - 1)}')
+        if step.constraints:
+            conds.append(f'{builder.name(step.match, "M")}(node, None)')
+        if j < last:
+            if query.relations[j] == '>>':
+                deep |= 1 << j
+            else:
+                direct |= 1 << j
+        set_bit = f'{done} |= {1 << j}' if j < last else f'{flag} = True'
+        for node_class in step.types:
+            if conds:
+                builder.on_class(node_class, f'if {" and ".join(conds)}:')
+                builder.on_class(node_class, f'    {set_bit}')
+            else:
+                builder.on_class(node_class, set_bit)
+    builder.after_node.append(f'c{d} = {d} | ({done} & {deep})')
+    builder.after_node.append(f'c{e} = {done} & {direct}' if direct
+                              else f'c{e} = 0')
+    builder.results.append((ach.__name__, flag))
+    return
+
+
+@functools.lru_cache(maxsize=32)
+def _compile(achievements, stored):
+    """ Generates and compiles the checker of the given locked
+    Achievements and stored counters.
+    """
+    builder = _Builder()
+    counters = dict(stored)
+    fallbacks = []
+    deferred = []
+    for ach in achievements:
+        if issubclass(ach, TieredAchievement):
+            _add_tier(builder, ach, counters)
+        elif ach.is_presence():
+            _add_presence(builder, ach)
+        elif ach.pattern is not None:
+            query = compile_pattern(ach.pattern)
+            if len(query.steps) == 1:
+                _add_single_step(builder, ach, query, deferred)
+            elif not query.joins:
+                _add_multi_step(builder, ach, query)
+            else:
+                fallbacks.append(ach)
+    source = builder.source()
+    namespace = dict(builder.names, iter_child_nodes=ast.iter_child_nodes)
+    exec(compile(source, '<dev_achievements checker>', 'exec'), namespace)
+    return Checker(achievements, source, namespace, fallbacks, deferred)
+
+
+def compile_checker(unlocked=(), counters=None):
+    """ Gives the (cached) checker specialized to the Achievements still
+    locked, for the given store state.
+
+    Args:
+        unlocked (iterable[str]): names of unlocked Achievements
+        counters (dict, optional): stored node counters, for tiered
+            Achievements
+
+    Returns:
+        Checker: specialized checker
+    """
+    unlocked = set(unlocked)
+    counters = counters or {}
+    achievements = tuple(a for a in Achievement.subclasses()
+                         if a.__name__ not in unlocked)
+    stored = tuple(sorted({
+        (t.__name__, counters.get(t.__name__, 0))
+        for a in achievements if issubclass(a, TieredAchievement)
+        for t in a.node_types}))
+    return _compile(achievements, stored)
@@ -0,0 +1,202 @@
+# generator.py
+# ------------
+# Deterministic generator of synthetic (but realistic looking)
+# Python sources, used as benchmark inputs.
+
+import random
+
+
+# comprehension templates, picked by the comprehension mix
+_COMPREHENSIONS = [
+    '[{v} * 2 for {v} in range({n})]',
+    '{{{v} % 7 for {v} in range({n})}}',
+    '{{{v}: {v} ** 2 for {v} in range({n}) if {v} % 2}}',
+    'sum({v} for {v} in range({n}))',
+]
+
+# simple expressions using math and bitwise operators
+_EXPRESSIONS = [
+    '{a} + {b}',
+    '{a} - {b} * 3',
+    '({a} << 2) ^ {b}',
+    '{a} // ({b} or 1)',
+    '{a} % 5 | {b} & 3',
+    '-{a} if {a} > {b} else {b}',
+]
+
+
+class SourceGenerator:
+    """ Generates Python source with a given number of lines.
+
+    The same seed and parameters always produce the same source, so
+    benchmark results are comparable across runs.
+
+    Attributes:
+        rng (random.Random): seeded random generator
+        max_depth (int): maximum block nesting depth
+        call_density (float): chance a statement calls a function
+        comprehension_ratio (float): chance a statement is a comprehension
+
+    Args:
+        seed (int): random seed
+        max_depth (int): maximum block nesting depth
+        call_density (float): chance (0 - 1) a statement is a call
+        comprehension_ratio (float): chance (0 - 1) a statement is
+            a comprehension
+    """
+    def __init__(self, seed=0, max_depth=3, call_density=0.3,
+                 comprehension_ratio=0.2):
+        self.rng = random.Random(seed)
+        self.max_depth = max_depth
+        self.call_density = call_density
+        self.comprehension_ratio = comprehension_ratio
+        self._lines = []
+        self._functions = []
+        self._classes = []
+        self._uid = 0
+
+    def _name(self, prefix):
+        """ Gives a new unique identifier with the given prefix """
+        self._uid += 1
+        return f'{prefix}_{self._uid}'
+
+    def _emit(self, depth, line):
+        """ Adds a line of source at the given indentation depth """
+        self._lines.append('    ' * depth + line)
+        return
+
+    def _expression(self, a, b):
+        """ Gives a random operator expression over two names """
+        return self.rng.choice(_EXPRESSIONS).format(a=a, b=b)
+
+    def _statement(self, depth, local):
+        """ Emits a single (possibly compound) statement.
+
+        Args:
+            depth (int): current indentation depth
+            local (str): name of a local variable in scope
+        """
+        rng = self.rng
+        roll = rng.random()
+        if roll < self.call_density and self._functions:
+            fn = rng.choice(self._functions)
+            self._emit(depth, f'{local} = {fn}({local}, {rng.randint(0, 9)})')
+        elif roll < self.call_density + self.comprehension_ratio:
+            comp = rng.choice(_COMPREHENSIONS)
+            comp = comp.format(v=self._name('i'), n=rng.randint(2, 50))
+            self._emit(depth, f'{self._name("c")} = {comp}')
+        elif depth < self.max_depth and roll < 0.85:
+            self._block(depth, local)
+        else:
+            expr = self._expression(local, rng.randint(1, 100))
+            self._emit(depth, f'{local} = {expr}')
+        return
+
+    def _block(self, depth, local):
+        """ Emits a compound statement with a nested body.
+
+        Args:
+            depth (int): current indentation depth
+            local (str): name of a local variable in scope
+        """
+        rng = self.rng
+        kind = rng.choice(['if', 'for', 'while', 'try'])
+        if kind == 'if':
+            self._emit(depth, f'if {local} > {rng.randint(0, 100)}:')
+            self._body(depth + 1, local)
+            self._emit(depth, 'else:')
+            self._body(depth + 1, local)
+        elif kind == 'for':
+            var = self._name('k')
+            self._emit(depth, f'for {var} in range({rng.randint(1, 20)}):')
+            self._emit(depth + 1, f'{local} += {var}')
+            self._body(depth + 1, local)
+        elif kind == 'while':
+            self._emit(depth, f'while {local} > {rng.randint(100, 1000)}:')
+            self._emit(depth + 1, f'{local} //= 2')
+            self._body(depth + 1, local)
+        else:
+            self._emit(depth, 'try:')
+            self._body(depth + 1, local)
+            self._emit(depth, 'except ZeroDivisionError:')
+            self._emit(depth + 1, 'pass')
+        return
+
+    def _body(self, depth, local, size=None):
+        """ Emits a block body of a few statements """
+        size = size or self.rng.randint(1, 3)
+        for _ in range(size):
+            self._statement(depth, local)
+        return
+
+    def _function(self, depth=0):
+        """ Emits a function definition """
+        name = self._name('func')
+        self._emit(depth, f'def {name}(x, y=1):')
+        self._emit(depth + 1, f'"""Generated function {name}."""')
+        self._body(depth + 1, 'x', size=self.rng.randint(2, 6))
+        self._emit(depth + 1, 'return x')
+        self._emit(depth, '')
+        return name
+
+    def _class(self):
+        """ Emits a class definition with a few methods """
+        name = self._name('Class').title().replace('_', '')
+        self._emit(0, f'class {name}:')
+        self._emit(1, 'def __init__(self, value=0):')
+        self._emit(2, 'self.value = value')
+        self._emit(2, f'self.items = [value, {{"value": value}}]')
+        self._emit(1, '')
+        for _ in range(self.rng.randint(1, 3)):
+            self._function(depth=1)
+        self._classes.append(name)
+        return name
+
+    def _module_statement(self):
+        """ Emits a top level statement """
+        rng = self.rng
+        roll = rng.random()
+        if roll < 0.45:
+            self._functions.append(self._function())
+        elif roll < 0.6:
+            self._class()
+        elif roll < 0.7 and self._classes:
+            cls = rng.choice(self._classes)
+            self._emit(0, f'{self._name("obj")} = {cls}({rng.randint(0, 9)})')
+        elif roll < 0.75:
+            self._emit(0, f'print("hello world", {rng.randint(0, 9)})')
+        elif roll < 0.8:
+            self._emit(0, f'{self._name("f")} = lambda v: v * 2 + 1')
+        else:
+            local = self._name('v')
+            self._emit(0, f'{local} = {rng.randint(0, 1000)}')
+            self._body(0, local)
+        return
+
+    def generate(self, lines):
+        """ Generates source with (at least) the given number of lines.
+
+        Args:
+            lines (int): number of lines to generate
+
+        Returns:
+            str: generated source code
+        """
+        self._lines = ['# generated benchmark source', 'import os', '']
+        while len(self._lines) < lines:
+            self._module_statement()
+        return '\n'.join(self._lines) + '\n'
+
+
+def generate_source(lines, seed=0, **kwargs):
+    """ Shortcut to generate source with a new SourceGenerator.
+
+    Args:
+        lines (int): number of lines to generate
+        seed (int): random seed
+        **kwargs: extra SourceGenerator parameters
+
+    Returns:
+        str: generated source code
+    """
+    return SourceGenerator(seed=seed, **kwargs).generate(lines)
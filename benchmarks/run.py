@@ -0,0 +1,214 @@
+# run.py
+# ------
+# Benchmark runner. Times each phase of processing a generated
+# source (build_tree, Visitor.visit, check_achievements and the
+# store write, then the generated checker doing the same visit and
+# checks), records peak memory and compares against a stored baseline.
+#
+# usage: python -m benchmarks.run [--lines 1000 10000] [--threshold 0.2]
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from unittest import mock
+
+# benchmarks must never process themselves or touch the real store
+os.environ.setdefault('DEV_ACHIEVEMENTS_DISABLE', '1')
+
+from benchmarks.codegen import compile_checker
+from benchmarks.generator import generate_source
+from dev_achievements import build_tree
+from dev_achievements.processing.visitor import Visitor
+from dev_achievements.utilities import utils
+
+
+# benchmark defaults
+DEFAULT_LINES = [1000, 10000, 100000]
+DEFAULT_THRESHOLD = 0.2
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+PHASES = ['build_tree', 'visit', 'check_achievements', 'store_write',
+          'generated_check']
+
+
+def _run_phases(file_path, store_path):
+    """ Runs every processing phase once on the given file, yielding
+    each phase name as it completes.
+
+    Args:
+        file_path (str): path of source file
+        store_path (str): path of the (temporary) Achievement store
+
+    Yields:
+        str: name of the phase that just completed
+    """
+    # the JSON store at store_path, whatever store or profile the
+    # environment selects
+    with mock.patch.object(utils, 'STORE_PATH', store_path), \
+            mock.patch.object(utils, '_backend', None), \
+            mock.patch.object(utils, '_resolved', True):
+        if os.path.isfile(store_path):
+            os.remove(store_path)
+        tree = build_tree(file_path)
+        yield 'build_tree'
+        v = Visitor()
+        v.visit(tree)
+        yield 'visit'
+        v.check_achievements()
+        yield 'check_achievements'
+        v.save()
+        yield 'store_write'
+        # same (fresh) store state as the Visitor started from
+        compile_checker().unlocks(tree)
+        yield 'generated_check'
+    return
+
+
+def measure(file_path, store_path, repeat=3, memory=True):
+    """ Measures the wall time (best of repeat) and peak memory of
+    each phase.
+
+    Args:
+        file_path (str): path of source file
+        store_path (str): path of the (temporary) Achievement store
+        repeat (int): number of timed runs
+        memory (bool): whether to do an extra run tracing memory
+
+    Returns:
+        dict: phase name to {'seconds': float, 'peak_bytes': int}
+    """
+    results = {p: {'seconds': float('inf'), 'peak_bytes': None}
+               for p in PHASES}
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for phase in _run_phases(file_path, store_path):
+            end = time.perf_counter()
+            res = results[phase]
+            res['seconds'] = min(res['seconds'], end - start)
+            start = time.perf_counter()
+    if memory:
+        # separate run, tracemalloc skews timings
+        tracemalloc.start()
+        try:
+            for phase in _run_phases(file_path, store_path):
+                results[phase]['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+                tracemalloc.reset_peak()
+        finally:
+            tracemalloc.stop()
+    return results
+
+
+def run(lines_list, seed=0, repeat=3, memory=True, **gen_kwargs):
+    """ Generates sources of each size and benchmarks them.
+
+    Args:
+        lines_list (list[int]): source sizes (in lines)
+        seed (int): generator seed
+        repeat (int): number of timed runs per size
+        memory (bool): whether to record peak memory
+        **gen_kwargs: extra SourceGenerator parameters
+
+    Returns:
+        dict: size (as str) to phase results
+    """
+    report = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        store_path = os.path.join(tmp, 'store.json')
+        for lines in lines_list:
+            src_path = os.path.join(tmp, f'src_{lines}.py')
+            with open(src_path, 'w') as file:
+                file.write(generate_source(lines, seed=seed, **gen_kwargs))
+            report[str(lines)] = measure(src_path, store_path,
+                                         repeat=repeat, memory=memory)
+    return report
+
+
+def compare(report, baseline, threshold):
+    """ Compares phase timings to the baseline.
+
+    Args:
+        report (dict): current results
+        baseline (dict): baseline results
+        threshold (float): allowed relative slowdown (0.2 is 20%)
+
+    Returns:
+        list[str]: description of each regression
+    """
+    regressions = []
+    for size, phases in report.items():
+        for phase, res in phases.items():
+            base = baseline.get(size, {}).get(phase)
+            if not base or not base['seconds']:
+                continue
+            ratio = res['seconds'] / base['seconds']
+            if ratio > 1 + threshold:
+                regressions.append(f'{size} lines, {phase}: {ratio:.2f}x'
+                                   + f' slower than baseline')
+    return regressions
+
+
+def format_report(report):
+    """ Formats results as a plain text table.
+
+    Args:
+        report (dict): benchmark results
+
+    Returns:
+        str: table of results
+    """
+    rows = [f'{"lines":>8}  {"phase":<20}{"seconds":>10}{"peak MB":>10}']
+    for size, phases in report.items():
+        for phase, res in phases.items():
+            peak = res['peak_bytes']
+            peak = '-' if peak is None else f'{peak / 2 ** 20:.1f}'
+            rows.append(f'{size:>8}  {phase:<20}'
+                        + f'{res["seconds"]:>10.4f}{peak:>10}')
+    return '\n'.join(rows)
+
+
+def main(argv=None):
+    """ Command line entry point, returns the exit status """
+    parser = argparse.ArgumentParser(
+        description='Benchmark dev_achievements processing phases')
+    parser.add_argument('--lines', type=int, nargs='+', default=DEFAULT_LINES,
+                        help='generated source sizes (1k to 1M lines)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--max-depth', type=int, default=3,
+                        help='maximum block nesting depth')
+    parser.add_argument('--call-density', type=float, default=0.3)
+    parser.add_argument('--comprehension-ratio', type=float, default=0.2)
+    parser.add_argument('--no-memory', action='store_true',
+                        help='skip the peak memory run')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='allowed relative slowdown before failing')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='store these results as the new baseline')
+    args = parser.parse_args(argv)
+
+    report = run(args.lines, seed=args.seed, repeat=args.repeat,
+                 memory=not args.no_memory, max_depth=args.max_depth,
+                 call_density=args.call_density,
+                 comprehension_ratio=args.comprehension_ratio)
+    print(format_report(report))
+
+    if args.save_baseline:
+        utils.write_json(args.baseline, report)
+        print(f'\nbaseline saved to {args.baseline}')
+        return 0
+    if not os.path.isfile(args.baseline):
+        print('\nno baseline to compare against (use --save-baseline)')
+        return 0
+    regressions = compare(report, utils.load_json(args.baseline),
+                          args.threshold)
+    for r in regressions:
+        print('REGRESSION: ' + r)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
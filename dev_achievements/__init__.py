@@ -6,60 +6,194 @@
 import ast
 import os
 import sys
+import warnings
 
+from dev_achievements.processing.imports import Project
+from dev_achievements.processing.source import SourceSkipped, read_source
 from dev_achievements.processing.visitor import Visitor
-from dev_achievements.utilities.utils import bordered
+from dev_achievements.utilities import profiling, throttle
+from dev_achievements.utilities.constants import (DISABLE_ENV, METRICS_ENV,
+                                                  PROFILE_ENV, VERSION)
 
 
 # package version
-__version__ = '1.0.3'
+__version__ = VERSION
 
 
-def process_tree(tree):
+def process_tree(tree, file_path=None, run=None):
     """ Creates an AST Node Visitor to process the built
     syntax tree.
 
     Args:
         tree (ast.AST): AST syntax tree
+        file_path (str, optional): path of source file, for following
+            its imports of local modules (and archiving its summary, to
+            replay later Achievements on)
+        run (ScriptRun, optional): throttle state of the script, updated
+            with the progress
+
+    Returns:
+        list: newly unlocked Achievements
     """
     v = Visitor()
-    v.visit(tree)
-    unlocked = v.check_achievements()
+    if file_path is not None:
+        v.table.project = Project(file_path, tree)
+    with profiling.phase('traversal'):
+        v.visit(tree)
+    with profiling.phase('check'):
+        unlocked = v.check_achievements()
+    profiler = profiling.get_profiler()
+    if profiler is not None:
+        profiler.count_nodes(v.table)
+        profiler.count_unlocks(a.__class__.__name__ for a in unlocked)
+    archived = False
+    if file_path is not None:
+        with profiling.phase('archive'):
+            archived = archive_summary(v.table, file_path, run,
+                                       v.ach_tree.unlocked)
+    throttle_state = None
+    if run is not None:
+        project = v.table.project
+        modules = project.imported_modules() \
+            if project is not None and project.resolved else ()
+        throttle_state = run.update(unlocked, modules, archived)
+    unlocked_at = v.save(throttle_state)
     if unlocked:
-        text = '\n'.join(a.unlock_message for a in unlocked)
-        print('\n' + bordered(text) + '\n')
-    return
+        # imported here, so runs without unlocks don't load the sinks
+        from dev_achievements.reporting import sinks
+        sinks.publish(unlocked, file_path, v.table, unlocked_at=unlocked_at)
+    return unlocked
+
+
+def archive_summary(table, file_path, run=None, unlocked=()):
+    """ Archives the feature summary of a processed script, for later
+    Achievements to be replayed on (see processing/replay.py), unless
+    it was already archived at the script's current state. Errors are
+    only warned about, never breaking the script.
+
+    Args:
+        table (NodeTable): node table of the script
+        file_path (str): path of source file
+        run (ScriptRun, optional): throttle state of the script
+        unlocked (iterable[str]): names of unlocked Achievements, whose
+            custom checks aren't summarized
+
+    Returns:
+        bool: whether the summary is archived
+    """
+    if run is not None and run.archived:
+        return True
+    # imported here, so runs of already archived scripts don't load them
+    from dev_achievements.processing.archive import SummaryArchive
+    from dev_achievements.processing.summary import summarize
+    try:
+        state = run.state if run is not None \
+            else throttle.file_state(file_path)
+        SummaryArchive().record([{'name': os.path.abspath(file_path),
+                                  'state': state,
+                                  'summary': summarize(table,
+                                                       unlocked=unlocked)}])
+    except Exception as e:
+        warnings.warn(f'dev_achievements: summary not archived ({e!r})')
+        return False
+    return True
 
 
 def build_tree(file_path):
-    """ Creates an AST syntax tree from the source file.
+    """ Creates an AST syntax tree from the source file, parsing
+    its bytes (so its coding declaration is respected).
 
     Args:
         file_path (str): path of source file
+
+    Raises:
+        SourceSkipped: if the file is over the size limit
     
     Returns:
         ast.AST: Root of syntax tree
     """
     tree = None
-    with open(file_path, 'r') as file:
-        tree = ast.parse(file.read())
+    with profiling.phase('read'):
+        source = read_source(file_path)
+    profiling.count('sources')
+    profiling.count('bytes', source.size)
+    with source, profiling.phase('parse'):
+        tree = ast.parse(source.data, filename=file_path)
     return tree
 
 
 def process_file(file_path):
     """ Builds an AST syntax tree and visits each node to 
-    process for Achievements.
+    process for Achievements, unless the (unchanged) script is
+    throttled (see utilities/throttle.py).
 
     Args:
         file_path (str): path of file
     """
-    tree = build_tree(file_path)
-    process_tree(tree)
+    with profiling.phase('total'):
+        run = throttle.ScriptRun(file_path)
+        if run.skip:
+            profiling.count('throttled')
+            return
+        try:
+            tree = build_tree(file_path)
+        except SourceSkipped as e:
+            profiling.count('skipped')
+            warnings.warn(f'dev_achievements {e}')
+            return
+        process_tree(tree, file_path, run)
+    return
+
+
+def load_ipython_extension(ipython):
+    """ Processes each executed cell when loaded in IPython/Jupyter
+    (with %load_ext dev_achievements).
+
+    Args:
+        ipython: IPython InteractiveShell
+    """
+    from dev_achievements import notebook
+    notebook.load_ipython_extension(ipython)
     return
 
 
+def unload_ipython_extension(ipython):
+    """ Stops processing cells (with %unload_ext dev_achievements).
+
+    Args:
+        ipython: IPython InteractiveShell
+    """
+    from dev_achievements import notebook
+    notebook.unload_ipython_extension(ipython)
+    return
+
+
+def _get_ipython():
+    """ Gives the running IPython shell, if any """
+    ipython = sys.modules.get('IPython')
+    if ipython is None:
+        return None
+    return ipython.get_ipython()
+
+
 # run the whole Achievement process on package import
-# if the passed script path exists
-if __name__ != '__main__':
-    if len(sys.argv) > 0 and os.path.isfile(sys.argv[0]):
+# if the passed script path exists (and it isn't disabled).
+# In IPython/Jupyter, cells are processed as they run instead
+if __name__ != '__main__' and not os.environ.get(DISABLE_ENV):
+    if _get_ipython() is not None:
+        load_ipython_extension(_get_ipython())
+    elif len(sys.argv) > 0 and os.path.isfile(sys.argv[0]):
+        _report_path = os.environ.get(PROFILE_ENV)
+        _metrics_path = os.environ.get(METRICS_ENV)
+        if _metrics_path:
+            from dev_achievements.utilities.metrics import Metrics
+            profiling.enable(Metrics())
+        elif _report_path:
+            profiling.enable()
         process_file(sys.argv[0])
+        if _report_path or _metrics_path:
+            _recorded = profiling.disable()
+            if _report_path:
+                _recorded.dump(_report_path)
+            if _metrics_path:
+                _recorded.write_textfile(_metrics_path)
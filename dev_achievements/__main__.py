@@ -0,0 +1,50 @@
+# __main__.py
+# -----------
+# Command line interface, run with: python -m dev_achievements <command>
+#
+# Only the chosen command's module is imported (all of them for help
+# or an unknown command), so quick commands such as the precommit git
+# hook don't pay for the imports of the others (e.g. numpy).
+
+import argparse
+import importlib
+import sys
+
+
+# module registering each command
+COMMANDS = {
+    'backfill': 'dev_achievements.processing.backfill',
+    'corpus': 'dev_achievements.processing.corpus',
+    'precommit': 'dev_achievements.processing.precommit',
+    'replay': 'dev_achievements.processing.replay',
+    'scan': 'dev_achievements.processing.scanner',
+    'quarantine': 'dev_achievements.processing.tree',
+    'leaderboard': 'dev_achievements.reporting.leaderboard',
+}
+
+
+def main(argv=None):
+    """ Parses the command line and runs the chosen command.
+
+    Args:
+        argv (list[str], optional): arguments (defaults to sys.argv)
+
+    Returns:
+        int: exit status
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    parser = argparse.ArgumentParser(prog='dev_achievements')
+    commands = parser.add_subparsers(dest='command', metavar='command')
+    commands.required = True
+    if argv and argv[0] in COMMANDS:
+        modules = [COMMANDS[argv[0]]]
+    else:
+        modules = COMMANDS.values()
+    for module in modules:
+        importlib.import_module(module).add_command(commands)
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -5,6 +5,10 @@
 import ast
 from abc import abstractmethod
 
+from dev_achievements.processing.imports import FUNCTION_DEFS
+from dev_achievements.processing.patterns import compile_pattern
+from dev_achievements.utilities.profiling import get_profiler
+
 
 # Base classes
 # ------------
@@ -14,22 +18,46 @@ class Achievement:
     """ Base Achievement with common unlock and dependency fields.
 
     New Achievements should sublass this base, implementing the 
-    _check_condition method to specify when it should be unlocked.
+    _check_condition method to specify when it should be unlocked,
+    or declaring either a tree pattern (see processing/patterns.py) to
+    unlock on any match, or node_types to unlock on any being present
+    ("presence-style" Achievements).
+
+    Metadata (title and dependencies) is declared once on the class,
+    so instances only carry their unlock state and handler.
 
     Attributes:
+        title (str): Achievement title (class level)
+        dependencies (tuple[type]): Achievement classes to unlock first
+            (class level)
+        pattern (str): tree pattern to unlock on (class level, optional)
+        node_types (tuple[type]): ast.AST node classes to unlock on any
+            of being present (class level, optional)
+        needs_nodes (bool): whether a custom _check_condition reads the
+            node table, False if it only uses other facts such as the
+            project (class level)
         unlocked (bool): unlock state
-        dependencies (list[Achievements]): list of Achievements to unlock first
-        on_unlock (function): callback on Achievement unlock
+        on_unlock (function): callback on Achievement unlock, called
+            with the unlocked Achievement
         unlock_message (str): pretty formatted message after being unlocked
     
     Args:
         unlocked (bool): unlock state
         on_unlock (function): Achievement unlock handler
     """
+    __slots__ = ('_unlocked', 'on_unlock')
+
+    dependencies = ()
+    pattern = None
+    node_types = ()
+    needs_nodes = True
+
+    # all registered Achievement classes
+    _registry = []
+
     def __init__(self, unlocked=False, on_unlock=None):
-        # unlocked state and dependencies
+        # unlocked state
         self._unlocked = unlocked
-        self.dependencies = []
         # state change handlers
         self.on_unlock = on_unlock
     
@@ -48,7 +76,7 @@ class Achievement:
         """
         self._unlocked = status
         if self._unlocked and callable(self.on_unlock):
-            self.on_unlock()
+            self.on_unlock(self)
         return
 
     @property
@@ -67,7 +95,7 @@ class Achievement:
     def _check_condition(self, nodes):
         """ When implemented, specifies whether or not this Achievement
         should be unlocked based on the given AST node table. Must be
-        implemented for every subclass of Achievement.
+        implemented for every subclass of Achievement without a pattern.
 
         Args:
             nodes (dict): table of ast.AST nodes in tree
@@ -78,6 +106,10 @@ class Achievement:
         Raises:
             NotImplementedError: If not implemented in subclasses
         """
+        if self.pattern is not None:
+            return compile_pattern(self.pattern).exists(nodes)
+        if self.node_types:
+            return any(t in nodes for t in self.node_types)
         msg = 'Must implement _check_condition method for' \
             + f' class {self.__class__.__name__}'
         raise NotImplementedError(msg)
@@ -92,28 +124,51 @@ class Achievement:
         Returns:
             bool: Unlocked state after checking condition
         """
-        if not self.unlocked:
+        if self.unlocked:
+            return self.unlocked
+        profiler = get_profiler()
+        if profiler is None:
             self.unlocked = self._check_condition(nodes)
+        else:
+            with profiler.check(self.__class__.__name__):
+                status = self._check_condition(nodes)
+            self.unlocked = status
         return self.unlocked
     
+    @classmethod
+    def is_presence(cls):
+        """ Whether this Achievement only depends on the presence of any
+        of its node_types (so can be evaluated from node counts alone).
+        """
+        return bool(cls.node_types) and cls.pattern is None \
+            and cls._check_condition is Achievement._check_condition
+
     @classmethod
     def subclasses(cls):
-        """ Returns a list of subclasses to Achievement """
-        return cls.__subclasses__()
+        """ Returns a list of (non abstract) subclasses to Achievement,
+        in definition order.
+        """
+        return [a for a in Achievement._registry if issubclass(a, cls)]
     
-    def __init_subclass__(cls, /, **kwargs):
+    def __init_subclass__(cls, /, abstract=False, **kwargs):
         """ Each subclass to this Achievement will get a UID as a class 
         variable. The UID is just sequentially generated on every subclass.
+        Abstract subclasses (base classes for other Achievements) are
+        declared with abstract=True, and aren't registered.
 
         Reference:
             https://docs.python.org/3/reference/datamodel.html#customizing-class-creation
         """
         super().__init_subclass__(**kwargs)
-        cls.uid = len(Achievement.__subclasses__()) - 1
+        if abstract:
+            return
+        cls.uid = len(Achievement._registry)
+        Achievement._registry.append(cls)
 
     def __repr__(self):
         """ Representation version of the Achievement """
-        res = f'{self.__class__.__name__}(dependencies={self.dependencies})'
+        deps = [d.__name__ for d in self.dependencies]
+        res = f'{self.__class__.__name__}(dependencies={deps})'
         return res
 
     def __str__(self):
@@ -124,15 +179,61 @@ class Achievement:
         return res
 
 
+class TieredAchievement(Achievement, abstract=True):
+    """ Base for Achievements unlocked by a running total of some AST
+    node types, counted across all runs.
+
+    Subclasses set the counted node_types and the threshold to reach.
+    Tiers of the same Achievement are chained through dependencies.
+
+    Attributes:
+        node_types (tuple[type]): counted ast.AST node classes (class level)
+        threshold (int): total needed to unlock (class level)
+        counters (dict): stored totals (from previous runs) by node
+            class name
+
+    Args:
+        counters (dict, optional): stored totals by node class name
+        **kwargs: Achievement arguments
+    """
+    __slots__ = ('counters',)
+
+    threshold = 0
+
+    def __init__(self, counters=None, **kwargs):
+        super().__init__(**kwargs)
+        self.counters = counters if counters is not None else {}
+
+    def count(self, nodes):
+        """ Gives the total count of node_types, including the given
+        AST node table.
+
+        Args:
+            nodes (dict): table of ast.AST nodes in tree
+
+        Returns:
+            int: running total
+        """
+        total = 0
+        for node_type in self.node_types:
+            total += self.counters.get(node_type.__name__, 0)
+            total += len(nodes.get(node_type, []))
+        return total
+
+    def _check_condition(self, nodes):
+        """ Checks the running total against the threshold """
+        return self.count(nodes) >= self.threshold
+
+
 # All unlockable achievements
 # ---------------------------
 
 
-class SampleAchievement(Achievement):
-    """ Sample Achievement for reference """
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        self.title = 'SAMPLE'
+class SampleAchievement(Achievement, abstract=True):
+    """ Sample Achievement for reference (not registered) """
+    __slots__ = ()
+
+    title = 'SAMPLE'
     
     def _check_condition(self, nodes):
         """ Check something """
@@ -141,184 +242,196 @@ class SampleAchievement(Achievement):
 
 class HelloWorldAchievement(Achievement):
     """ Unlocks on printing Hello World """
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        self.title = 'Hello Hello!'
-        self.dependencies = []
-    
-    def _check_condition(self, nodes):
-        """ Checks for print call with "hello world" """
-        for call in nodes.get(ast.Call, []):
-            # has to call "print" function
-            if call.func.id != print.__name__:
-                continue
-            # has to have at least 1 str literal (constant) argument
-            if not len(call.args):
-                continue
-            arg = call.args[0]
-            is_str = isinstance(arg, ast.Constant) and type(arg.value) == str
-            # check "hello world" in first arg
-            if is_str and 'hello world' in arg.value.lower():
-                return True
-        return False
+    __slots__ = ()
+
+    title = 'Hello Hello!'
+    # print call with "hello world" in the first (str literal) argument
+    pattern = "Call(func: Name(id == 'print')," \
+        + " args[0]: Constant(value ~ '(?i)hello world'))"
 
 
 class AssignAchievement(Achievement):
     """ Unlocks on variable assignment """
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        self.title = 'Variables!'
-    
-    def _check_condition(self, nodes):
-        """ Checks for assignment operator """
-        return bool(ast.Assign in nodes)
+    __slots__ = ()
+
+    title = 'Variables!'
+    # assignment operator
+    node_types = (ast.Assign,)
 
 
 class MathOperatorsAchievement(Achievement):
     """ Unlocks on using any math (non binary) operator """
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        self.title = 'Operators!'
-    
-    def _check_condition(self, nodes):
-        """ Checks for any non-binary operator """
-        ops = [ast.Add, ast.Sub, ast.Mult, ast.Div,
-               ast.FloorDiv, ast.Mod, ast.Pow, ast.MatMult]
-        return any([o in nodes for o in ops])
+    __slots__ = ()
+
+    title = 'Operators!'
+    # any non-binary operator
+    node_types = (ast.Add, ast.Sub, ast.Mult, ast.Div,
+                  ast.FloorDiv, ast.Mod, ast.Pow, ast.MatMult)
 
 
 class BitwiseOperatorsAchievement(Achievement):
     """ Unlocks on using any bitwise operators """
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        self.title = 'Bitwise!'
-        self.dependencies = [MathOperatorsAchievement]
-    
-    def _check_condition(self, nodes):
-        """ Checks for any bitwise operators """
-        ops = [ast.LShift, ast.RShift, ast.BitOr,
-               ast.BitAnd, ast.BitXor, ast.Invert]
-        return any([o in nodes for o in ops])
+    __slots__ = ()
+
+    title = 'Bitwise!'
+    dependencies = (MathOperatorsAchievement,)
+    # any bitwise operator
+    node_types = (ast.LShift, ast.RShift, ast.BitOr,
+                  ast.BitAnd, ast.BitXor, ast.Invert)
 
 
 class ConditionalAchievement(Achievement):
     """ Unlocks on using if statements """
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        self.title = 'If statements!'
-    
-    def _check_condition(self, nodes):
-        """ Checks for if statements (regular and ternary) """
-        reg = bool(ast.If in nodes)
-        tern = bool(ast.IfExp in nodes)
-        return reg or tern
+    __slots__ = ()
+
+    title = 'If statements!'
+    # if statements (regular and ternary)
+    node_types = (ast.If, ast.IfExp)
 
 
 class LoopsAchievement(Achievement):
     """ Unlocks on loops (for and while) """
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        self.title = 'Loops!'
-        self.dependencies = [AssignAchievement, ConditionalAchievement]
-    
-    def _check_condition(self, nodes):
-        """ Checks for loop keywords """
-        has_for = bool(ast.For in nodes)
-        has_while = bool(ast.While in nodes)
-        return has_for or has_while
+    __slots__ = ()
+
+    title = 'Loops!'
+    dependencies = (AssignAchievement, ConditionalAchievement)
+    # loop keywords
+    node_types = (ast.For, ast.While)
 
 
 class ComprehensionsAchievement(Achievement):
     """ Unlocks on any form of comprehension (list, set, etc.) """
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        self.title = 'Comprehensions!'
-        self.dependencies = [LoopsAchievement]
-    
-    def _check_condition(self, nodes):
-        """ Checks for any form of comprehension """
-        comps = [ast.ListComp, ast.SetComp, ast.GeneratorExp, ast.DictComp]
-        return any([c in nodes for c in comps])
+    __slots__ = ()
+
+    title = 'Comprehensions!'
+    dependencies = (LoopsAchievement,)
+    # any form of comprehension
+    node_types = (ast.ListComp, ast.SetComp, ast.GeneratorExp,
+                  ast.DictComp)
 
 
 class PassAchievement(Achievement):
     """ Unlocks on using pass """
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        self.title = 'Pass!'
-        self.dependencies = [LoopsAchievement]
-    
-    def _check_condition(self, nodes):
-        """ Checks for pass keyword """
-        return bool(ast.Pass in nodes)
+    __slots__ = ()
+
+    title = 'Pass!'
+    dependencies = (LoopsAchievement,)
+    node_types = (ast.Pass,)
+
+
+class LoopControlAchievement(Achievement):
+    """ Unlocks on using break or continue in a loop """
+    __slots__ = ()
+
+    title = 'Loop control!'
+    dependencies = (LoopsAchievement,)
+    pattern = 'For|While >> Break|Continue'
 
 
 class FunctionAchievement(Achievement):
     """ Unlocks on defining and calling a function """
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        self.title = 'Functions!'
-        self.dependencies = [ConditionalAchievement, LoopsAchievement]
-    
-    def _check_condition(self, nodes):
-        """ Checks for user defined function calls """
-        fn_defs = nodes.get(ast.FunctionDef, [])
-        fn_calls = nodes.get(ast.Call, [])
-        # unique names of functions defined/called
-        def_names = set([fn.name for fn in fn_defs])
-        call_names = set([c.func.id for c in fn_calls])
-        # at least one function must be defined and called
-        return len(def_names & call_names) > 0
+    __slots__ = ()
+
+    title = 'Functions!'
+    dependencies = (ConditionalAchievement, LoopsAchievement)
+    # call (by name) of a user defined function
+    pattern = 'Call(func: Name(id in FunctionDef.name))'
 
 
 class LambdaAchievement(Achievement):
     """ Unlocks on using lambda functions """
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        self.title = 'Lambdas!'
-        self.dependencies = [FunctionAchievement]
-    
-    def _check_condition(self, nodes):
-        """ Checks for lambda functions """
-        return bool(ast.Lambda in nodes)
+    __slots__ = ()
+
+    title = 'Lambdas!'
+    dependencies = (FunctionAchievement,)
+    node_types = (ast.Lambda,)
 
 
 class ListAchievement(Achievement):
     """ Unlocks on using lists """
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        self.title = 'Lists!'
-    
-    def _check_condition(self, nodes):
-        """ Checks for list data type """
-        return bool(ast.List in nodes)
+    __slots__ = ()
+
+    title = 'Lists!'
+    node_types = (ast.List,)
 
 
 class DictAchievement(Achievement):
     """ Unlocks on using a dict """
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        self.title = 'Dictionaries!'
-    
-    def _check_condition(self, nodes):
-        """ Checks for dict data type """
-        return bool(ast.Dict in nodes)
+    __slots__ = ()
+
+    title = 'Dictionaries!'
+    node_types = (ast.Dict,)
 
 
 class ClassAchievement(Achievement):
     """ Unlocks on declaring and creating an instance of a class """
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        self.title = 'Classes!'
-        self.dependencies = [FunctionAchievement]
-    
+    __slots__ = ()
+
+    title = 'Classes!'
+    dependencies = (FunctionAchievement,)
+    # call (by name) of a user defined class
+    pattern = 'Call(func: Name(id in ClassDef.name))'
+
+
+class ModuleAchievement(Achievement):
+    """ Unlocks on importing a module of your own (a local file) """
+    __slots__ = ()
+
+    title = 'Modules!'
+    dependencies = (FunctionAchievement,)
+    needs_nodes = False
+
+    def _check_condition(self, nodes):
+        """ Checks the script's project imports a local module """
+        project = getattr(nodes, 'project', None)
+        return project is not None and bool(project.imported_modules())
+
+
+class CrossModuleCallAchievement(Achievement):
+    """ Unlocks on calling a function defined in another file """
+    __slots__ = ()
+
+    title = 'Calling across modules!'
+    dependencies = (ModuleAchievement,)
+    needs_nodes = False
+
     def _check_condition(self, nodes):
-        """ Checks for creating a class and creating an instance """
-        cls_defs = nodes.get(ast.ClassDef, [])
-        cls_calls = nodes.get(ast.Call, [])
-        # unique names of functions defined/called
-        cls_names = set([fn.name for fn in cls_defs])
-        call_names = set([c.func.id for c in cls_calls])
-        # at least one function must be defined and called
-        return len(cls_names & call_names) > 0
+        """ Checks any call in the project resolves to a function
+        defined in another of its modules
+        """
+        project = getattr(nodes, 'project', None)
+        if project is None:
+            return False
+        symbols = project.symbols
+        return any(issubclass(symbols[found], FUNCTION_DEFS)
+                   for _, found in project.cross_module_calls())
+
+
+class LoopsBronzeAchievement(TieredAchievement):
+    """ Unlocks on writing 10 loops across all runs """
+    __slots__ = ()
+
+    title = 'Loops (Bronze)!'
+    dependencies = (LoopsAchievement,)
+    node_types = (ast.For, ast.While)
+    threshold = 10
+
+
+class LoopsSilverAchievement(TieredAchievement):
+    """ Unlocks on writing 100 loops across all runs """
+    __slots__ = ()
+
+    title = 'Loops (Silver)!'
+    dependencies = (LoopsBronzeAchievement,)
+    node_types = (ast.For, ast.While)
+    threshold = 100
+
+
+class LoopsGoldAchievement(TieredAchievement):
+    """ Unlocks on writing 1000 loops across all runs """
+    __slots__ = ()
 
+    title = 'Loops (Gold)!'
+    dependencies = (LoopsSilverAchievement,)
+    node_types = (ast.For, ast.While)
+    threshold = 1000
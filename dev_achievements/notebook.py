@@ -0,0 +1,160 @@
+# notebook.py
+# -----------
+# IPython extension for processing notebook cells. Each executed
+# cell's syntax tree is checked on its own node table, against a
+# compact summary of the earlier cells (node counts, pattern hits and
+# the names joined on, e.g. defined functions) so Achievements can
+# span cells, while neither memory nor the cost of a cell grows with
+# the number of cells run before it.
+#
+# usage: %load_ext dev_achievements (or import dev_achievements)
+
+import ast
+import html
+import warnings
+
+from dev_achievements.achievements import Achievement
+from dev_achievements.processing.patterns import compile_pattern
+from dev_achievements.processing.summary import merge_summaries, summarize
+from dev_achievements.processing.tree import AchievementTree
+from dev_achievements.processing.visitor import build_table
+from dev_achievements.reporting import sinks
+from dev_achievements.utilities.utils import bordered
+
+
+# session of the loaded extension
+_session = None
+
+
+class NotebookSession(ast.NodeTransformer):
+    """ AST transformer processing every executed cell, leaving the
+    cell's syntax tree unchanged.
+
+    Attributes:
+        ach_tree (AchievementTree): Achievements in tree structure,
+            with the counts of earlier cells added to its counters
+        summary (dict): merged feature summary of earlier cells, with
+            the facts of Achievements not yet reachable
+        joined (dict): values of earlier cells joined on by patterns,
+            by (node class, field)
+        unlocked (list[Achievement]): unlocked, not yet shown Achievements
+    """
+    def __init__(self):
+        super().__init__()
+        self.ach_tree = AchievementTree()
+        self.summary = merge_summaries([])
+        self.joined = {key: set() for a in Achievement.subclasses()
+                       if a.pattern is not None
+                       for key in compile_pattern(a.pattern).joins}
+        self.unlocked = []
+
+    def visit(self, node):
+        """ Called by IPython with each cell's syntax tree. Analysis
+        errors are only warned about, never breaking the cell.
+
+        Args:
+            node (ast.AST): cell syntax tree
+
+        Returns:
+            ast.AST: the unchanged syntax tree
+        """
+        try:
+            self.process_cell(node)
+        except Exception as e:
+            warnings.warn(f'dev_achievements: skipped cell ({e!r})')
+        return node
+
+    def process_cell(self, tree):
+        """ Checks the cell for unlocks (with the facts of earlier
+        cells), saves them with the cell's counter deltas, and adds the
+        cell to the session summary.
+
+        Args:
+            tree (ast.AST): cell syntax tree
+        """
+        table = build_table(tree)
+        for (node_class, field), values in self.joined.items():
+            table.field_values(node_class, field).update(values)
+        unlocked = self.ach_tree.check(table, self.summary)
+        delta = {c.__name__: len(nodes) for c, nodes in table.items()}
+        unlocked_at = self.ach_tree.save(delta)
+        # shown as the cell's output, other sinks get the events now
+        sinks.publish(unlocked, nodes=table, unlocked_at=unlocked_at,
+                      terminal=False)
+        self.unlocked += unlocked
+        self._add_cell(table, delta)
+        return
+
+    def _add_cell(self, table, delta):
+        """ Adds a checked cell's counts to the tiered counters, and its
+        facts to the session summary. Only the facts of Achievements
+        still waiting for their dependencies are recorded: the others
+        were just checked on the cell.
+
+        Args:
+            table (NodeTable): cell node table
+            delta (dict): cell node counts by ast.AST class name
+        """
+        counters = self.ach_tree.counters
+        for name, count in delta.items():
+            counters[name] = counters.get(name, 0) + count
+        unlocked = self.ach_tree.unlocked
+        waiting = [a for a in Achievement.subclasses()
+                   if a.__name__ not in unlocked
+                   and a.__name__ not in self.ach_tree.quarantined
+                   and not all(d.__name__ in unlocked
+                               for d in a.dependencies)]
+        self.summary = merge_summaries(
+            [self.summary, summarize(table, waiting, unlocked)])
+        for node_class, field in self.joined:
+            self.joined[node_class, field] = \
+                table.field_values(node_class, field)
+        return
+
+    def show_unlocked(self, *args):
+        """ Displays any new unlocks as the cell's output (post_run_cell
+        event handler), unless no configured sink shows unlocks.
+        """
+        if not self.unlocked:
+            return
+        if not sinks.shows_unlocks():
+            self.unlocked = []
+            return
+        from IPython.display import display
+        text = '\n'.join(a.unlock_message for a in self.unlocked)
+        box = bordered(text)
+        self.unlocked = []
+        display({'text/plain': box,
+                 'text/html': f'<pre>{html.escape(box)}</pre>'}, raw=True)
+        return
+
+
+def load_ipython_extension(ipython):
+    """ Registers the session with the IPython shell (at most once).
+
+    Args:
+        ipython: IPython InteractiveShell
+    """
+    global _session
+    if _session is not None:
+        return
+    _session = NotebookSession()
+    ipython.ast_transformers.append(_session)
+    ipython.events.register('post_run_cell', _session.show_unlocked)
+    return
+
+
+def unload_ipython_extension(ipython):
+    """ Unregisters the session from the IPython shell.
+
+    Args:
+        ipython: IPython InteractiveShell
+    """
+    global _session
+    if _session is None:
+        return
+    if _session in ipython.ast_transformers:
+        ipython.ast_transformers.remove(_session)
+    ipython.events.unregister('post_run_cell', _session.show_unlocked)
+    _session = None
+    return
@@ -0,0 +1,143 @@
+# archive.py
+# ----------
+# Archive of the feature summaries of analyzed sources (script runs,
+# scans saved to the store and backfilled git blobs), kept next to the
+# Achievement store as JSON Lines. Each line records one source: its
+# name, when its code was seen, what is needed to read it again, and
+# its (versioned) summary. Lines are only ever appended by runs, the
+# latest line of a source being the one that counts, and the archive
+# is compacted by replays (see processing/replay.py) or once it grows
+# past its size bound, keeping the most recently seen sources.
+
+import json
+import os
+import tempfile
+import time
+
+from dev_achievements.utilities.utils import summaries_path
+
+
+# default size bound of the archive, in bytes
+MAX_ARCHIVE_BYTES = 32 << 20
+
+# share of the size bound a compaction leaves the archive within, so
+# it isn't compacted again on the next few runs
+_COMPACT_FILL = 0.75
+
+
+class SummaryArchive:
+    """ Feature summaries of analyzed sources, by source name.
+
+    Attributes:
+        path (str): path of archive file
+        entries (dict): latest archived entry of each source (once
+            loaded), with the source name, time (at), summary and any
+            of the source's file state, content digest, or git
+            repository and blob SHA
+        max_bytes (int): size bound, enforced by compacting (dropping
+            the sources seen longest ago if needed)
+
+    Args:
+        path (str, optional): path of archive file (defaults to the one
+            of the selected store)
+        max_bytes (int): size bound
+    """
+    def __init__(self, path=None, max_bytes=MAX_ARCHIVE_BYTES):
+        self.path = path or summaries_path()
+        self.max_bytes = max_bytes
+        self.entries = {}
+        self._read = 0
+
+    def load(self):
+        """ Reads the archived entries.
+
+        Returns:
+            dict: latest entry of each source, by name
+        """
+        self.entries = {}
+        self._read = 0
+        self._read_from(0)
+        return self.entries
+
+    def _read_from(self, offset):
+        """ Reads the entries appended from the given file offset,
+        over the loaded ones, returning the names read
+        """
+        names = set()
+        try:
+            with open(self.path, 'rb') as file:
+                file.seek(offset)
+                for line in file:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # a line cut short by a kill
+                        continue
+                    self.entries[entry['name']] = entry
+                    names.add(entry['name'])
+                self._read = file.tell()
+        except OSError:
+            pass
+        return names
+
+    def record(self, entries):
+        """ Appends entries to the archive, in a single write, then
+        compacts it if it grew past its size bound.
+
+        Args:
+            entries (list[dict]): entries, each with at least the source
+                name and summary (the time defaults to now)
+        """
+        if not entries:
+            return
+        now = time.time()
+        lines = []
+        for entry in entries:
+            entry.setdefault('at', now)
+            self.entries[entry['name']] = entry
+            lines.append(json.dumps(entry, separators=(',', ':')) + '\n')
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path, 'a') as file:
+            file.write(''.join(lines))
+            size = file.tell()
+        if size > self.max_bytes:
+            self.load()
+            self.compact()
+        return
+
+    def compact(self, updated=()):
+        """ Atomically rewrites the archive with only the latest entry of
+        each source, dropping the sources seen longest ago past a share
+        of the size bound. Entries appended by runs since the archive
+        was loaded are kept over the loaded ones.
+
+        Args:
+            updated (list[dict]): entries replacing loaded ones (unless
+                appended to since)
+        """
+        appended = self._read_from(self._read)
+        for entry in updated:
+            if entry['name'] not in appended:
+                self.entries[entry['name']] = entry
+        lines = {name: json.dumps(entry, separators=(',', ':')) + '\n'
+                 for name, entry in self.entries.items()}
+        budget = self.max_bytes * _COMPACT_FILL
+        for entry in sorted(self.entries.values(), key=lambda e: -e['at']):
+            budget -= len(lines[entry['name']])
+            if budget < 0:
+                del self.entries[entry['name']]
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.summaries-',
+                                        suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as file:
+                for name in self.entries:
+                    file.write(lines[name])
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        return
@@ -0,0 +1,252 @@
+# backfill.py
+# -----------
+# Unlocks Achievements for code already written, by walking a local
+# git repository's history. Python blobs are streamed through a single
+# long lived `git cat-file --batch` process, and each unique blob (by
+# SHA) is parsed at most once.
+
+import ast
+import datetime
+import os
+import subprocess
+
+from dev_achievements.processing.patterns import NodeTable
+from dev_achievements.processing.tree import AchievementTree
+from dev_achievements.processing.visitor import build_table
+
+
+# SHA of a deleted file in raw diff output
+_NULL_SHA = '0' * 40
+
+
+class BlobReader:
+    """ Reads git objects through one `git cat-file --batch` process.
+
+    Args:
+        repo (str): path of git repository
+    """
+    def __init__(self, repo):
+        self._process = subprocess.Popen(
+            ['git', '-C', repo, 'cat-file', '--batch'],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+    def read(self, sha):
+        """ Reads a blob's contents.
+
+        Args:
+            sha (str): blob SHA
+
+        Returns:
+            bytes: blob contents, or None if the object is missing
+        """
+        self._process.stdin.write(sha.encode() + b'\n')
+        self._process.stdin.flush()
+        header = self._process.stdout.readline().split()
+        if len(header) != 3:
+            return None
+        data = self._process.stdout.read(int(header[2]))
+        # each object is followed by a newline
+        self._process.stdout.read(1)
+        return data
+
+    def close(self):
+        """ Stops the git process """
+        self._process.stdin.close()
+        self._process.wait()
+        self._process.stdout.close()
+        return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def iter_commits(repo, rev='HEAD'):
+    """ Streams the Python files added or modified by each commit,
+    oldest first.
+
+    Args:
+        repo (str): path of git repository
+        rev (str): revision (range) to walk
+
+    Yields:
+        tuple: (commit SHA, commit timestamp, list of (path, blob SHA))
+    """
+    cmd = ['git', '-C', repo, '-c', 'core.quotePath=off', 'log',
+           '--reverse', '--no-renames', '--raw', '--no-abbrev',
+           '--format=commit %H %ct', rev, '--', '*.py']
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE)
+    commit = None
+    try:
+        for line in process.stdout:
+            line = line.decode('utf-8', 'surrogateescape').rstrip('\n')
+            if line.startswith('commit '):
+                if commit is not None:
+                    yield commit
+                _, sha, timestamp = line.split()
+                commit = (sha, int(timestamp), [])
+            elif line.startswith(':') and commit is not None:
+                # :old_mode new_mode old_sha new_sha status\tpath
+                meta, path = line.split('\t', 1)
+                blob = meta.split()[3]
+                if blob != _NULL_SHA and path.endswith('.py'):
+                    commit[2].append((path, blob))
+        if commit is not None:
+            yield commit
+    finally:
+        process.stdout.close()
+        process.wait()
+    if process.returncode:
+        raise RuntimeError(f'git log failed in {repo}')
+    return
+
+
+def blob_entry(repo, sha, timestamp, summary):
+    """ Gives the summary archive entry of a git blob (see
+    processing/archive.py).
+
+    Args:
+        repo (str): path of git repository
+        sha (str): blob SHA
+        timestamp (int): time of the commit that added the blob
+        summary (dict): feature summary of the blob
+
+    Returns:
+        dict: archive entry
+    """
+    repo = os.path.abspath(repo)
+    return {'name': f'{repo}@{sha}', 'at': timestamp, 'repo': repo,
+            'sha': sha, 'summary': summary}
+
+
+def _set_counters(tree, stored, counters, counts=None):
+    """ Sets the tree's counters (shared with its tiered Achievements)
+    to the totals up to the current commit. Tiered Achievements add the
+    checked table's own nodes to them, so the counts of the blob about
+    to be checked are taken off.
+
+    Args:
+        tree (AchievementTree): tree being unlocked into
+        stored (dict): totals stored before the backfill
+        counters (dict): what the commits so far added
+        counts (dict, optional): node counts of the blob to check
+    """
+    counts = counts or {}
+    for name in set(stored) | set(counters) | set(counts):
+        tree.counters[name] = stored.get(name, 0) \
+            + counters.get(name, 0) - counts.get(name, 0)
+    return
+
+
+def backfill(repo, rev='HEAD', tree=None, save=True):
+    """ Walks the repository history, checking Achievements against
+    every unique Python blob with the time of the commit that added it.
+
+    Counters only grow by what each commit added to a file (a file
+    edited many times isn't counted many times), and tiered
+    Achievements unlock at the commit their total is reached by. When
+    saving, the
+    summary of each blob is archived too, dated by its commit, so
+    Achievements added later can be replayed without walking the
+    history again.
+
+    Args:
+        repo (str): path of git repository
+        rev (str): revision (range) to walk
+        tree (AchievementTree, optional): tree to unlock into (by
+            default one not saving check statistics)
+        save (bool): whether to save the results to the store
+
+    Returns:
+        dict: stats and the unlocked Achievements with their timestamps
+    """
+    # imported here, so the precommit hook (only reading blobs)
+    # doesn't load them
+    from dev_achievements.processing.archive import SummaryArchive
+    from dev_achievements.processing.summary import summarize
+    # checks replayed over history don't count towards quarantine
+    tree = tree or AchievementTree(record_checks=False)
+    stored = dict(tree.counters)
+    counters = {}
+    blob_counts = {}
+    file_counts = {}
+    stats = {'commits': 0, 'blobs': 0, 'parsed': 0, 'errors': 0}
+    unlocked = []
+    entries = []
+    with BlobReader(repo) as reader:
+        for _, timestamp, blobs in iter_commits(repo, rev):
+            stats['commits'] += 1
+            tree.timestamp = timestamp
+            for path, sha in blobs:
+                stats['blobs'] += 1
+                counts = blob_counts.get(sha)
+                table = None
+                if counts is None:
+                    counts = blob_counts[sha] = {}
+                    try:
+                        table = build_table(ast.parse(reader.read(sha) or b''))
+                    except (SyntaxError, ValueError, RecursionError):
+                        stats['errors'] += 1
+                        continue
+                    stats['parsed'] += 1
+                    counts.update((c.__name__, len(n)) for c, n in table.items())
+                    if save:
+                        entries.append(blob_entry(repo, sha, timestamp,
+                                                  summarize(table)))
+                # count what this commit added to the file
+                previous = file_counts.get(path, {})
+                grew = False
+                for name, count in counts.items():
+                    added = count - previous.get(name, 0)
+                    if added > 0:
+                        counters[name] = counters.get(name, 0) + added
+                        grew = True
+                file_counts[path] = counts
+                if table is not None:
+                    _set_counters(tree, stored, counters, counts)
+                    unlocked += [(a, timestamp) for a in tree.check(table)]
+                elif grew:
+                    # an already seen blob can still add to the totals
+                    _set_counters(tree, stored, counters)
+                    unlocked += [(a, timestamp)
+                                 for a in tree.check(NodeTable())]
+    _set_counters(tree, stored, counters)
+    tree.timestamp = None
+    if save:
+        tree.save(counters)
+        SummaryArchive().record(entries)
+    stats['unlocked'] = [(a.__class__.__name__, t) for a, t in unlocked]
+    stats['counters'] = counters
+    return stats
+
+
+def _run(args):
+    """ Runs the backfill command """
+    stats = backfill(args.repo, rev=args.rev, save=not args.dry_run)
+    print(f'{stats["commits"]} commits, {stats["blobs"]} python blobs'
+          + f' ({stats["parsed"]} parsed, {stats["errors"]} unparsable)')
+    for name, timestamp in stats['unlocked']:
+        date = datetime.datetime.fromtimestamp(timestamp).date()
+        print(f'    {date}  {name}')
+    return 0
+
+
+def add_command(commands):
+    """ Registers the backfill command.
+
+    Args:
+        commands: argparse subparsers action
+    """
+    parser = commands.add_parser(
+        'backfill', help='unlock Achievements from a git repository history')
+    parser.add_argument('repo', nargs='?', default='.',
+                        help='path of git repository')
+    parser.add_argument('--rev', default='HEAD',
+                        help='revision (range) to walk')
+    parser.add_argument('--dry-run', action='store_true',
+                        help="don't save to the Achievement store")
+    parser.set_defaults(func=_run)
+    return parser
@@ -0,0 +1,152 @@
+# checkpoint.py
+# -------------
+# Checkpoints of long scans: the result (feature summary included) of
+# every finished source is appended to a JSON Lines manifest, in
+# batches at intervals, so a scan killed midway restarts from the
+# sources it had finished. On resume a source is only reused if it is
+# unchanged (same mtime and size, or else same content hash). Summaries
+# merge in any order, so the resumed scan unlocks exactly what an
+# uninterrupted one would.
+
+import json
+import os
+import tempfile
+import time
+
+from dev_achievements.processing.source import SourceSkipped, read_source
+from dev_achievements.processing.summary import SUMMARY_VERSION, catalog_key
+from dev_achievements.utilities.cache import content_key
+from dev_achievements.utilities.throttle import file_state
+
+
+# bumped whenever the manifest format changes
+CHECKPOINT_VERSION = 1
+
+# default seconds between checkpoint writes
+CHECKPOINT_SECONDS = 30.0
+
+
+def unchanged(name, data, result):
+    """ Whether a source is the same as when its result was recorded.
+
+    Args:
+        name (str): source name (file path for plain files)
+        data (bytes): source bytes, None for plain files
+        result (dict): recorded scan result, with the source's file
+            state and content digest
+
+    Returns:
+        bool: whether the recorded result can be reused
+    """
+    if data is None:
+        state = file_state(name)
+        if state is None:
+            return False
+        if state == result.get('state'):
+            return True
+    if result.get('digest') is None:
+        return False
+    if data is not None:
+        return content_key(data) == result['digest']
+    try:
+        with read_source(name, max_bytes=float('inf')) as src:
+            return content_key(src.data) == result['digest']
+    except (OSError, ValueError, SourceSkipped):
+        return False
+
+
+class Checkpoint:
+    """ Manifest of the sources a scan has finished, appended to in
+    batches (only the latest result of a source counts).
+
+    Attributes:
+        path (str): path of manifest file
+        header (dict): what the results depend on (manifest version,
+            catalog and scan options), results recorded under any
+            other header are discarded
+        done (dict): results recorded by previous runs, by source name
+        interval (float): seconds between writes
+
+    Args:
+        path (str): path of manifest file
+        options (dict, optional): scan options results depend on
+        interval (float): seconds between writes
+    """
+    def __init__(self, path, options=None, interval=CHECKPOINT_SECONDS):
+        self.path = path
+        self.header = {
+            'version': CHECKPOINT_VERSION,
+            'summary_version': SUMMARY_VERSION,
+            'catalog': content_key(catalog_key().encode()),
+            'options': options or {},
+        }
+        self.done = {}
+        self.interval = interval
+        self._pending = []
+        self._last = time.monotonic()
+
+    def load(self):
+        """ Reads the results of previous runs, and rewrites the
+        manifest with only the latest result of each source.
+
+        Returns:
+            dict: recorded results by source name
+        """
+        self.done = {}
+        try:
+            with open(self.path) as file:
+                lines = iter(file)
+                if json.loads(next(lines, 'null')) == self.header:
+                    for line in lines:
+                        result = json.loads(line)
+                        self.done[result['name']] = result
+        except (OSError, ValueError):
+            # a line cut short by a kill ends the usable part
+            pass
+        self._rewrite()
+        return self.done
+
+    def _rewrite(self):
+        """ Atomically replaces the manifest with the header and the
+        recorded results
+        """
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.checkpoint-',
+                                        suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as file:
+                file.write(json.dumps(self.header) + '\n')
+                for result in self.done.values():
+                    file.write(json.dumps(result) + '\n')
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        return
+
+    def add(self, result):
+        """ Records a finished source, writing the batch if the interval
+        has passed.
+
+        Args:
+            result (dict): scan result of the source
+        """
+        self._pending.append(result)
+        if time.monotonic() - self._last >= self.interval:
+            self.flush()
+        return
+
+    def flush(self):
+        """ Appends the pending results to the manifest """
+        if self._pending:
+            with open(self.path, 'a') as file:
+                file.write(''.join(json.dumps(r) + '\n'
+                                   for r in self._pending))
+                file.flush()
+                os.fsync(file.fileno())
+            self._pending = []
+        self._last = time.monotonic()
+        return
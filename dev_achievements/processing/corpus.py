@@ -0,0 +1,206 @@
+# corpus.py
+# ---------
+# Stress runner checking every Achievement against a corpus of real
+# source files (the local standard library by default), in parallel.
+# Reports crashes per Achievement, throughput and the slowest files,
+# and can be used as a robustness and performance gate.
+
+import ast
+import heapq
+import json
+import sysconfig
+import time
+
+from dev_achievements.achievements import Achievement
+from dev_achievements.processing.scanner import iter_sources, parallel_map
+from dev_achievements.processing.source import SourceSkipped, read_source
+from dev_achievements.processing.visitor import build_table
+
+
+# directories skipped when walking the default (stdlib) corpus
+STDLIB_SKIP_DIRS = ('site-packages', 'dist-packages')
+
+
+def analyze_source(source):
+    """ Parses a source and runs every Achievement check on it,
+    recording (rather than raising) any crash.
+
+    Args:
+        source (tuple): (name, bytes or None) from iter_sources
+
+    Returns:
+        dict: source path, size in bytes, seconds taken, error (source
+            couldn't be read or parsed), reason it was skipped and
+            crashes by Achievement name
+    """
+    name, data = source
+    result = {'path': name, 'bytes': 0, 'seconds': 0.0,
+              'error': None, 'skipped': None, 'crashes': {}}
+    start = time.perf_counter()
+    try:
+        with read_source(name, data) as src:
+            result['bytes'] = src.size
+            table = build_table(ast.parse(src.data, filename=name))
+    except SourceSkipped as e:
+        result['skipped'] = e.reason
+        table = None
+    except (OSError, SyntaxError, ValueError, RecursionError) as e:
+        result['error'] = f'{e.__class__.__name__}: {e}'
+        table = None
+    if table is not None:
+        for ach in Achievement.subclasses():
+            try:
+                ach()._check_condition(table)
+            except Exception as e:
+                result['crashes'][ach.__name__] = f'{e.__class__.__name__}: {e}'
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def default_paths():
+    """ Gives the default corpus: the local standard library """
+    return [sysconfig.get_paths()['stdlib']]
+
+
+def run_corpus(paths=None, workers=None, top=10):
+    """ Analyzes every file in the corpus, in a process pool.
+
+    Args:
+        paths (list[str], optional): files, directories or archives
+            (defaults to the standard library)
+        workers (int, optional): number of processes (defaults to the
+            CPU count, 1 runs in process)
+        top (int): number of slowest files to report
+
+    Returns:
+        dict: JSON serializable report
+    """
+    errors = []
+    if paths:
+        sources = iter_sources(paths, errors=errors)
+    else:
+        sources = iter_sources(default_paths(), STDLIB_SKIP_DIRS, errors,
+                               archives=False)
+    report = {'files': 0, 'bytes': 0, 'errors': 0, 'skipped': 0,
+              'crashes': {}, 'seconds': 0.0, 'files_per_sec': 0.0,
+              'mb_per_sec': 0.0, 'slowest': []}
+    slowest = []
+    start = time.perf_counter()
+    for res in parallel_map(analyze_source, sources, workers):
+        report['files'] += 1
+        report['bytes'] += res['bytes']
+        report['errors'] += res['error'] is not None
+        report['skipped'] += res['skipped'] is not None
+        for name, error in res['crashes'].items():
+            crash = report['crashes'].setdefault(
+                name, {'count': 0, 'examples': []})
+            crash['count'] += 1
+            if len(crash['examples']) < 3:
+                crash['examples'].append(f'{res["path"]}: {error}')
+        entry = (res['seconds'], res['path'])
+        if len(slowest) < top:
+            heapq.heappush(slowest, entry)
+        elif top:
+            heapq.heappushpop(slowest, entry)
+    report['errors'] += len(errors)
+    elapsed = time.perf_counter() - start
+    report['seconds'] = elapsed
+    report['files_per_sec'] = report['files'] / elapsed if elapsed else 0.0
+    report['mb_per_sec'] = report['bytes'] / 2 ** 20 / elapsed if elapsed else 0.0
+    report['slowest'] = [{'path': p, 'seconds': s}
+                         for s, p in sorted(slowest, reverse=True)]
+    return report
+
+
+def gate_failures(report, max_crashes=0, min_files_per_sec=None,
+                  min_mb_per_sec=None):
+    """ Checks a report against robustness and performance limits.
+
+    Args:
+        report (dict): report from run_corpus
+        max_crashes (int): allowed crashing checks in total
+        min_files_per_sec (float, optional): minimum files/sec
+        min_mb_per_sec (float, optional): minimum MB/sec
+
+    Returns:
+        list[str]: description of each failure
+    """
+    failures = []
+    crashes = sum(c['count'] for c in report['crashes'].values())
+    if crashes > max_crashes:
+        failures.append(f'{crashes} crashing checks (max {max_crashes})')
+    if min_files_per_sec and report['files_per_sec'] < min_files_per_sec:
+        failures.append(f'{report["files_per_sec"]:.1f} files/sec'
+                        + f' (min {min_files_per_sec})')
+    if min_mb_per_sec and report['mb_per_sec'] < min_mb_per_sec:
+        failures.append(f'{report["mb_per_sec"]:.2f} MB/sec'
+                        + f' (min {min_mb_per_sec})')
+    return failures
+
+
+def format_report(report):
+    """ Formats a corpus report as plain text.
+
+    Args:
+        report (dict): report from run_corpus
+
+    Returns:
+        str: report text
+    """
+    lines = [
+        f'{report["files"]} files, {report["bytes"] / 2 ** 20:.1f} MB'
+        + f' in {report["seconds"]:.2f}s ({report["errors"]} unparsable,'
+        + f' {report["skipped"]} skipped)',
+        f'{report["files_per_sec"]:.1f} files/sec,'
+        + f' {report["mb_per_sec"]:.2f} MB/sec',
+        '',
+        'Crashes',
+    ]
+    for name, crash in report['crashes'].items():
+        lines.append(f'    {name}: {crash["count"]}')
+        lines += [f'        {e}' for e in crash['examples']]
+    if not report['crashes']:
+        lines.append('    none')
+    lines += ['', 'Slowest files']
+    for row in report['slowest']:
+        lines.append(f'    {row["seconds"]:>8.4f}s  {row["path"]}')
+    return '\n'.join(lines)
+
+
+def _run(args):
+    """ Runs the corpus command """
+    report = run_corpus(args.paths, workers=args.workers, top=args.top)
+    if args.json:
+        print(json.dumps(report, indent=4))
+    else:
+        print(format_report(report))
+    failures = gate_failures(report, max_crashes=args.max_crashes,
+                             min_files_per_sec=args.min_files_per_sec,
+                             min_mb_per_sec=args.min_mb_per_sec)
+    for f in failures:
+        print('FAILED: ' + f)
+    return 1 if failures else 0
+
+
+def add_command(commands):
+    """ Registers the corpus command.
+
+    Args:
+        commands: argparse subparsers action
+    """
+    parser = commands.add_parser(
+        'corpus', help='stress test Achievement checks on a source corpus')
+    parser.add_argument('paths', nargs='*',
+                        help='files, directories or archives (default: the stdlib)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='number of processes (default: CPU count)')
+    parser.add_argument('--top', type=int, default=10,
+                        help='number of slowest files to show')
+    parser.add_argument('--json', action='store_true',
+                        help='print the report as JSON')
+    parser.add_argument('--max-crashes', type=int, default=0,
+                        help='fail above this many crashing checks')
+    parser.add_argument('--min-files-per-sec', type=float, default=None)
+    parser.add_argument('--min-mb-per-sec', type=float, default=None)
+    parser.set_defaults(func=_run)
+    return parser
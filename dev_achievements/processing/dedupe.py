@@ -0,0 +1,283 @@
+# dedupe.py
+# ---------
+# Hash-consing of top level function and class definitions: the facts
+# of each definition (node counts, pattern results and what its joined
+# patterns probe for) are memoized by its source text, and reused when
+# an identical definition recurs in another file (vendored copies,
+# generated code, boilerplate). A file's summary is then put together
+# from the facts of its definitions and of the rest of its module.
+
+import ast
+import collections
+import functools
+import hashlib
+import re
+
+from dev_achievements.achievements import Achievement
+from dev_achievements.processing.patterns import NodeTable, compile_pattern
+from dev_achievements.processing.source import detect_encoding
+from dev_achievements.processing.summary import (SUMMARY_VERSION, _is_custom,
+                                                 catalog_key, summarize)
+from dev_achievements.processing.visitor import build_table
+
+
+# ast.AST node classes of memoized definitions
+DEFINITIONS = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+
+# default number of memoized definitions (per process)
+MEMO_ENTRIES = 1 << 16
+
+# blank and comment lines (between top level statements)
+_BLANK_LINES_RE = re.compile(rb'(?:[ \t\f]*(?:#[^\r\n]*)?(?:\r\n|\r|\n))*')
+
+
+class _Plan:
+    """ How the catalog's facts decompose over the parts of a module.
+
+    Attributes:
+        local (list[str]): patterns holding in a module if they hold in
+            any of its parts
+        joined (dict): (step, join key) of single step patterns with a
+            single 'in' constraint, by pattern
+        keys (set): join keys, (node class, field) pairs
+        order (list[str]): all patterns, in catalog order
+        checks (list[type]): Achievements with custom checks (none of
+            which read the node table)
+        salt (bytes): digest of the catalog key, so memoized facts are
+            only reused by the same catalog
+    """
+    def __init__(self, achievements):
+        self.local = []
+        self.joined = {}
+        self.keys = set()
+        self.order = []
+        self.checks = []
+        self.salt = hashlib.blake2b(catalog_key(achievements).encode(),
+                                    digest_size=16).digest()
+
+
+@functools.lru_cache(maxsize=8)
+def _plan(achievements):
+    """ Gives the plan of the Achievements, None if their facts don't
+    decompose over definitions (a pattern relating a definition to the
+    module itself, joins that need more than one value, custom checks
+    reading the node table).
+    """
+    plan = _Plan(achievements)
+    for ach in achievements:
+        if ach.pattern is None:
+            if _is_custom(ach):
+                if ach.needs_nodes:
+                    return None
+                plan.checks.append(ach)
+            continue
+        if ach.pattern in plan.order:
+            continue
+        plan.order.append(ach.pattern)
+        query = compile_pattern(ach.pattern)
+        if any(issubclass(t, ast.mod) for s in query.steps for t in s.types):
+            return None
+        if not query.joins:
+            plan.local.append(ach.pattern)
+        elif len(query.steps) == 1 and query.join_count == 1:
+            key, = query.joins
+            plan.joined[ach.pattern] = (query.steps[0], key)
+            plan.keys.add(key)
+        else:
+            return None
+    return plan
+
+
+class _Probe:
+    """ Stands in for a joined value set, recording every value looked
+    up (and containing all of them, or none).
+    """
+    def __init__(self, contains):
+        self.contains = contains
+        self.seen = set()
+
+    def __contains__(self, value):
+        self.seen.add(value)
+        return self.contains
+
+
+def _probes(table, step, key):
+    """ Gives the values whose presence among the joined values makes
+    the step match a node of the table.
+
+    With a single 'in' constraint, a node matches a set of joined values
+    exactly when it matches one of them alone. A node that doesn't
+    match when every value is present never does, one that looks up a
+    single value matches with it alone, and otherwise every value it
+    looks up (when none is present) is tried alone.
+    """
+    found = set()
+    every, none, single = NodeTable(), NodeTable(), NodeTable()
+    every.values[key] = _Probe(True)
+    none.values[key] = _Probe(False)
+    for node_class in step.types:
+        for node in table.get(node_class, []):
+            seen = every.values[key].seen
+            seen.clear()
+            if not step.match(node, every):
+                continue
+            if len(seen) == 1:
+                found |= seen
+                continue
+            seen = none.values[key].seen
+            seen.clear()
+            step.match(node, none)
+            for value in seen - found:
+                single.values[key] = {value}
+                if step.match(node, single):
+                    found.add(value)
+    return found
+
+
+def _facts(table, plan):
+    """ Gives the facts of a part of a module.
+
+    Returns:
+        dict: node counts (by class name), local pattern results, probed
+            values of joined patterns and own join values (by key)
+    """
+    defines = {}
+    for node_class, field in plan.keys:
+        values = set()
+        for node in table.get(node_class, []):
+            value = getattr(node, field, None)
+            if value is not None:
+                values.add(value)
+        defines[(node_class, field)] = values
+    return {
+        'counts': {c.__name__: len(n) for c, n in table.items() if n},
+        'patterns': {p: compile_pattern(p).exists(table) for p in plan.local},
+        'probes': {p: _probes(table, step, key)
+                   for p, (step, key) in plan.joined.items()},
+        'defines': defines,
+    }
+
+
+class SubtreeMemo:
+    """ Bounded (least recently used) memo of the facts of top level
+    definitions, by source text. Identical text parses to an identical
+    subtree wherever it appears, only its positions differ.
+
+    Attributes:
+        max_entries (int): most definitions kept
+        subtrees (int): definitions looked up
+        reused (int): definitions whose facts were reused
+
+    Args:
+        max_entries (int): most definitions kept
+    """
+    def __init__(self, max_entries=MEMO_ENTRIES):
+        self.max_entries = max_entries
+        self.subtrees = 0
+        self.reused = 0
+        self._entries = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def facts(self, key, node, plan):
+        """ Gives the (memoized) facts of a definition.
+
+        Args:
+            key (bytes): hash of the definition's source text
+            node (ast.AST): definition node
+            plan (_Plan): plan of the catalog
+
+        Returns:
+            dict: facts of the definition
+        """
+        self.subtrees += 1
+        facts = self._entries.get(key)
+        if facts is not None:
+            self._entries.move_to_end(key)
+            self.reused += 1
+            return facts
+        facts = _facts(build_table(node), plan)
+        self._entries[key] = facts
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return facts
+
+
+def _segments(data, body):
+    """ Yields each top level statement with its source lines: those
+    from the end of the previous statement to its own end, less the
+    blank and comment lines before it.
+    """
+    starts = [0]
+    for line in data.splitlines(keepends=True):
+        starts.append(starts[-1] + len(line))
+    prev = 0
+    for stmt in body:
+        end = min(stmt.end_lineno, len(starts) - 1)
+        start = _BLANK_LINES_RE.match(data, starts[prev]).end()
+        yield stmt, data[start:max(start, starts[end])]
+        prev = end
+    return
+
+
+def _combine(parts, plan):
+    """ Puts the summary of a module together from the facts of its
+    parts (the same summary summarize gives for the whole module).
+    """
+    summary = {'version': SUMMARY_VERSION, 'counts': {}, 'patterns': {},
+               'checks': {}}
+    counts = summary['counts']
+    joined = {key: set() for key in plan.keys}
+    for facts in parts:
+        for name, count in facts['counts'].items():
+            counts[name] = counts.get(name, 0) + count
+        for key, values in facts['defines'].items():
+            joined[key] |= values
+    for pattern in plan.order:
+        if pattern in plan.joined:
+            values = joined[plan.joined[pattern][1]]
+            held = any(not f['probes'][pattern].isdisjoint(values)
+                       for f in parts)
+        else:
+            held = any(f['patterns'][pattern] for f in parts)
+        summary['patterns'][pattern] = held
+    return summary
+
+
+def summarize_source(data, tree, memo):
+    """ Summarizes a parsed source, reusing the memoized facts of its
+    top level definitions.
+
+    Args:
+        data (bytes): source bytes
+        tree (ast.Module): syntax tree of the source
+        memo (SubtreeMemo): memo of definition facts
+
+    Returns:
+        dict: feature summary (as given by summarize)
+    """
+    plan = _plan(tuple(Achievement.subclasses()))
+    if plan is None or not isinstance(data, bytes):
+        return summarize(build_table(tree))
+    salt = plan.salt + detect_encoding(data).encode()[:48]
+    rest = NodeTable()
+    rest.add(tree)
+    parts = []
+    for stmt, text in _segments(data, tree.body):
+        if isinstance(stmt, DEFINITIONS):
+            key = hashlib.blake2b(text, digest_size=16, key=salt).digest()
+            parts.append(memo.facts(key, stmt, plan))
+            continue
+        rest.add(stmt, tree)
+        todo = [stmt]
+        while todo:
+            node = todo.pop()
+            for child in ast.iter_child_nodes(node):
+                rest.add(child, node)
+                todo.append(child)
+    parts.append(_facts(rest, plan))
+    summary = _combine(parts, plan)
+    for ach in plan.checks:
+        summary['checks'][ach.__name__] = bool(ach()._check_condition(rest))
+    return summary
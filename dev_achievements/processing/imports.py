@@ -0,0 +1,307 @@
+# imports.py
+# ----------
+# Builds the import graph of a script's project: ast.Import and
+# ast.ImportFrom statements are resolved to local source files, each
+# module is parsed (at most once) into its definitions, import
+# bindings and calls, and calls are resolved against the global
+# symbol table for whole-program (cross-file) Achievements.
+
+import ast
+import os
+
+from dev_achievements.processing.source import SourceSkipped, read_source
+
+
+# ast.AST node classes defining a function
+FUNCTION_DEFS = (ast.FunctionDef, ast.AsyncFunctionDef)
+
+# deepest chain of re-exports (from .x import f) followed for a symbol
+MAX_REEXPORTS = 4
+
+
+class ModuleInfo:
+    """ What a module defines, imports and calls.
+
+    Attributes:
+        path (str): absolute path of module file
+        definitions (dict): ast.AST class of each top level function
+            and class definition, by name
+        bindings (dict): (module path, symbol name or None for the
+            module itself) each imported name is bound to
+        stars (list[str]): paths of modules imported with *
+        calls (set[str]): dotted names of everything called (by name
+            or attribute access)
+    """
+    __slots__ = ('path', 'definitions', 'bindings', 'stars', 'calls')
+
+    def __init__(self, path):
+        self.path = path
+        self.definitions = {}
+        self.bindings = {}
+        self.stars = []
+        self.calls = set()
+
+    @property
+    def imports(self):
+        """ set[str]: paths of all local modules this module imports """
+        return {path for path, _ in self.bindings.values()} | set(self.stars)
+
+
+def resolve_module(dotted, directory):
+    """ Resolves a dotted module name to a source file in a directory.
+
+    Args:
+        dotted (str): dotted module name ('' for the directory's package)
+        directory (str): directory to resolve from
+
+    Returns:
+        str: path of module (or package __init__) file, None if there
+            isn't a local one
+    """
+    if dotted:
+        base = os.path.join(directory, *dotted.split('.'))
+        candidates = (base + '.py', os.path.join(base, '__init__.py'))
+    else:
+        candidates = (os.path.join(directory, '__init__.py'),)
+    for path in candidates:
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def _dotted_name(node):
+    """ Gives the dotted name of a Name/Attribute chain, None for
+    anything else (calls on subscripts, call results, etc.).
+    """
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if not isinstance(node, ast.Name):
+        return None
+    parts.append(node.id)
+    return '.'.join(reversed(parts))
+
+
+class Project:
+    """ Import graph of the local modules reachable from a script,
+    analyzed lazily (and each module at most once) on first use.
+
+    Attributes:
+        main (str): absolute path of the script
+        root (str): directory absolute imports are resolved from
+        modules (dict): ModuleInfo of each analyzed module by path
+            (None if it couldn't be read or parsed)
+
+    Args:
+        path (str): path of the script
+        tree (ast.AST, optional): already parsed syntax tree of the
+            script (so it isn't parsed again)
+    """
+    def __init__(self, path, tree=None):
+        self.main = os.path.abspath(path)
+        self.root = os.path.dirname(self.main)
+        self.modules = {}
+        self._trees = {self.main: tree} if tree is not None else {}
+        self._graph = None
+
+    def module(self, path):
+        """ Gives the (cached) analysis of a module.
+
+        Args:
+            path (str): absolute path of module file
+
+        Returns:
+            ModuleInfo: module analysis, None if it couldn't be read
+                or parsed
+        """
+        if path not in self.modules:
+            self.modules[path] = self._analyze(path)
+        return self.modules[path]
+
+    def _analyze(self, path):
+        """ Parses a module and collects its definitions, import
+        bindings and calls.
+        """
+        tree = self._trees.pop(path, None)
+        if tree is None:
+            try:
+                with read_source(path) as src:
+                    tree = ast.parse(src.data, filename=path)
+            except (OSError, SyntaxError, ValueError, RecursionError,
+                    SourceSkipped):
+                return None
+        info = ModuleInfo(path)
+        for node in tree.body:
+            if isinstance(node, FUNCTION_DEFS + (ast.ClassDef,)):
+                info.definitions[node.name] = node.__class__
+        directory = os.path.dirname(path)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                self._bind_import(info, node)
+            elif isinstance(node, ast.ImportFrom):
+                self._bind_import_from(info, node, directory)
+            elif isinstance(node, ast.Call):
+                name = _dotted_name(node.func)
+                if name is not None:
+                    info.calls.add(name)
+        return info
+
+    def _bind_import(self, info, node):
+        """ Binds the names of an ast.Import resolving to local files """
+        for alias in node.names:
+            path = resolve_module(alias.name, self.root)
+            if alias.asname is not None:
+                if path is not None:
+                    info.bindings[alias.asname] = (path, None)
+                continue
+            # import a.b.c binds a, with a.b and a.b.c reachable from it
+            parts = alias.name.split('.')
+            for i in range(1, len(parts) + 1):
+                dotted = '.'.join(parts[:i])
+                part_path = resolve_module(dotted, self.root)
+                if part_path is not None:
+                    info.bindings[dotted] = (part_path, None)
+        return
+
+    def _bind_import_from(self, info, node, directory):
+        """ Binds the names of an ast.ImportFrom resolving to local files """
+        if node.level:
+            for _ in range(node.level - 1):
+                directory = os.path.dirname(directory)
+        else:
+            directory = self.root
+        dotted = node.module or ''
+        path = resolve_module(dotted, directory)
+        for alias in node.names:
+            if alias.name == '*':
+                if path is not None:
+                    info.stars.append(path)
+                continue
+            # from package import submodule, or a symbol of the module
+            sub = '.'.join(filter(None, (dotted, alias.name)))
+            sub_path = resolve_module(sub, directory)
+            name = alias.asname or alias.name
+            if sub_path is not None:
+                info.bindings[name] = (sub_path, None)
+            elif path is not None:
+                info.bindings[name] = (path, alias.name)
+        return
+
+    @property
+    def resolved(self):
+        """ bool: whether the import graph was built (by a check
+        following the script's imports)
+        """
+        return self._graph is not None
+
+    @property
+    def graph(self):
+        """ dict: paths of the local modules each reachable module
+        imports, by module path (starting from the script)
+        """
+        if self._graph is None:
+            self._graph = {}
+            todo = [self.main]
+            while todo:
+                path = todo.pop()
+                if path in self._graph:
+                    continue
+                info = self.module(path)
+                self._graph[path] = info.imports if info is not None else set()
+                todo.extend(self._graph[path])
+        return self._graph
+
+    @property
+    def symbols(self):
+        """ dict: global symbol table, the ast.AST class of every top
+        level definition by (module path, name)
+        """
+        return {(path, name): def_class
+                for path in self.graph
+                if self.module(path) is not None
+                for name, def_class in self.module(path).definitions.items()}
+
+    def imported_modules(self):
+        """ Gives the local modules imported anywhere in the project
+        (other than the script itself).
+
+        Returns:
+            set[str]: module paths
+        """
+        imported = set()
+        for imports in self.graph.values():
+            imported |= imports
+        imported.discard(self.main)
+        return imported
+
+    def resolve_symbol(self, path, name, depth=0):
+        """ Finds where a module's symbol is defined, following
+        re-exports (names the module imports itself).
+
+        Args:
+            path (str): module path
+            name (str): symbol name
+
+        Returns:
+            tuple: (module path, name) of the definition, None if it
+                isn't defined locally
+        """
+        info = self.module(path)
+        if info is None:
+            return None
+        if name in info.definitions:
+            return path, name
+        binding = info.bindings.get(name)
+        if binding is None or binding[1] is None or depth >= MAX_REEXPORTS:
+            return None
+        return self.resolve_symbol(*binding, depth=depth + 1)
+
+    def resolve_call(self, info, dotted):
+        """ Resolves a called dotted name in a module to its definition,
+        through the module's imports.
+
+        Args:
+            info (ModuleInfo): calling module
+            dotted (str): called dotted name
+
+        Returns:
+            tuple: (module path, name) of the definition, None if it
+                isn't a local one
+        """
+        if dotted in info.definitions:
+            return info.path, dotted
+        parts = dotted.split('.')
+        for i in range(len(parts), 0, -1):
+            binding = info.bindings.get('.'.join(parts[:i]))
+            if binding is None:
+                continue
+            path, symbol = binding
+            rest = parts[i:]
+            if symbol is None and len(rest) == 1:
+                return self.resolve_symbol(path, rest[0])
+            if symbol is not None and not rest:
+                return self.resolve_symbol(path, symbol)
+            return None
+        if len(parts) == 1:
+            for path in info.stars:
+                found = self.resolve_symbol(path, dotted)
+                if found is not None:
+                    return found
+        return None
+
+    def cross_module_calls(self):
+        """ Yields calls of definitions in another module.
+
+        Yields:
+            tuple: (calling module path, (defining module path, name))
+        """
+        for path in self.graph:
+            info = self.module(path)
+            if info is None:
+                continue
+            for dotted in sorted(info.calls):
+                found = self.resolve_call(info, dotted)
+                if found is not None and found[0] != path:
+                    yield path, found
+        return
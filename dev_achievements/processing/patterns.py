@@ -0,0 +1,391 @@
+# patterns.py
+# -----------
+# Declarative tree patterns for Achievement conditions, compiled into
+# queries over the node table (nodes by type) and a parent index, so
+# structural conditions are joins over indexed nodes instead of
+# nested scans.
+#
+# Syntax:
+#     pattern    := step (('>' | '>>') step)*
+#     step       := Type ('|' Type)* ['(' constraint (',' constraint)* ')']
+#     constraint := field ':' step            field holds a matching node
+#                 | field '==' 'literal'      field equals the literal
+#                 | field '~' 'regex'         str field matches the regex
+#                 | field 'in' Type.field     field value is among the
+#                                             field values of Type nodes
+#     field      := name ['[' index ']']
+#
+# 'A > B' matches A nodes with a direct child B, 'A >> B' matches A
+# nodes containing B at any depth. List fields match if any element
+# does, unless indexed. Literals only unescape \' and \\ (so regex
+# escapes such as \d reach the regex). Examples:
+#     For|While >> Break|Continue
+#     Call(func: Name(id in FunctionDef.name))
+#     Call(func: Name(id == 'print'), args[0]: Constant(value ~ '(?i)hi'))
+
+import ast
+import functools
+import re
+
+
+# pattern tokens
+_TOKEN_RE = re.compile(r"""
+    \s*(?:
+        (?P<string>'(?:[^'\\]|\\.)*')
+      | (?P<int>\d+)
+      | (?P<name>[A-Za-z_]\w*)
+      | (?P<op>>>|==|[>|(),:~\[\].])
+    )""", re.VERBOSE)
+
+
+class PatternError(ValueError):
+    """ Raised for invalid pattern syntax or unknown node types """
+    pass
+
+
+class NodeTable(dict):
+    """ Table of ast.AST nodes by class, with an index of each node's
+    parent (built while visiting) for structural queries.
+
+    Attributes:
+        parents (dict): parent node of each node
+        values (dict): cache of field values by (node class, field)
+        project (Project): import graph of the source's project, for
+            cross-file Achievements (None if unknown)
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.parents = {}
+        self.values = {}
+        self.project = None
+
+    def add(self, node, parent=None):
+        """ Adds a node to the table, and its field values to the
+        cached ones of its class (so joins stay current as a table keeps
+        growing).
+
+        Args:
+            node (ast.AST): AST syntax tree node
+            parent (ast.AST, optional): parent of the node
+        """
+        self.setdefault(node.__class__, []).append(node)
+        self.parents[node] = parent
+        if self.values:
+            for (node_class, field), values in self.values.items():
+                if node_class is node.__class__:
+                    value = getattr(node, field, None)
+                    if value is not None:
+                        values.add(value)
+        return
+
+    def field_values(self, node_class, field):
+        """ Gives the set of a field's values over all nodes of the
+        class, as joined on by patterns. The set is cached, so values
+        added to it (e.g. names defined by earlier notebook cells) are
+        joined on too.
+
+        Args:
+            node_class (type): ast.AST node class
+            field (str): field name
+
+        Returns:
+            set: field values
+        """
+        return _field_values(self, node_class, field)
+
+
+def _index(nodes):
+    """ Gives a NodeTable for the given node table, building the parent
+    index from the nodes themselves for plain dicts.
+    """
+    if isinstance(nodes, NodeTable):
+        return nodes
+    table = NodeTable(nodes)
+    for node_list in nodes.values():
+        for node in node_list:
+            for child in ast.iter_child_nodes(node):
+                table.parents[child] = node
+    return table
+
+
+def _field_values(table, node_class, field):
+    """ Gives (and caches) the set of a field's values over all nodes
+    of the class in the table.
+    """
+    key = (node_class, field)
+    values = table.values.get(key)
+    if values is None:
+        values = set()
+        for node in table.get(node_class, []):
+            value = getattr(node, field, None)
+            if value is not None:
+                values.add(value)
+        table.values[key] = values
+    return values
+
+
+class _Field:
+    """ Field access, optionally indexed (e.g. args[0]) """
+    def __init__(self, name, index=None):
+        self.name = name
+        self.index = index
+
+    def get(self, node):
+        """ Gives the field value of node, or None if missing """
+        value = getattr(node, self.name, None)
+        if self.index is not None:
+            if not isinstance(value, list) or self.index >= len(value):
+                return None
+            value = value[self.index]
+        return value
+
+
+class _Step:
+    """ Node types with constraints, matching single nodes """
+    def __init__(self, types, constraints):
+        self.types = types
+        self.constraints = constraints
+
+    def candidates(self, table):
+        """ Gives the matching nodes of the table """
+        for node_class in self.types:
+            for node in table.get(node_class, []):
+                if self.match(node, table):
+                    yield node
+        return
+
+    def match(self, node, table):
+        """ Whether the node matches the types and constraints """
+        if not isinstance(node, self.types):
+            return False
+        return all(c(node, table) for c in self.constraints)
+
+
+def _node_constraint(field, step):
+    """ Field holds a node matching the step """
+    def _check(node, table):
+        value = field.get(node)
+        if isinstance(value, list):
+            return any(step.match(v, table) for v in value)
+        return value is not None and step.match(value, table)
+    return _check
+
+
+def _equals_constraint(field, literal):
+    """ Field equals the literal """
+    return lambda node, table: field.get(node) == literal
+
+
+def _regex_constraint(field, regex):
+    """ String field matches the regex """
+    def _check(node, table):
+        value = field.get(node)
+        return isinstance(value, str) and regex.search(value) is not None
+    return _check
+
+
+def _join_constraint(field, node_class, other_field):
+    """ Field value is among other_field values of node_class nodes """
+    def _check(node, table):
+        value = field.get(node)
+        if value is None:
+            return False
+        return value in _field_values(table, node_class, other_field)
+    return _check
+
+
+class Query:
+    """ Compiled pattern, evaluated right to left: the innermost step's
+    candidates come from the node table, then each relation climbs the
+    parent index to the enclosing step.
+
+    Attributes:
+        pattern (str): source pattern
+        steps (list): compiled steps, outermost first
+        relations (list[str]): relation ('>' or '>>') between each pair
+            of consecutive steps
+        joins (frozenset): (node class, field) pairs whose values are
+            joined on (by 'in' constraints)
+        join_count (int): number of 'in' constraints
+    """
+    def __init__(self, pattern, steps, relations, joins=frozenset(),
+                 join_count=0):
+        self.pattern = pattern
+        self.joins = joins
+        self.join_count = join_count
+        self.steps = steps
+        self.relations = relations
+
+    def matches(self, nodes):
+        """ Gives the nodes matching the (outermost step of the) pattern.
+
+        Args:
+            nodes (dict): table of ast.AST nodes in tree
+
+        Returns:
+            list[ast.AST]: matching nodes
+        """
+        table = _index(nodes)
+        current = list(self.steps[-1].candidates(table))
+        for step, relation in zip(reversed(self.steps[:-1]),
+                                  reversed(self.relations)):
+            found = {}
+            seen = set()
+            for node in current:
+                parent = table.parents.get(node)
+                while parent is not None and parent not in seen:
+                    seen.add(parent)
+                    if step.match(parent, table):
+                        found[parent] = None
+                    if relation == '>':
+                        break
+                    parent = table.parents.get(parent)
+            current = list(found)
+        return current
+
+    def exists(self, nodes):
+        """ Whether any node matches the pattern.
+
+        Args:
+            nodes (dict): table of ast.AST nodes in tree
+
+        Returns:
+            bool: True if there's a match
+        """
+        if len(self.steps) == 1:
+            table = _index(nodes)
+            return next(self.steps[0].candidates(table), None) is not None
+        return bool(self.matches(nodes))
+
+    def __repr__(self):
+        return f'Query({self.pattern!r})'
+
+
+class _Parser:
+    """ Recursive descent parser of the pattern syntax """
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self.tokens = self._tokenize(pattern)
+        self.pos = 0
+        self.joins = set()
+        self.join_count = 0
+
+    def _tokenize(self, pattern):
+        """ Splits the pattern into (kind, text, offset) tokens """
+        tokens = []
+        pos = 0
+        while pattern[pos:].strip():
+            match = _TOKEN_RE.match(pattern, pos)
+            if match is None:
+                self._fail('unexpected character', pos)
+            tokens.append((match.lastgroup, match.group(match.lastgroup),
+                           match.start(match.lastgroup)))
+            pos = match.end()
+        tokens.append(('end', '', len(pattern)))
+        return tokens
+
+    def _fail(self, msg, pos=None):
+        """ Raises a PatternError pointing at the position """
+        if pos is None:
+            pos = self.tokens[self.pos][2]
+        raise PatternError(f'{msg} at {pos} in pattern {self.pattern!r}')
+
+    def _peek(self):
+        """ Gives the next token's text (None at the end) """
+        kind, text, _ = self.tokens[self.pos]
+        return None if kind == 'end' else text
+
+    def _take(self, kind=None, text=None):
+        """ Consumes the next token, checking its kind/text """
+        tok_kind, tok_text, _ = self.tokens[self.pos]
+        if (kind and tok_kind != kind) or (text and tok_text != text):
+            self._fail(f'expected {text or kind}')
+        self.pos += 1
+        return tok_text
+
+    def _node_class(self, name):
+        """ Resolves an ast node class by name """
+        node_class = getattr(ast, name, None)
+        if not isinstance(node_class, type) \
+                or not issubclass(node_class, ast.AST):
+            self._fail(f'unknown node type {name!r}',
+                       self.tokens[self.pos - 1][2])
+        return node_class
+
+    def parse(self):
+        """ Parses the whole pattern into a Query """
+        steps = [self._step()]
+        relations = []
+        while self._peek() in ('>', '>>'):
+            relations.append(self._take())
+            steps.append(self._step())
+        if self.tokens[self.pos][0] != 'end':
+            self._fail('unexpected token')
+        return Query(self.pattern, steps, relations, frozenset(self.joins),
+                     self.join_count)
+
+    def _step(self):
+        """ Parses node types with optional constraints """
+        types = [self._node_class(self._take('name'))]
+        while self._peek() == '|':
+            self._take()
+            types.append(self._node_class(self._take('name')))
+        constraints = []
+        if self._peek() == '(':
+            self._take()
+            constraints.append(self._constraint())
+            while self._peek() == ',':
+                self._take()
+                constraints.append(self._constraint())
+            self._take(text=')')
+        return _Step(tuple(types), constraints)
+
+    def _constraint(self):
+        """ Parses a single field constraint """
+        field = _Field(self._take('name'))
+        if self._peek() == '[':
+            self._take()
+            field.index = int(self._take('int'))
+            self._take(text=']')
+        op = self._take()
+        if op == ':':
+            return _node_constraint(field, self._step())
+        if op == '==':
+            return _equals_constraint(field, self._literal())
+        if op == '~':
+            try:
+                regex = re.compile(self._literal())
+            except re.error as e:
+                self._fail(f'invalid regex ({e})', self.tokens[self.pos - 1][2])
+            return _regex_constraint(field, regex)
+        if op == 'in':
+            node_class = self._node_class(self._take('name'))
+            self._take(text='.')
+            other_field = self._take('name')
+            self.joins.add((node_class, other_field))
+            self.join_count += 1
+            return _join_constraint(field, node_class, other_field)
+        self._fail(f'unknown operator {op!r}')
+
+    def _literal(self):
+        """ Parses a quoted string literal, unescaping only quotes and
+        backslashes (other escapes are kept for regexes)
+        """
+        text = self._take('string')
+        return re.sub(r"\\(['\\])", r'\1', text[1:-1])
+
+
+@functools.lru_cache(maxsize=None)
+def compile_pattern(pattern):
+    """ Compiles (and caches) a pattern into a Query.
+
+    Args:
+        pattern (str): tree pattern
+
+    Returns:
+        Query: compiled query
+
+    Raises:
+        PatternError: If the pattern is invalid
+    """
+    return _Parser(pattern).parse()
@@ -0,0 +1,173 @@
+# precommit.py
+# ------------
+# Git pre-commit mode: only the staged changes are processed, so only
+# newly written code earns Achievements, and the hook stays fast on
+# big repositories (changed files are parsed, and unchanged subtrees
+# are skipped rather than visited).
+
+import ast
+import bisect
+import re
+import subprocess
+import sys
+
+from dev_achievements.processing.backfill import BlobReader
+from dev_achievements.processing.visitor import Visitor
+from dev_achievements.reporting import sinks
+
+
+# new side of a unified diff hunk header (@@ -a,b +c,d @@)
+_HUNK_RE = re.compile(rb'^@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@')
+
+
+def staged_changes(repo='.'):
+    """ Gives the changed line ranges of each staged Python file.
+
+    Args:
+        repo (str): path of git repository
+
+    Returns:
+        dict: file path to sorted list of (first, last) changed lines
+    """
+    cmd = ['git', '-C', repo, '-c', 'core.quotePath=off', 'diff',
+           '--cached', '--unified=0', '--no-color', '--no-ext-diff',
+           '--no-renames', '--no-prefix', '--diff-filter=AM', '--', '*.py']
+    output = subprocess.run(cmd, stdout=subprocess.PIPE, check=True).stdout
+    changes = {}
+    ranges = None
+    for line in output.splitlines():
+        if line.startswith(b'+++ '):
+            # git ends paths holding spaces with a tab
+            path = line[4:].rstrip(b'\t').decode('utf-8', 'surrogateescape')
+            ranges = changes.setdefault(path, [])
+            continue
+        match = _HUNK_RE.match(line)
+        if match and ranges is not None:
+            start, count = int(match.group(1)), int(match.group(2) or 1)
+            if count:
+                ranges.append((start, start + count - 1))
+    return {p: sorted(r) for p, r in changes.items() if r}
+
+
+def _head_end(node, end):
+    """ Gives the last line of a node's head: for compound statements
+    (with a body) the lines before the body, otherwise the whole node.
+    """
+    body = getattr(node, 'body', None)
+    if isinstance(body, list) and body and hasattr(body[0], 'lineno'):
+        return max(node.lineno, body[0].lineno - 1)
+    return end
+
+
+class DiffVisitor(Visitor):
+    """ Visitor only recording nodes on changed lines.
+
+    Subtrees outside the changed lines are skipped entirely. Compound
+    statements are only recorded when their head (e.g. the def or for
+    line) changed, not when just their body did. Nodes without a
+    position (operators, contexts, etc.) follow their parent.
+
+    Attributes:
+        ranges (list[tuple]): sorted (first, last) changed lines of the
+            file being visited
+
+    Args:
+        ranges (list[tuple], optional): sorted (first, last) changed lines
+        **kwargs: Visitor arguments
+    """
+    def __init__(self, ranges=(), **kwargs):
+        super().__init__(**kwargs)
+        self.set_ranges(ranges)
+        self._recording = True
+
+    def set_ranges(self, ranges):
+        """ Sets the changed lines for the next file to visit.
+
+        Args:
+            ranges (list[tuple]): sorted (first, last) changed lines
+        """
+        self.ranges = list(ranges)
+        self._starts = [r[0] for r in self.ranges]
+        return
+
+    def changed(self, first, last):
+        """ Whether any line in first..last was changed. Ranges don't
+        overlap, so only the last range starting before last can.
+        """
+        i = bisect.bisect_right(self._starts, last) - 1
+        return i >= 0 and self.ranges[i][1] >= first
+
+    def generic_visit(self, node):
+        """ Records the node (and descends) only when on changed lines.
+
+        Args:
+            node (ast.AST): AST syntax tree node
+        """
+        lineno = getattr(node, 'lineno', None)
+        if lineno is None:
+            record = self._recording
+        else:
+            end = getattr(node, 'end_lineno', None) or lineno
+            if not self.changed(lineno, end):
+                return
+            record = self.changed(lineno, _head_end(node, end))
+        if record:
+            self.table.add(node, self._parent)
+        previous = (self._recording, self._parent)
+        self._recording, self._parent = record, node
+        ast.NodeVisitor.generic_visit(self, node)
+        self._recording, self._parent = previous
+        return
+
+
+def process_staged(repo='.'):
+    """ Processes the staged changes of the repository, saving any
+    unlocked Achievements and counters, and publishing the unlocks to
+    the configured sinks.
+
+    Args:
+        repo (str): path of git repository
+
+    Returns:
+        list[Achievement]: unlocked Achievements
+    """
+    changes = staged_changes(repo)
+    if not changes:
+        return []
+    v = DiffVisitor()
+    with BlobReader(repo) as reader:
+        for path, ranges in changes.items():
+            try:
+                tree = ast.parse(reader.read(':' + path) or b'')
+            except (SyntaxError, ValueError, RecursionError):
+                continue
+            v.set_ranges(ranges)
+            v.visit(tree)
+    unlocked = v.check_achievements()
+    unlocked_at = v.save()
+    sinks.publish(unlocked, unlocked_at=unlocked_at)
+    return unlocked
+
+
+def _run(args):
+    """ Runs the precommit command, never failing the commit """
+    try:
+        process_staged(args.repo)
+    except Exception as e:
+        # never fail the commit (e.g. git errors or a corrupt store)
+        print(f'dev_achievements: skipped ({e!r})', file=sys.stderr)
+    return 0
+
+
+def add_command(commands):
+    """ Registers the precommit command.
+
+    Args:
+        commands: argparse subparsers action
+    """
+    parser = commands.add_parser(
+        'precommit', help='process only the staged changes (git hook)')
+    parser.add_argument('repo', nargs='?', default='.',
+                        help='path of git repository')
+    parser.set_defaults(func=_run)
+    return parser
@@ -0,0 +1,238 @@
+# replay.py
+# ---------
+# Replays the archived feature summaries of analyzed sources (see
+# processing/archive.py) against the Achievement catalog, so
+# Achievements added since unlock without rerunning scripts or walking
+# git history again. Summaries are merged oldest first, and each new
+# unlock is dated by the source that completed it.
+#
+# Sources are only read and parsed again when their summary lacks a
+# fact a pending Achievement needs (a pattern or custom check added to
+# the catalog since, or an older summary schema). Sources that can't
+# be read anymore, or plain files changed since they were archived,
+# are left out of the facts they lack.
+
+import datetime
+import functools
+import json
+import tarfile
+import zipfile
+
+from dev_achievements.achievements import Achievement, TieredAchievement
+from dev_achievements.processing.archive import SummaryArchive
+from dev_achievements.processing.backfill import BlobReader
+from dev_achievements.processing.checkpoint import unchanged
+from dev_achievements.processing.scanner import (iter_archive, parallel_map,
+                                                 scan_source, split_member)
+from dev_achievements.processing.summary import (SUMMARY_VERSION,
+                                                 merge_summaries, met)
+from dev_achievements.processing.tree import quarantine_version
+from dev_achievements.utilities.constants import VERSION
+from dev_achievements.utilities.utils import load_store, save_progress
+
+
+# summary without node counts, for tiered Achievements (the stored
+# counters already hold the nodes of every run)
+_NO_COUNTS = {'counts': {}}
+
+
+def lacks_facts(summary, achievements):
+    """ Whether a summary lacks a fact any of the Achievements needs.
+
+    Args:
+        summary (dict): feature summary
+        achievements (list[type]): Achievement classes
+
+    Returns:
+        bool: True if the source must be parsed again
+    """
+    if summary.get('version') != SUMMARY_VERSION:
+        return True
+    return any(met(summary, ach) is None for ach in achievements)
+
+
+def _met(summary, ach, counters):
+    """ Evaluates an Achievement on a replayed summary """
+    if issubclass(ach, TieredAchievement):
+        return met(_NO_COUNTS, ach, counters)
+    return met(summary, ach)
+
+
+def _sources(entries):
+    """ Yields the sources of archived entries that can still be read
+    (plain files only if unchanged since they were archived, so their
+    facts are still dated by the entry).
+
+    Yields:
+        tuple: (name, bytes or None for plain files), as scan_source
+            takes them
+    """
+    members = {}
+    blobs = {}
+    for entry in entries:
+        name = entry['name']
+        if 'sha' in entry:
+            blobs.setdefault(entry['repo'], []).append(entry)
+            continue
+        member = split_member(name)
+        if member is not None:
+            members.setdefault(member[0], set()).add(name)
+        elif unchanged(name, None, entry):
+            yield name, None
+    for path, names in members.items():
+        try:
+            for name, data in iter_archive(path):
+                if name in names:
+                    yield name, data
+        except (OSError, zipfile.BadZipFile, tarfile.TarError):
+            continue
+    for repo, repo_entries in blobs.items():
+        try:
+            with BlobReader(repo) as reader:
+                for entry in repo_entries:
+                    data = reader.read(entry['sha'])
+                    if data is not None:
+                        yield entry['name'], data
+        except OSError:
+            continue
+    return
+
+
+def _reparse(stale, workers):
+    """ Parses the stale sources again.
+
+    Returns:
+        list[dict]: updated entries of the sources parsed
+    """
+    by_name = {entry['name']: entry for entry in stale}
+    fn = functools.partial(scan_source, max_bytes=float('inf'))
+    updated = []
+    for res in parallel_map(fn, _sources(stale), workers):
+        if res['summary'] is None:
+            continue
+        entry = dict(by_name[res['name']], summary=res['summary'])
+        if res['state'] is not None:
+            entry['state'] = res['state']
+        if 'sha' not in entry:
+            entry['digest'] = res['digest']
+        updated.append(entry)
+    return updated
+
+
+def _resolve_dated(entries, pending, unlocked, counters):
+    """ Merges the entries' summaries oldest first, unlocking pending
+    Achievements as soon as their conditions (and dependencies) hold.
+
+    Args:
+        entries (list[dict]): archive entries
+        pending (list[type]): Achievements to evaluate
+        unlocked (iterable[str]): names of already unlocked Achievements
+        counters (dict, optional): stored totals, for tiered Achievements
+
+    Returns:
+        list[tuple]: (Achievement name, time) of each new unlock
+    """
+    unlocked = set(unlocked)
+    merged = merge_summaries(())
+    new = []
+    for entry in sorted(entries, key=lambda e: e['at']):
+        if not pending:
+            break
+        merged = merge_summaries((merged, entry['summary']))
+        changed = True
+        while changed:
+            changed = False
+            for ach in pending:
+                if not all(d.__name__ in unlocked for d in ach.dependencies):
+                    continue
+                if _met(merged, ach, counters):
+                    unlocked.add(ach.__name__)
+                    new.append((ach.__name__, entry['at']))
+                    changed = True
+            pending = [a for a in pending if a.__name__ not in unlocked]
+    return new
+
+
+def replay(archive=None, store=None, workers=None, reparse=True, save=True):
+    """ Evaluates the Achievements not yet unlocked against the archived
+    summaries, parsing again only the sources lacking facts they need.
+
+    Args:
+        archive (SummaryArchive, optional): archive (defaults to the
+            one of the selected store)
+        store (dict, optional): Achievement store (defaults to the
+            selected one)
+        workers (int, optional): number of processes parsing sources
+        reparse (bool): whether to parse sources lacking facts again
+        save (bool): whether to save the unlocks, and the new summaries
+            of the sources parsed again
+
+    Returns:
+        dict: number of archived sources, of those lacking facts (stale),
+            of those parsed again (reparsed) and of those that couldn't
+            be read (unavailable), and the new unlocks with their times
+    """
+    archive = archive or SummaryArchive()
+    store = store if store is not None else load_store()
+    unlocked = store.get('unlocked') or []
+    # quarantined Achievements (whose checks raised) stay locked
+    quarantined = {n for n, r in (store.get('quarantined') or {}).items()
+                   if quarantine_version(r) == VERSION}
+    entries = archive.load()
+    pending = [a for a in Achievement.subclasses()
+               if a.__name__ not in unlocked and a.__name__ not in quarantined]
+    stale = [e for e in entries.values()
+             if lacks_facts(e['summary'], pending)]
+    updated = _reparse(stale, workers) if reparse and stale else []
+    current = dict(entries)
+    current.update((e['name'], e) for e in updated)
+    report = {'sources': len(entries), 'stale': len(stale),
+              'reparsed': len(updated),
+              'unavailable': len(stale) - len(updated)}
+    # summaries of an older schema can't be merged
+    usable = [e for e in current.values()
+              if e['summary'].get('version') == SUMMARY_VERSION]
+    report['unlocked'] = _resolve_dated(usable, pending, unlocked,
+                                        store.get('counters'))
+    if save:
+        if report['unlocked']:
+            names = [name for name, _ in report['unlocked']]
+            save_progress(names, unlocked_at=dict(report['unlocked']))
+        archive.compact(updated)
+    return report
+
+
+def _run(args):
+    """ Runs the replay command """
+    report = replay(workers=args.workers, reparse=not args.no_reparse,
+                    save=not args.dry_run)
+    if args.json:
+        print(json.dumps(report, indent=4))
+        return 0
+    print(f'{report["sources"]} archived sources ({report["stale"]} lacking'
+          + f' facts: {report["reparsed"]} parsed again,'
+          + f' {report["unavailable"]} unavailable)')
+    for name, timestamp in report['unlocked']:
+        date = datetime.datetime.fromtimestamp(timestamp).date()
+        print(f'    {date}  {name}')
+    return 0
+
+
+def add_command(commands):
+    """ Registers the replay command.
+
+    Args:
+        commands: argparse subparsers action
+    """
+    parser = commands.add_parser(
+        'replay', help='unlock new Achievements from archived summaries')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='number of processes parsing sources again')
+    parser.add_argument('--no-reparse', action='store_true',
+                        help="don't parse sources lacking facts again")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="don't save to the Achievement store")
+    parser.add_argument('--json', action='store_true',
+                        help='print the report as JSON')
+    parser.set_defaults(func=_run)
+    return parser
@@ -0,0 +1,585 @@
+# scanner.py
+# ----------
+# Scans many sources for Achievements: files, directories, and the
+# .py members of zip/wheel/tar archives, read straight from the
+# archive without extracting anything to disk. Sources are analyzed
+# in a process pool, with a bounded number in flight. The cache is
+# read and written by the scanning process only (workers are sent the
+# misses), so a single CacheTier sees every write and its eviction
+# accounting holds across the whole scan.
+
+import ast
+import collections
+import concurrent.futures
+import functools
+import itertools
+import json
+import os
+import signal
+import sys
+import tarfile
+import time
+import zipfile
+
+from dev_achievements.processing.archive import SummaryArchive
+from dev_achievements.processing.checkpoint import Checkpoint, unchanged
+from dev_achievements.processing.dedupe import SubtreeMemo, summarize_source
+from dev_achievements.processing.source import (MAX_SOURCE_BYTES,
+                                                SourceSkipped,
+                                                max_source_bytes, read_source)
+from dev_achievements.processing.summary import (catalog_key,
+                                                 merge_summaries, resolve,
+                                                 summarize)
+from dev_achievements.processing.visitor import build_table
+from dev_achievements.utilities.cache import ContentCache, content_key
+from dev_achievements.utilities import profiling
+from dev_achievements.utilities.constants import (CACHE_ENV, MAX_SOURCE_ENV,
+                                                  METRICS_ENV)
+from dev_achievements.utilities.metrics import Metrics
+from dev_achievements.utilities.throttle import file_state
+from dev_achievements.utilities.utils import load_store, save_progress
+
+
+# archive file name suffixes
+ZIP_SUFFIXES = ('.zip', '.whl', '.egg')
+TAR_SUFFIXES = ('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2',
+                '.tar.xz', '.txz')
+
+# separator between an archive path and a member name
+MEMBER_SEP = '!'
+
+# facts of top level definitions seen by this process
+_memo = SubtreeMemo()
+
+
+def is_archive(path):
+    """ Whether the path names a supported archive (by suffix) """
+    return path.lower().endswith(ZIP_SUFFIXES + TAR_SUFFIXES)
+
+
+def iter_archive(path):
+    """ Streams the .py members of an archive, reading each one from
+    the archive in memory.
+
+    Args:
+        path (str): path of zip/wheel/tar archive
+
+    Yields:
+        tuple: (archive!member name, member bytes)
+    """
+    if path.lower().endswith(ZIP_SUFFIXES):
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or not info.filename.endswith('.py'):
+                    continue
+                yield path + MEMBER_SEP + info.filename, archive.read(info)
+        return
+    # tar archives are streamed ('r|*'), members are read in order
+    with tarfile.open(path, 'r|*') as archive:
+        for member in archive:
+            if not member.isfile() or not member.name.endswith('.py'):
+                continue
+            data = archive.extractfile(member).read()
+            yield path + MEMBER_SEP + member.name, data
+    return
+
+
+def split_member(name):
+    """ Splits the name of an archive member into the archive path and
+    member name.
+
+    Args:
+        name (str): source name
+
+    Returns:
+        tuple: (archive path, member name), None if not a member name
+    """
+    start = 0
+    while True:
+        index = name.find(MEMBER_SEP, start)
+        if index < 0:
+            return None
+        path = name[:index]
+        if is_archive(path) and os.path.isfile(path):
+            return path, name[index + len(MEMBER_SEP):]
+        start = index + 1
+
+
+def iter_sources(paths, skip_dirs=(), errors=None, archives=True):
+    """ Yields every Python source in the given files, directories and
+    archives. Plain files are read by whoever analyzes them.
+
+    Args:
+        paths (list[str]): files, directories or archives
+        skip_dirs (tuple[str]): names of directories not to walk
+        errors (list, optional): collects (path, error) of unreadable
+            archives instead of raising
+        archives (bool): whether to read archives found in directories
+
+    Yields:
+        tuple: (source name, source bytes, or None for plain files)
+    """
+    for path in paths:
+        if os.path.isfile(path):
+            files = [path]
+        else:
+            files = _walk(path, skip_dirs, archives)
+        for file_path in files:
+            if not is_archive(file_path):
+                yield file_path, None
+                continue
+            try:
+                yield from iter_archive(file_path)
+            except (OSError, zipfile.BadZipFile, tarfile.TarError) as e:
+                if errors is None:
+                    raise
+                errors.append((file_path, f'{e.__class__.__name__}: {e}'))
+    return
+
+
+def _walk(directory, skip_dirs, archives):
+    """ Yields the .py files (and archives) of a directory, in order """
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = sorted(d for d in dirs if d not in skip_dirs)
+        for name in sorted(files):
+            if name.endswith('.py') or (archives and is_archive(name)):
+                yield os.path.join(root, name)
+    return
+
+
+def parallel_map(fn, items, workers=None, window=None):
+    """ Maps fn over items in a process pool, in order, keeping at most
+    window items in flight (so streamed sources aren't all held in
+    memory at once).
+
+    Args:
+        fn (function): picklable function of one item
+        items (iterable): items to map over
+        workers (int, optional): number of processes (defaults to the
+            CPU count, 1 maps in process)
+        window (int, optional): maximum items in flight
+
+    Yields:
+        fn results, in item order
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1:
+        yield from map(fn, items)
+        return
+    window = window or workers * 4
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        pending = collections.deque()
+        for item in items:
+            pending.append(executor.submit(fn, item))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    return
+
+
+def scan_source(source, max_bytes=None, split=False, workers=None,
+                cache=None, dedupe=True):
+    """ Parses and summarizes a single source.
+
+    Args:
+        source (tuple): (name, bytes or None) from iter_sources
+        max_bytes (int, optional): size limit, larger sources are skipped
+        split (bool): whether to parse chunks of the source in parallel
+            (see processing/split.py)
+        workers (int, optional): number of processes, when split
+        cache (ContentCache, optional): summaries by source content
+        dedupe (bool): whether to reuse the facts of top level
+            definitions already seen (see processing/dedupe.py)
+
+    Returns:
+        dict: source name, size in bytes, seconds taken, error (source
+            couldn't be read or parsed), reason it was skipped, number
+            of chunks parsed, whether the summary was cached, number of
+            top level definitions (and of those reused), file state
+            (mtime and size of plain files), content digest and the
+            feature summary
+    """
+    name, data = source
+    result = _new_result(name)
+    start = time.perf_counter()
+    subtrees, reused = _memo.subtrees, _memo.reused
+    if data is None:
+        result['state'] = file_state(name)
+    try:
+        with read_source(name, data, max_bytes) as src:
+            result['bytes'] = src.size
+            result['digest'] = content_key(src.data)
+            key = None
+            if cache is not None:
+                key = content_key(src.data, catalog_key())
+                result['summary'] = cache.get(key)
+                result['cached'] = result['summary'] is not None
+            if not result['cached']:
+                result['summary'], result['chunks'] = \
+                    _summarize(name, src.data, split, workers, dedupe)
+        if key is not None and not result['cached']:
+            cache.put(key, result['summary'])
+    except SourceSkipped as e:
+        result['skipped'] = e.reason
+    except (OSError, SyntaxError, ValueError, RecursionError) as e:
+        result['error'] = f'{e.__class__.__name__}: {e}'
+    result['subtrees'] = _memo.subtrees - subtrees
+    result['reused'] = _memo.reused - reused
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def _new_result(name):
+    """ Gives the result of a source not analyzed yet """
+    return {'name': name, 'bytes': 0, 'seconds': 0.0, 'error': None,
+            'skipped': None, 'chunks': 1, 'cached': False, 'subtrees': 0,
+            'reused': 0, 'state': None, 'digest': None, 'summary': None}
+
+
+def _cached_result(source, max_bytes, cache):
+    """ Looks a source's summary up in the cache.
+
+    Args:
+        source (tuple): (name, bytes or None) from iter_sources
+        max_bytes (int, optional): size limit, larger sources are skipped
+        cache (ContentCache): summaries by source content
+
+    Returns:
+        tuple: (result, as given by scan_source, None on a miss; cache
+            key, None if the source couldn't be read or was skipped)
+    """
+    name, data = source
+    result = _new_result(name)
+    start = time.perf_counter()
+    if data is None:
+        result['state'] = file_state(name)
+    try:
+        with read_source(name, data, max_bytes) as src:
+            result['bytes'] = src.size
+            result['digest'] = content_key(src.data)
+            key = content_key(src.data, catalog_key())
+    except (SourceSkipped, OSError, ValueError):
+        # analyzed (and reported) by scan_source
+        return None, None
+    result['summary'] = cache.get(key)
+    if result['summary'] is None:
+        return None, key
+    result['cached'] = True
+    result['seconds'] = time.perf_counter() - start
+    return result, key
+
+
+def _summarize(name, data, split, workers, dedupe):
+    """ Summarizes source bytes, in parallel chunks if split.
+
+    Returns:
+        tuple: (summary, number of chunks parsed)
+    """
+    if split:
+        from dev_achievements.processing.split import summarize_split
+        return summarize_split(data, workers)
+    tree = ast.parse(data, filename=name)
+    if dedupe:
+        return summarize_source(data, tree, _memo), 1
+    return summarize(build_table(tree)), 1
+
+
+def scan(paths, workers=None, unlocked=(), counters=None, max_bytes=None,
+         split_above=None, cache=None, dedupe=True, checkpoint=None,
+         summary_archive=None):
+    """ Scans every source in the given paths for Achievements.
+
+    Args:
+        paths (list[str]): files, directories or archives
+        workers (int, optional): number of processes
+        unlocked (iterable[str]): names of already unlocked Achievements
+        counters (dict, optional): stored totals, for tiered Achievements
+        max_bytes (int, optional): size limit, larger sources are skipped
+        split_above (int, optional): size above which a source is
+            itself parsed in parallel chunks (after all other sources)
+        cache (ContentCache, optional): summaries by source content
+        dedupe (bool): whether to reuse the facts of top level
+            definitions recurring across sources
+        checkpoint (Checkpoint, optional): manifest of finished
+            sources, resumed from (for unchanged sources) and written
+            to at intervals
+        summary_archive (SummaryArchive, optional): archive recording
+            the summary of every analyzed source
+
+    Returns:
+        dict: stats (with the share of top level definitions reused,
+            the dedupe ratio), skipped sources (with reasons), merged
+            summary and the newly unlocked Achievements
+    """
+    errors = []
+    report = {'sources': 0, 'bytes': 0, 'errors': 0, 'cached': 0,
+              'resumed': 0, 'subtrees': 0, 'reused': 0, 'dedupe': 0.0,
+              'skipped': [], 'seconds': 0.0}
+    start = time.perf_counter()
+    summaries = []
+    large = []
+    resumed = []
+    hits = []
+    entries = []
+    sources = iter_sources(paths, errors=errors)
+    if checkpoint is not None:
+        sources = _resume(sources, checkpoint.load(), resumed)
+    if split_above is not None:
+        sources = _defer_large(sources, split_above, large)
+    fn = functools.partial(scan_source, max_bytes=max_bytes, dedupe=dedupe)
+    if cache is not None:
+        # the cache is only used here: workers just analyze the misses
+        keys = collections.deque()
+        sources = _lookup(sources, max_bytes, cache, keys, hits)
+        results = _put(parallel_map(fn, sources, workers), cache, keys)
+    else:
+        results = parallel_map(fn, sources, workers)
+    # resumed (and cached) results are only all known once every source
+    # was listed
+    results = itertools.chain(results,
+                              _scan_split(large, max_bytes, workers, cache),
+                              resumed, hits)
+    profiler = profiling.get_profiler()
+    try:
+        for res in results:
+            if profiler is not None:
+                _count(profiler, res, cache)
+            if res.get('resumed'):
+                report['resumed'] += 1
+            elif checkpoint is not None:
+                checkpoint.add(res)
+            _add_result(report, summaries, res)
+            if summary_archive is not None and res['summary'] is not None:
+                entries.append(summary_entry(res))
+    finally:
+        if checkpoint is not None:
+            checkpoint.flush()
+    if summary_archive is not None:
+        summary_archive.record(entries)
+    report['errors'] += len(errors)
+    if report['subtrees']:
+        report['dedupe'] = report['reused'] / report['subtrees']
+    report['seconds'] = time.perf_counter() - start
+    report['summary'] = merge_summaries(summaries)
+    report['unlocked'] = resolve(report['summary'], unlocked, counters)
+    if profiler is not None:
+        profiler.count('errors', len(errors))
+        profiler.count_unlocks(report['unlocked'])
+    return report
+
+
+def summary_entry(res):
+    """ Gives the summary archive entry of a scanned source, named by
+    absolute path (see processing/archive.py).
+
+    Args:
+        res (dict): scan result of the source
+
+    Returns:
+        dict: archive entry
+    """
+    member = split_member(res['name'])
+    if member is not None:
+        name = os.path.abspath(member[0]) + MEMBER_SEP + member[1]
+    else:
+        name = os.path.abspath(res['name'])
+    return {'name': name, 'state': res['state'], 'digest': res['digest'],
+            'summary': res['summary']}
+
+
+def _add_result(report, summaries, res):
+    """ Adds a source's result to the report stats (and its summary
+    to those to merge)
+    """
+    report['sources'] += 1
+    report['bytes'] += res['bytes']
+    report['cached'] += res['cached']
+    report['subtrees'] += res['subtrees']
+    report['reused'] += res['reused']
+    if res['skipped'] is not None:
+        report['skipped'].append({'name': res['name'],
+                                  'reason': res['skipped']})
+    elif res['error'] is not None:
+        report['errors'] += 1
+    else:
+        summaries.append(res['summary'])
+    return
+
+
+def _resume(sources, done, resumed):
+    """ Passes sources through, holding back (into resumed, with their
+    recorded results) those unchanged since a checkpoint.
+    """
+    for name, data in sources:
+        result = done.get(name)
+        if result is not None and unchanged(name, data, result):
+            resumed.append(dict(result, resumed=True))
+            continue
+        yield name, data
+    return
+
+
+def _lookup(sources, max_bytes, cache, keys, hits):
+    """ Passes sources through, holding back (into hits, with their
+    results) those whose summary is cached. The cache key of each
+    source passed through is added to keys.
+    """
+    for source in sources:
+        result, key = _cached_result(source, max_bytes, cache)
+        if result is not None:
+            hits.append(result)
+            continue
+        keys.append(key)
+        yield source
+    return
+
+
+def _put(results, cache, keys):
+    """ Passes the results of the sources passed through by _lookup
+    through, in order, caching their summaries
+    """
+    for res in results:
+        key = keys.popleft()
+        if key is not None and res['summary'] is not None:
+            cache.put(key, res['summary'])
+        yield res
+    return
+
+
+def _count(profiler, res, cache):
+    """ Records a scanned source's stats on the active profiler """
+    profiler.count('sources')
+    profiler.count('bytes', res['bytes'])
+    if res['skipped'] is not None:
+        profiler.count('skipped')
+        return
+    if res['error'] is not None:
+        profiler.count('errors')
+        return
+    if cache is not None:
+        profiler.count('cache_hits' if res['cached'] else 'cache_misses')
+    profiler.record_phase('source', res['seconds'])
+    return
+
+
+def _defer_large(sources, split_above, large):
+    """ Passes sources through, holding back (into large) those over
+    split_above bytes.
+    """
+    for name, data in sources:
+        try:
+            size = len(data) if data is not None else os.path.getsize(name)
+        except OSError:
+            size = 0
+        if size > split_above:
+            large.append((name, data))
+            continue
+        yield name, data
+    return
+
+
+def _scan_split(large, max_bytes, workers, cache):
+    """ Scans the held back large sources one at a time, each parsed in
+    parallel chunks (only once all other sources are done).
+    """
+    for source in large:
+        yield scan_source(source, max_bytes, split=True, workers=workers,
+                          cache=cache)
+    return
+
+
+def _run(args):
+    """ Runs the scan command """
+    if args.checkpoint:
+        # a preempted scan exits normally, writing its checkpoint
+        signal.signal(signal.SIGTERM, _terminate)
+    metrics_path = args.metrics or os.environ.get(METRICS_ENV)
+    if metrics_path:
+        profiling.enable(Metrics())
+    try:
+        return _report(args)
+    finally:
+        if metrics_path:
+            profiling.disable().write_textfile(metrics_path)
+
+
+def _terminate(signum, frame):
+    """ Exits on a termination signal (running finally blocks) """
+    sys.exit(128 + signum)
+
+
+def _report(args):
+    """ Scans, saves and prints the report of the scan command """
+    store = load_store()
+    cache = None if args.no_cache else ContentCache.from_env(args.cache_dir)
+    checkpoint = None
+    if args.checkpoint:
+        max_bytes = args.max_bytes or max_source_bytes()
+        checkpoint = Checkpoint(args.checkpoint, {'max_bytes': max_bytes})
+    report = scan(args.paths, workers=args.workers,
+                  unlocked=store.get('unlocked') or [],
+                  counters=store.get('counters'), max_bytes=args.max_bytes,
+                  split_above=args.split_above, cache=cache,
+                  dedupe=not args.no_dedupe, checkpoint=checkpoint,
+                  summary_archive=SummaryArchive() if args.save else None)
+    if args.save:
+        save_progress(report['unlocked'], report['summary']['counts'],
+                      {n: time.time() for n in report['unlocked']})
+    if args.json:
+        print(json.dumps(report, indent=4))
+        return 0
+    print(f'{report["sources"]} sources, {report["bytes"] / 2 ** 20:.1f} MB'
+          + f' in {report["seconds"]:.2f}s ({report["errors"]} errors,'
+          + f' {len(report["skipped"])} skipped, {report["cached"]} cached,'
+          + f' {report["resumed"]} resumed)')
+    if report['subtrees']:
+        print(f'{report["reused"]} of {report["subtrees"]} definitions'
+              + f' deduplicated ({report["dedupe"]:.1%})')
+    for skipped in report['skipped']:
+        print(f'skipped {skipped["name"]}: {skipped["reason"]}')
+    for name in report['unlocked']:
+        print(f'    {name}')
+    return 0
+
+
+def add_command(commands):
+    """ Registers the scan command.
+
+    Args:
+        commands: argparse subparsers action
+    """
+    parser = commands.add_parser(
+        'scan', help='unlock Achievements from files, directories'
+        + ' and archives')
+    parser.add_argument('paths', nargs='+',
+                        help='files, directories or zip/wheel/tar archives')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='number of processes (default: CPU count)')
+    parser.add_argument('--max-bytes', type=int, default=None,
+                        help='skip sources larger than this (default:'
+                        + f' ${MAX_SOURCE_ENV} or {MAX_SOURCE_BYTES})')
+    parser.add_argument('--split-above', type=int, default=None,
+                        help='parse sources larger than this in parallel'
+                        + ' chunks')
+    parser.add_argument('--cache-dir', default=None,
+                        help='shared cache of summaries by content'
+                        + f' (default: ${CACHE_ENV})')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='analyze every source, even if cached')
+    parser.add_argument('--no-dedupe', action='store_true',
+                        help="don't reuse the facts of definitions"
+                        + ' recurring across sources')
+    parser.add_argument('--checkpoint', default=None,
+                        help='manifest of finished sources: written as the'
+                        + ' scan goes, and resumed from on restart')
+    parser.add_argument('--save', action='store_true',
+                        help='save unlocks and counters to the store (and the'
+                        + ' summaries of the sources, for replay)')
+    parser.add_argument('--metrics', default=None,
+                        help='add the stats to a Prometheus text file'
+                        + f' (default: ${METRICS_ENV})')
+    parser.add_argument('--json', action='store_true',
+                        help='print the report as JSON')
+    parser.set_defaults(func=_run)
+    return parser
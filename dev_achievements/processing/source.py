@@ -0,0 +1,135 @@
+# source.py
+# ---------
+# Reads source files as bytes and hands them straight to the parser,
+# which decodes them itself (PEP 263 coding cookies and UTF-8 BOMs).
+# Large files are memory mapped rather than read into memory, and
+# files above a size limit are skipped with a reason.
+
+import io
+import mmap
+import os
+import tokenize
+
+from dev_achievements.utilities.constants import MAX_SOURCE_ENV
+
+
+# sources at least this big (in bytes) are memory mapped
+MMAP_THRESHOLD = 1 << 20
+
+# default largest source (in bytes) that gets processed
+MAX_SOURCE_BYTES = 16 << 20
+
+
+class SourceSkipped(Exception):
+    """ Raised when a source is deliberately not processed.
+
+    Attributes:
+        name (str): source name
+        reason (str): why the source was skipped
+    """
+
+    def __init__(self, name, reason):
+        super().__init__(f'skipped {name}: {reason}')
+        self.name = name
+        self.reason = reason
+
+
+class Source:
+    """ Bytes of a source file, memory mapped for large files. Usable
+    as a context manager, which closes the mapping on exit.
+
+    Attributes:
+        name (str): source name (file path for plain files)
+        data (bytes or mmap.mmap): source bytes, for ast.parse
+        size (int): size in bytes
+    """
+    __slots__ = ('name', 'data', 'size')
+
+    def __init__(self, name, data):
+        self.name = name
+        self.data = data
+        self.size = len(data)
+
+    @property
+    def encoding(self):
+        """ str: source encoding, from its coding cookie or BOM """
+        return detect_encoding(self.data)
+
+    def close(self):
+        """ Releases the memory mapping, if any """
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+
+def max_source_bytes():
+    """ Gives the largest source size to process, from the environment
+    (MAX_SOURCE_ENV) or the default.
+
+    Returns:
+        int: size limit in bytes
+    """
+    value = os.environ.get(MAX_SOURCE_ENV)
+    return int(value) if value else MAX_SOURCE_BYTES
+
+
+def read_source(name, data=None, max_bytes=None):
+    """ Reads a source as bytes, memory mapping files of at least
+    MMAP_THRESHOLD bytes.
+
+    Args:
+        name (str): source name (file path for plain files)
+        data (bytes, optional): source bytes, if already read
+        max_bytes (int, optional): size limit (defaults to
+            max_source_bytes())
+
+    Raises:
+        SourceSkipped: if the source is over the size limit
+
+    Returns:
+        Source: source bytes
+    """
+    if max_bytes is None:
+        max_bytes = max_source_bytes()
+    size = len(data) if data is not None else os.path.getsize(name)
+    if size > max_bytes:
+        raise SourceSkipped(name, f'{size} bytes is over the'
+                            + f' {max_bytes} byte limit')
+    if data is not None:
+        return Source(name, data)
+    with open(name, 'rb') as file:
+        if size < MMAP_THRESHOLD:
+            return Source(name, file.read())
+        return Source(name, mmap.mmap(file.fileno(), 0,
+                                      access=mmap.ACCESS_READ))
+
+
+def detect_encoding(data):
+    """ Detects the encoding of source bytes from a PEP 263 coding
+    cookie or UTF-8 BOM in the first two lines (only those are read).
+
+    Args:
+        data (bytes or mmap.mmap): source bytes
+
+    Raises:
+        SyntaxError: for an unknown or BOM-conflicting coding cookie
+
+    Returns:
+        str: encoding name
+    """
+    end = 0
+    for _ in range(2):
+        end = data.find(b'\n', end) + 1
+        if not end:
+            end = len(data)
+            break
+    encoding, _ = tokenize.detect_encoding(io.BytesIO(data[:end]).readline)
+    return encoding
+
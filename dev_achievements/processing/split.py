@@ -0,0 +1,181 @@
+# split.py
+# --------
+# Summarizes very large single sources in parallel: the source is cut
+# at top level statement boundaries, the chunks are parsed and
+# summarized in a process pool, and the chunk summaries are merged.
+# Whenever a split could change the result (a cut that isn't really a
+# statement boundary, or a pattern join that spans chunks and can't be
+# known up front) the whole source is parsed instead.
+
+import ast
+import re
+
+from dev_achievements.achievements import Achievement
+from dev_achievements.processing.patterns import compile_pattern
+from dev_achievements.processing.scanner import parallel_map
+from dev_achievements.processing.source import detect_encoding
+from dev_achievements.processing.summary import merge_summaries, summarize
+from dev_achievements.processing.visitor import build_table
+
+
+# default target chunk size (in bytes)
+CHUNK_BYTES = 1 << 20
+
+# line starting in column 0 with something other than whitespace,
+# a comment or a closing bracket
+_LINE_START_RE = re.compile(rb'\n(?=[^\s#)\]}])')
+
+# keywords continuing the previous (compound) statement
+_CONTINUATION_RE = re.compile(rb'(?:else|elif|except|finally)\b')
+
+# joined field values that can be collected from the raw source: a
+# superset of the definitions (matches in strings and comments are
+# included), checked against the parsed chunks afterwards
+_JOIN_SEEDS = {
+    (ast.FunctionDef, 'name'): re.compile(rb'^[ \t]*def[ \t]+(\w+)', re.M),
+    (ast.AsyncFunctionDef, 'name'):
+        re.compile(rb'^[ \t]*async[ \t]+def[ \t]+(\w+)', re.M),
+    (ast.ClassDef, 'name'): re.compile(rb'^[ \t]*class[ \t]+(\w+)', re.M),
+}
+
+
+def find_boundaries(data, chunk_bytes):
+    """ Finds top level statement boundaries splitting the source into
+    chunks of about chunk_bytes.
+
+    A boundary is a line starting in column 0, that doesn't continue
+    the previous statement (else, except, ...) or follow a decorator.
+    Lines inside strings or brackets can look the same - those cuts
+    leave the chunk before them unterminated, so it fails to parse.
+
+    Args:
+        data (bytes or mmap.mmap): source bytes
+        chunk_bytes (int): target chunk size
+
+    Returns:
+        list[int]: byte offsets of chunk starts (the first is 0)
+    """
+    starts = [0]
+    pos = chunk_bytes
+    while pos < len(data):
+        match = _LINE_START_RE.search(data, pos)
+        if match is None:
+            break
+        start = match.end()
+        pos = start + 1
+        if _CONTINUATION_RE.match(data, start):
+            continue
+        prev = data.rfind(b'\n', 0, start - 1) + 1
+        if data[prev:prev + 1] == b'@':
+            continue
+        starts.append(start)
+        pos = start + chunk_bytes
+    return starts
+
+
+def join_keys(achievements=None):
+    """ Gives the (node class, field) pairs joined on by the patterns
+    of the Achievements.
+
+    Args:
+        achievements (list[type], optional): Achievements (defaults to
+            all of them)
+
+    Returns:
+        set: (node class, field) pairs
+    """
+    if achievements is None:
+        achievements = Achievement.subclasses()
+    keys = set()
+    for ach in achievements:
+        if ach.pattern is not None:
+            keys |= compile_pattern(ach.pattern).joins
+    return keys
+
+
+def _summarize_chunk(task):
+    """ Parses and summarizes a chunk, with the whole source's join
+    values seeded into its table.
+
+    Args:
+        task (tuple): (chunk bytes, seeded join values by key)
+
+    Returns:
+        tuple: (summary, the chunk's own join values by key), None if
+            the chunk doesn't parse
+    """
+    chunk, seeds = task
+    try:
+        table = build_table(ast.parse(chunk))
+    except (SyntaxError, ValueError):
+        return None
+    own = {key: {getattr(n, key[1]) for n in table.get(key[0], [])}
+           for key in seeds}
+    table.values.update((key, set(values)) for key, values in seeds.items())
+    return summarize(table), own
+
+
+def summarize_split(data, workers=None, chunk_bytes=CHUNK_BYTES):
+    """ Summarizes a source by parsing chunks of it in parallel,
+    falling back to parsing the whole source when a split would be
+    ambiguous.
+
+    Args:
+        data (bytes or mmap.mmap): source bytes
+        workers (int, optional): number of processes
+        chunk_bytes (int): target chunk size
+
+    Raises:
+        SyntaxError: if the source doesn't parse
+
+    Returns:
+        tuple: (summary, number of chunks parsed, 1 if not split)
+    """
+    starts = find_boundaries(data, chunk_bytes)
+    seeds = _seed_joins(data, join_keys())
+    if len(starts) > 1 and seeds is not None:
+        results = list(parallel_map(_summarize_chunk,
+                                    _chunks(data, starts, seeds), workers))
+        if all(r is not None for r in results) \
+                and all(_own_values(results, key) == values
+                        for key, values in seeds.items()):
+            summary = merge_summaries(r[0] for r in results)
+            summary['counts']['Module'] = 1
+            return summary, len(starts)
+    return summarize(build_table(ast.parse(data))), 1
+
+
+def _seed_joins(data, keys):
+    """ Collects the join values of the whole source, None if any key
+    can't be collected without parsing.
+    """
+    encoding = detect_encoding(data)
+    seeds = {}
+    for key in keys:
+        regex = _JOIN_SEEDS.get(key)
+        if regex is None:
+            return None
+        seeds[key] = {m.decode(encoding) for m in regex.findall(data)}
+    return seeds
+
+
+def _chunks(data, starts, seeds):
+    """ Yields the chunk tasks, re-declaring the source encoding in
+    every chunk after the first.
+    """
+    encoding = detect_encoding(data)
+    cookie = b''
+    if encoding not in ('utf-8', 'utf-8-sig'):
+        cookie = f'# -*- coding: {encoding} -*-\n'.encode()
+    ends = starts[1:] + [len(data)]
+    for i, (start, end) in enumerate(zip(starts, ends)):
+        yield (cookie if i else b'') + data[start:end], seeds
+    return
+
+
+def _own_values(results, key):
+    """ Gives the union of the chunks' own join values """
+    values = set()
+    for _, own in results:
+        values |= own[key]
+    return values
@@ -0,0 +1,154 @@
+# summary.py
+# ----------
+# Compact feature summaries of analyzed sources: node counts, results
+# of every Achievement tree pattern, and results of custom checks.
+# Achievements can then be evaluated (and summaries of many sources
+# merged) without keeping or re-parsing any syntax tree.
+
+from dev_achievements.achievements import Achievement, TieredAchievement
+from dev_achievements.processing.patterns import compile_pattern
+
+
+# bumped whenever the summary schema changes
+SUMMARY_VERSION = 1
+
+
+def _is_custom(ach):
+    """ Whether the Achievement has a custom _check_condition, which can
+    only be recorded by its result.
+    """
+    return ach.pattern is None and not ach.is_presence() \
+        and not issubclass(ach, TieredAchievement)
+
+
+def catalog_key(achievements=None):
+    """ Identifies what summaries record for the Achievement catalog, so
+    cached summaries are only reused by the same catalog.
+
+    Args:
+        achievements (list[type], optional): Achievements (defaults to
+            all of them)
+
+    Returns:
+        str: catalog key
+    """
+    if achievements is None:
+        achievements = Achievement.subclasses()
+    parts = [str(SUMMARY_VERSION)]
+    for ach in achievements:
+        types = ','.join(t.__name__ for t in ach.node_types)
+        parts.append(f'{ach.__module__}.{ach.__name__}:{ach.pattern}:{types}')
+    return '\n'.join(parts)
+
+
+def summarize(nodes, achievements=None, unlocked=()):
+    """ Summarizes an AST node table.
+
+    Args:
+        nodes (dict): table of ast.AST nodes in tree
+        achievements (list[type], optional): Achievements whose facts to
+            record (defaults to all of them)
+        unlocked (iterable[str]): names of unlocked Achievements, whose
+            custom checks aren't run (their results no longer matter)
+
+    Returns:
+        dict: summary with version, counts (by node class name),
+            patterns (pattern to bool) and checks (Achievement name to
+            bool, for custom checks)
+    """
+    if achievements is None:
+        achievements = Achievement.subclasses()
+    unlocked = set(unlocked)
+    patterns = {}
+    checks = {}
+    for ach in achievements:
+        if ach.pattern is not None:
+            if ach.pattern not in patterns:
+                patterns[ach.pattern] = compile_pattern(ach.pattern).exists(nodes)
+        elif _is_custom(ach) and ach.__name__ not in unlocked:
+            checks[ach.__name__] = bool(ach()._check_condition(nodes))
+    return {
+        'version': SUMMARY_VERSION,
+        'counts': {c.__name__: len(n) for c, n in nodes.items() if n},
+        'patterns': patterns,
+        'checks': checks,
+    }
+
+
+def merge_summaries(summaries):
+    """ Merges summaries of many sources: counts are added, and patterns
+    and checks hold if they held in any source.
+
+    Args:
+        summaries (iterable[dict]): summaries to merge
+
+    Returns:
+        dict: merged summary
+    """
+    merged = {'version': SUMMARY_VERSION, 'counts': {}, 'patterns': {},
+              'checks': {}}
+    for summary in summaries:
+        counts = merged['counts']
+        for name, count in summary['counts'].items():
+            counts[name] = counts.get(name, 0) + count
+        for field in ('patterns', 'checks'):
+            facts = merged[field]
+            for key, value in summary[field].items():
+                facts[key] = facts.get(key, False) or value
+    return merged
+
+
+def met(summary, ach, counters=None):
+    """ Evaluates an Achievement's condition on a summary.
+
+    Args:
+        summary (dict): feature summary
+        ach (type): Achievement class
+        counters (dict, optional): stored totals, for tiered Achievements
+
+    Returns:
+        bool: whether the condition holds, or None if the summary doesn't
+            hold the facts needed (the source must be parsed again)
+    """
+    counts = summary['counts']
+    if issubclass(ach, TieredAchievement):
+        counters = counters or {}
+        total = sum(counts.get(t.__name__, 0) + counters.get(t.__name__, 0)
+                    for t in ach.node_types)
+        return total >= ach.threshold
+    if ach.is_presence():
+        return any(counts.get(t.__name__) for t in ach.node_types)
+    if ach.pattern is not None:
+        return summary['patterns'].get(ach.pattern)
+    return summary['checks'].get(ach.__name__)
+
+
+def resolve(summary, unlocked=(), counters=None):
+    """ Gives the Achievements unlocked by a (merged) summary, following
+    dependencies until nothing more can be unlocked. The result doesn't
+    depend on the order sources were summarized in.
+
+    Args:
+        summary (dict): feature summary
+        unlocked (iterable[str]): names of already unlocked Achievements
+        counters (dict, optional): stored totals, for tiered Achievements
+
+    Returns:
+        list[str]: names of newly unlocked Achievements
+    """
+    unlocked = set(unlocked)
+    new = []
+    changed = True
+    while changed:
+        changed = False
+        for ach in Achievement.subclasses():
+            name = ach.__name__
+            if name in unlocked:
+                continue
+            if not all(d.__name__ in unlocked for d in ach.dependencies):
+                continue
+            if met(summary, ach, counters):
+                unlocked.add(name)
+                new.append(name)
+                changed = True
+    return new
@@ -3,52 +3,398 @@
 # Contains utilities for building and traversing an Achievement 
 # tree (for finding Achievements to unlock next, etc.).
 
+import re
+import time
+import warnings
+
 from dev_achievements.achievements import *
-from dev_achievements.utilities.utils import load_store, save_completed
+from dev_achievements.utilities.constants import VERSION
+from dev_achievements.utilities.utils import (load_store, save_progress,
+                                              write_store)
+
+
+# CPU seconds a single check may take before it counts as a strike,
+# plus NODE_BUDGET per node checked (so large valid sources, whose
+# checks take longer, never count as strikes)
+CHECK_BUDGET = 0.05
+NODE_BUDGET = 20e-6
+
+# strikes in a row (checks over budget or raising) before quarantine
+QUARANTINE_STRIKES = 3
+
+# package version prefixed to quarantine reasons
+_VERSION_RE = re.compile(r'^\[([^\]]*)\] ')
+
+
+def quarantine_version(reason):
+    """ Gives the package version an Achievement was quarantined by.
+
+    Args:
+        reason (str): stored quarantine reason
+
+    Returns:
+        str: package version, None if unknown
+    """
+    match = _VERSION_RE.match(reason)
+    return match.group(1) if match else None
+
+
+def release(names=None):
+    """ Releases quarantined Achievements, clearing their strikes.
+
+    Args:
+        names (iterable[str], optional): Achievements to release
+            (defaults to all of them)
+
+    Returns:
+        list[str]: names of released Achievements
+    """
+    store = dict(load_store())
+    quarantined = dict(store.get('quarantined') or {})
+    released = sorted(quarantined if names is None
+                      else set(names) & set(quarantined))
+    if not released:
+        return released
+    stats = {name: dict(s) for name, s in (store.get('stats') or {}).items()}
+    for name in released:
+        del quarantined[name]
+        if name in stats:
+            stats[name]['strikes'] = 0
+    store.update(quarantined=quarantined, stats=stats)
+    write_store(store)
+    return released
 
 
 class AchievementTree:
     """ Tree of Achievements with dependencies as edges.
 
+    Achievements are only instantiated once they reach the frontier
+    (still locked, with all dependencies unlocked), so building the
+    tree costs nothing for Achievements already unlocked or still
+    out of reach.
+
+    Unlocks are batched, and only written to the store on save.
+
+    Every check is timed and its cost and hit rate kept in the store,
+    so checks can be run cheapest and most likely first. A check that
+    raises or takes longer than the budget (in CPU time, so a loaded
+    machine doesn't count) gets a strike instead of crashing the
+    script, and a clean check clears the strikes. Achievements with
+    enough strikes in a row are quarantined: never checked again until
+    released (see release) or the package is upgraded.
+
     Attributes:
-        nodes (list[Achievement]): all Achievements
-        queue (list[Achievement]): list of unlockable Achievements
+        unlocked (set[str]): names of unlocked Achievements
+        counters (dict): stored node counters from previous runs
+        pending (list[str]): names unlocked since the last save
+        unlocked_at (dict): unlock timestamps of pending Achievements
+        timestamp (float): unlock time to record (None for the
+            current time), e.g. a commit time when backfilling
+        nodes (dict): instantiated frontier Achievements by class
+        queue (list[Achievement]): list of unlockable Achievements,
+            in check order
+        stats (dict): stored check statistics by Achievement name
+        run_stats (dict): check statistics since the last save
+        quarantined (dict): reason each Achievement was quarantined
+        new_quarantined (dict): quarantined since the last save
+        budget (float): CPU seconds allowed per check
+        record_checks (bool): whether check statistics, strikes and
+            quarantines are saved to the store (not when replaying
+            history, e.g. backfilling)
+
+    Args:
+        record_checks (bool): whether to save check statistics
     """
-    def __init__(self):
+    def __init__(self, record_checks=True):
+        self.record_checks = record_checks
         self._init_nodes()
     
     def _init_nodes(self):
-        """ Creates list of all Achievements according to their unlocked
-        state. Each one prints its unlock message and saves to the store
-        upon being unlocked.
-        """
-        unlocked_ach = load_store(field='unlocked')
-
-        def _create_node(ach):
-            # helper to create achievement with unlocked state and handler
-            unlocked = ach.__name__ in unlocked_ach
-            save_ach = lambda: save_completed(ach.__name__)
-            return ach(unlocked=unlocked, on_unlock=save_ach)
-        
-        self.nodes = [_create_node(a) for a in Achievement.subclasses()]
-        # set node dependencies as references to initialized nodes
-        for node in self.nodes:
-            node.dependencies = [self.nodes[d.uid] for d in node.dependencies]
+        """ Loads the unlocked Achievement names and counters from the
+        store. Nodes are created lazily by the queue.
+        """
+        store = load_store()
+        self.unlocked = set(store.get('unlocked') or [])
+        self.counters = dict(store.get('counters') or {})
+        self.pending = []
+        self.unlocked_at = {}
+        self.timestamp = None
+        self.nodes = {}
+        self.stats = dict(store.get('stats') or {})
+        self.run_stats = {}
+        self.quarantined = {}
+        self.new_quarantined = {}
+        self.budget = CHECK_BUDGET
+        for name, reason in (store.get('quarantined') or {}).items():
+            if quarantine_version(reason) == VERSION:
+                self.quarantined[name] = reason
+            else:
+                # released by an upgrade, with a clean slate
+                self._clear_strikes(name)
+        return
+
+    def _on_unlock(self, node):
+        """ Unlock handler shared by every node, marking it as unlocked
+        until the next save.
+
+        Args:
+            node (Achievement): newly unlocked Achievement
+        """
+        name = node.__class__.__name__
+        self.unlocked.add(name)
+        self.pending.append(name)
+        self.unlocked_at[name] = self.timestamp or time.time()
+        self.nodes.pop(node.__class__, None)
+        return
+
+    def _create_node(self, ach):
+        """ Instantiates a (locked) Achievement of the given class.
+
+        Args:
+            ach (type): Achievement class
+
+        Returns:
+            Achievement: new Achievement
+        """
+        if issubclass(ach, TieredAchievement):
+            return ach(counters=self.counters, on_unlock=self._on_unlock)
+        return ach(on_unlock=self._on_unlock)
+
+    def save(self, counters=None, throttle=None):
+        """ Writes pending unlocks and the given counter deltas to the
+        store, in a single write.
+
+        Args:
+            counters (dict, optional): counter deltas of this run
+            throttle (dict, optional): throttle states of scripts, by
+                path
+
+        Returns:
+            dict: unlock times saved, by Achievement name
+        """
+        saved = self.unlocked_at
+        if self.record_checks:
+            save_progress(self.pending, counters, self.unlocked_at,
+                          stats=self.run_stats,
+                          quarantined=self.new_quarantined, throttle=throttle)
+        else:
+            save_progress(self.pending, counters, self.unlocked_at,
+                          throttle=throttle)
+        self.pending = []
+        self.unlocked_at = {}
+        for name, run in self.run_stats.items():
+            stored = self.stats.setdefault(name, dict.fromkeys(run, 0))
+            for field, value in run.items():
+                stored[field] += value
+        self.run_stats = {}
+        self.new_quarantined = {}
+        return saved
+
+    def check(self, nodes, summary=None):
+        """ Checks and unlocks all possible Achievements against the
+        given AST node table, until no more can be unlocked.
+
+        Args:
+            nodes (dict): table of ast.AST nodes in tree
+            summary (dict, optional): feature summary of earlier
+                sources (e.g. notebook cells), Achievements it already
+                meets unlock without being checked
+
+        Returns:
+            list[Achievement]: newly unlocked Achievements
+        """
+        unlocked = []
+        checked = set()
+        # (NodeTable.values is its cache of field values)
+        size = sum(map(len, dict.values(nodes)))
+        budget = self.budget + NODE_BUDGET * size
+        queue = self.queue
+        while queue:
+            # each Achievement is checked once, unlocks add the next
+            # round's Achievements to the frontier
+            checked.update(a.__class__ for a in queue)
+            unlocked += [a for a in queue
+                         if self._met(a, summary)
+                         or self._check_node(a, nodes, budget)]
+            queue = [a for a in self.queue if a.__class__ not in checked]
+        return unlocked
+
+    def _met(self, node, summary):
+        """ Unlocks an Achievement whose condition the summary meets.
+
+        Args:
+            node (Achievement): Achievement to check
+            summary (dict): feature summary (None if there's none)
+
+        Returns:
+            bool: whether the Achievement was unlocked
+        """
+        if summary is None:
+            return False
+        from dev_achievements.processing.summary import met
+        if not met(summary, node.__class__):
+            return False
+        node.unlocked = True
+        return True
+
+    def _check_node(self, node, nodes, budget):
+        """ Checks a single Achievement, timing it and handing out a
+        strike if it raises or goes over budget.
+
+        Args:
+            node (Achievement): Achievement to check
+            nodes (dict): table of ast.AST nodes in tree
+            budget (float): CPU seconds the check may take
+
+        Returns:
+            bool: whether the Achievement was unlocked
+        """
+        name = node.__class__.__name__
+        error = None
+        start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            status = node.check(nodes)
+        except Exception as e:
+            status = False
+            error = f'raised {e.__class__.__name__}: {e}'
+        cpu = time.thread_time() - cpu_start
+        elapsed = time.perf_counter() - start
+        stats = self._run_stats(name)
+        stats['checks'] += 1
+        stats['hits'] += bool(status)
+        stats['seconds'] += elapsed
+        if error is None and cpu > budget:
+            error = f'took {cpu:.3f}s of CPU (budget {budget:.3f}s)'
+        if error is not None:
+            stats['strikes'] += 1
+            self._strike(node.__class__, error)
+        elif self._strikes(name):
+            self._clear_strikes(name)
+        return status
+
+    def _run_stats(self, name):
+        """ Gives the check statistics of an Achievement since the last
+        save
+        """
+        return self.run_stats.setdefault(
+            name, {'checks': 0, 'hits': 0, 'seconds': 0.0, 'strikes': 0})
+
+    def _strikes(self, name):
+        """ Gives an Achievement's strikes in a row, stored and since
+        the last save
+        """
+        return self.stats.get(name, {}).get('strikes', 0) \
+            + self.run_stats.get(name, {}).get('strikes', 0)
+
+    def _clear_strikes(self, name):
+        """ Clears an Achievement's strikes (stored statistics are
+        added up, so the stored strikes are taken back)
+        """
+        self._run_stats(name)['strikes'] = \
+            -self.stats.get(name, {}).get('strikes', 0)
+        return
+
+    def _strike(self, ach, reason):
+        """ Reports a failed check, quarantining the Achievement once it
+        has QUARANTINE_STRIKES strikes.
+
+        Args:
+            ach (type): Achievement class
+            reason (str): what went wrong
+        """
+        name = ach.__name__
+        strikes = self._strikes(name)
+        if strikes < QUARANTINE_STRIKES:
+            warnings.warn(f'dev_achievements: {name} check {reason}')
+            return
+        self.quarantined[name] = self.new_quarantined[name] = \
+            f'[{VERSION}] {reason}'
+        self.nodes.pop(ach, None)
+        warnings.warn(f'dev_achievements: {name} check {reason},'
+                      + f' quarantined after {strikes} strikes')
         return
+
+    def _cost(self, ach):
+        """ Expected seconds spent per unlock of the Achievement, from
+        its check statistics (0 without any, so new checks run first).
+
+        Args:
+            ach (type): Achievement class
+
+        Returns:
+            float: expected cost
+        """
+        checks = hits = seconds = 0
+        name = ach.__name__
+        for stats in (self.stats.get(name), self.run_stats.get(name)):
+            if stats:
+                checks += stats['checks']
+                hits += stats['hits']
+                seconds += stats['seconds']
+        if not checks:
+            return 0.0
+        # mean cost over the (smoothed) hit rate
+        return (seconds / checks) / ((hits + 1) / (checks + 2))
+
+    def _is_unlockable(self, ach):
+        """ Determines if the given Achievement class is unlockable.
+        An Achievement is unlockable if it's still locked, and all its
+        dependencies are unlocked.
+
+        Args:
+            ach (type): Achievement class
+
+        Returns:
+            bool: True if unlockable, False otherwise
+        """
+        if ach.__name__ in self.unlocked or ach.__name__ in self.quarantined:
+            return False
+        return all(d.__name__ in self.unlocked for d in ach.dependencies)
     
     @property
     def queue(self):
-        """ Returns a list of unlockable Achievements.
-        An Achievement is unlockable if it's still locked, and all its
-        dependencies are unlocked.
+        """ Returns a list of unlockable Achievements, instantiating
+        any that just reached the frontier, cheapest and most likely
+        to unlock first.
 
         Returns:
             list: All unlockable Achievements
         """
-        def _is_unlockable(node):
-            # helper to determine if given node is unlockable
-            par_unlocked = all([p.unlocked for p in node.dependencies])
-            is_locked = not node.unlocked
-            return par_unlocked and is_locked
-        # filter nodes to unlockable ones
-        return [n for n in self.nodes if _is_unlockable(n)]
+        queue = []
+        for ach in sorted(Achievement.subclasses(), key=self._cost):
+            if not self._is_unlockable(ach):
+                continue
+            node = self.nodes.get(ach)
+            if node is None:
+                node = self._create_node(ach)
+                self.nodes[ach] = node
+            queue.append(node)
+        return queue
+
+
+def _run(args):
+    """ Runs the quarantine command """
+    if args.release or args.all:
+        for name in release(None if args.all else args.release):
+            print(f'released {name}')
+        return 0
+    for name, reason in sorted((load_store().get('quarantined') or {}).items()):
+        print(f'{name}: {reason}')
+    return 0
+
+
+def add_command(commands):
+    """ Registers the quarantine command.
+
+    Args:
+        commands: argparse subparsers action
+    """
+    parser = commands.add_parser(
+        'quarantine', help='list or release quarantined Achievements')
+    parser.add_argument('--release', nargs='+', metavar='NAME', default=[],
+                        help='release the named Achievements')
+    parser.add_argument('--all', action='store_true',
+                        help='release every quarantined Achievement')
+    parser.set_defaults(func=_run)
+    return parser
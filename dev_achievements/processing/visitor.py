@@ -5,21 +5,49 @@
 
 import ast
 
+from dev_achievements.processing.patterns import NodeTable
 from dev_achievements.processing.tree import AchievementTree
 
 
+def build_table(tree):
+    """ Builds the table of ast.AST nodes in tree, without any
+    Achievement processing.
+
+    Args:
+        tree (ast.AST): AST syntax tree
+
+    Returns:
+        NodeTable: table of ast.AST nodes in tree, by node class
+    """
+    table = NodeTable()
+    table.add(tree)
+    todo = [tree]
+    while todo:
+        node = todo.pop()
+        for child in ast.iter_child_nodes(node):
+            table.add(child, node)
+            todo.append(child)
+    return table
+
+
 class Visitor(ast.NodeVisitor):
     """ Traverses the AST syntax tree and processes each node
     accordingly.
 
     Attributes:
         ach_tree (AchievementTree): Achievements in tree structure
-        table (dict): table of ast.AST nodes in tree
+        table (NodeTable): table of ast.AST nodes in tree, with the
+            parent of each node
+
+    Args:
+        ach_tree (AchievementTree, optional): tree to check (defaults
+            to a new one loaded from the store)
     """
-    def __init__(self):
+    def __init__(self, ach_tree=None):
         super().__init__()
-        self.ach_tree = AchievementTree()
-        self.table = {}
+        self.ach_tree = ach_tree if ach_tree is not None else AchievementTree()
+        self.table = NodeTable()
+        self._parent = None
     
     def generic_visit(self, node):
         """ Processes any general AST node type, checking all 
@@ -28,22 +56,33 @@ class Visitor(ast.NodeVisitor):
         Args:
             node (ast.AST): AST syntax tree node
         """
-        node_class = node.__class__
-        curr = self.table.get(node_class, [])
-        self.table[node_class] = curr + [node]
+        self.table.add(node, self._parent)
         # call default visit traversal on node
+        parent, self._parent = self._parent, node
         super().generic_visit(node)
+        self._parent = parent
         return
     
+    def counts(self):
+        """ Gives the number of visited nodes of each type.
+
+        Returns:
+            dict: node counts by ast.AST class name
+        """
+        return {cls.__name__: len(nodes) for cls, nodes in self.table.items()}
+
+    def save(self, throttle=None):
+        """ Saves unlocked Achievements and node counters to the store.
+
+        Args:
+            throttle (dict, optional): throttle states of scripts, by
+                path, saved in the same write
+
+        Returns:
+            dict: unlock times saved, by Achievement name
+        """
+        return self.ach_tree.save(self.counts(), throttle)
+
     def check_achievements(self):
         """ Checks and unlocks all possible Achievements. """
-        unlocked = []
-        changed = True
-        check_ach = lambda ach: ach.check(self.table)
-        while changed:
-            # check if any Achievements have been unlocked
-            checks = [(a, check_ach(a)) for a in self.ach_tree.queue]
-            changed = any(c[1] for c in checks)
-            # accumulate and return unlocked Achievements
-            unlocked += [a for a, ch in checks if ch]
-        return unlocked
+        return self.ach_tree.check(self.table)
@@ -0,0 +1,126 @@
+# features.py
+# -----------
+# Vectorized analytics over batches of sources: a files x node type
+# count matrix (optionally written straight to a memory-mappable .npy
+# file), and every presence-style Achievement evaluated as column
+# operations over it. Requires NumPy.
+
+import ast
+
+from dev_achievements.achievements import Achievement
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+
+# deprecated node classes, never produced by ast.parse
+_DEPRECATED = {'Num', 'Str', 'Bytes', 'NameConstant', 'Ellipsis', 'Index',
+               'ExtSlice', 'Suite', 'AugLoad', 'AugStore', 'Param'}
+
+
+def _node_classes():
+    """ Gives every concrete ast.AST node class, sorted by name """
+    classes = [c for c in vars(ast).values() if isinstance(c, type)
+               and issubclass(c, ast.AST) and c.__name__ not in _DEPRECATED]
+    concrete = [c for c in classes
+                if not any(s in classes for s in c.__subclasses__())]
+    return sorted(concrete, key=lambda c: c.__name__)
+
+
+# matrix columns: node classes, and their names
+NODE_CLASSES = _node_classes()
+NODE_TYPES = [c.__name__ for c in NODE_CLASSES]
+_COLUMNS = {c: i for i, c in enumerate(NODE_CLASSES)}
+
+
+def _require_numpy():
+    """ Raises an ImportError if NumPy isn't installed """
+    if np is None:
+        raise ImportError('feature matrices require numpy'
+                          + ' (pip install dev_achievements[numpy])')
+    return
+
+
+def count_nodes(source):
+    """ Counts the nodes of each type in a source.
+
+    Args:
+        source (str | bytes): Python source code
+
+    Returns:
+        list[int]: count of each NODE_TYPES column (all zero if the
+            source can't be parsed)
+    """
+    row = [0] * len(NODE_CLASSES)
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError, RecursionError):
+        return row
+    columns = _COLUMNS
+    for node in ast.walk(tree):
+        col = columns.get(node.__class__)
+        if col is not None:
+            row[col] += 1
+    return row
+
+
+def feature_matrix(sources, out=None, dtype='int32'):
+    """ Builds the files x node types count matrix of a batch of sources.
+
+    With an output path, rows are written straight to a .npy file
+    (opened with np.load(path, mmap_mode='r') later) instead of being
+    kept in memory; sources must then be a sized sequence.
+
+    Args:
+        sources (iterable[str | bytes]): Python sources
+        out (str, optional): path of .npy file to write
+        dtype (str): count data type
+
+    Returns:
+        numpy.ndarray: counts, columns in NODE_TYPES order (a memmap
+            when written to a file). Unparsable sources have all zero rows.
+    """
+    _require_numpy()
+    if out is None:
+        rows = [count_nodes(s) for s in sources]
+        matrix = np.array(rows, dtype=dtype)
+        return matrix.reshape(len(rows), len(NODE_CLASSES))
+    matrix = np.lib.format.open_memmap(
+        out, mode='w+', dtype=dtype, shape=(len(sources), len(NODE_CLASSES)))
+    for i, source in enumerate(sources):
+        matrix[i] = count_nodes(source)
+    matrix.flush()
+    return matrix
+
+
+def presence_achievements():
+    """ Gives the Achievements that can be evaluated from counts alone """
+    return [a for a in Achievement.subclasses() if a.is_presence()]
+
+
+def achievement_matrix(counts, achievements=None):
+    """ Evaluates presence-style Achievements on a count matrix, as a
+    single boolean matrix product.
+
+    Args:
+        counts (numpy.ndarray): files x node types count matrix
+        achievements (list[type], optional): presence-style Achievements
+            (defaults to all of them)
+
+    Returns:
+        tuple: files x Achievements bool matrix, and the Achievement names
+    """
+    _require_numpy()
+    achievements = achievements or presence_achievements()
+    # node types x Achievements: which types unlock which Achievement
+    unlocks = np.zeros((len(NODE_CLASSES), len(achievements)), dtype=bool)
+    for j, ach in enumerate(achievements):
+        if not ach.is_presence():
+            raise ValueError(f'{ach.__name__} is not a presence-style'
+                             + ' Achievement')
+        for node_type in ach.node_types:
+            unlocks[_COLUMNS[node_type], j] = True
+    matrix = (np.asarray(counts) > 0) @ unlocks
+    return matrix, [a.__name__ for a in achievements]
@@ -0,0 +1,303 @@
+# leaderboard.py
+# --------------
+# Aggregates many Achievement stores (one per user) into rankings,
+# per-Achievement unlock rates and dependency funnel drop-off.
+#
+# Stores are streamed one at a time and each user is kept as a
+# single int bitset of unlocked Achievements, so memory stays bounded
+# by the number of users rather than the size of their stores. NumPy
+# (optional) and sqlite3 are only imported once they're used, so the
+# command line doesn't pay for them on every command.
+
+import heapq
+import json
+import os
+
+from dev_achievements.achievements import Achievement
+
+
+def iter_stores(directory):
+    """ Yields every JSON store under the directory (recursively).
+
+    A user is named after the store file, or after its directory when
+    the file is a plain store.json.
+
+    Args:
+        directory (str): directory of collected stores
+
+    Yields:
+        tuple: (user name, store file path)
+    """
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(root, name)
+            user = os.path.relpath(path, directory)[:-len('.json')]
+            if name == 'store.json' and root != directory:
+                user = os.path.relpath(root, directory)
+            yield user, path
+    return
+
+
+def _numpy():
+    """ Gives the NumPy module (imported on first use), None if it
+    isn't installed
+    """
+    try:
+        import numpy
+    except ImportError:  # pragma: no cover - optional dependency
+        return None
+    return numpy
+
+
+def _popcount(bits):
+    """ Number of set bits in an int """
+    return bin(bits).count('1')
+
+
+class Leaderboard:
+    """ Users x Achievements matrix stored as one bitset per user.
+
+    Attributes:
+        names (list[str]): Achievement name of each column
+        users (list[str]): user name of each row
+        bits (list[int]): unlocked Achievements bitset of each row
+        skipped (list[str]): store paths that couldn't be read
+
+    Args:
+        achievements (list[type], optional): Achievement classes to use
+            as the initial columns (defaults to all of them)
+    """
+    def __init__(self, achievements=None):
+        if achievements is None:
+            achievements = Achievement.subclasses()
+        self.names = []
+        self._index = {}
+        self._deps = {}
+        for ach in achievements:
+            self._column(ach.__name__)
+            self._deps[ach.__name__] = [d.__name__ for d in ach.dependencies]
+        self.users = []
+        self.bits = []
+        self.skipped = []
+
+    def _column(self, name):
+        """ Gives the column index of an Achievement, adding a new column
+        for names not in the catalog (e.g. from a newer version).
+        """
+        index = self._index.get(name)
+        if index is None:
+            index = self._index[name] = len(self.names)
+            self.names.append(name)
+        return index
+
+    def _mask(self, names):
+        """ Bitset of the given Achievement names """
+        mask = 0
+        for name in names:
+            mask |= 1 << self._column(name)
+        return mask
+
+    def add(self, user, unlocked):
+        """ Adds a user row.
+
+        Args:
+            user (str): user name
+            unlocked (list[str]): names of unlocked Achievements
+        """
+        self.users.append(user)
+        self.bits.append(self._mask(unlocked))
+        return
+
+    def load(self, directory):
+        """ Streams every store in the directory (or every profile of
+        a SQLite store) into the matrix.
+
+        Args:
+            directory (str): directory of collected stores, or path of
+                a SQLite store
+
+        Returns:
+            Leaderboard: self, for chaining
+        """
+        if os.path.isfile(directory):
+            from dev_achievements.utilities.store import SQLiteStore
+            store = SQLiteStore(directory)
+            try:
+                for user, unlocked in store.iter_unlocked():
+                    self.add(user, unlocked)
+            finally:
+                store.close()
+            return self
+        for user, path in iter_stores(directory):
+            try:
+                with open(path, 'rb') as file:
+                    unlocked = json.loads(file.read()).get('unlocked', [])
+            except (OSError, ValueError, AttributeError):
+                self.skipped.append(path)
+                continue
+            self.add(user, unlocked)
+        return self
+
+    def matrix(self):
+        """ Gives the full users x Achievements matrix.
+
+        Returns:
+            A NumPy bool array if NumPy is installed, otherwise the
+            list of per-user int bitsets
+        """
+        np = _numpy()
+        if np is None:
+            return list(self.bits)
+        rows = self._packed_rows()
+        if rows is not None:
+            cols = np.arange(len(self.names), dtype=np.uint64)
+            return ((rows[:, None] >> cols) & np.uint64(1)).astype(bool)
+        matrix = np.zeros((len(self.users), len(self.names)), dtype=bool)
+        for row, bits in enumerate(self.bits):
+            for col in range(bits.bit_length()):
+                matrix[row, col] = (bits >> col) & 1
+        return matrix
+
+    def _packed_rows(self):
+        """ Gives the bitsets as a NumPy uint64 array, or None if NumPy
+        isn't installed or there are too many columns to pack.
+        """
+        np = _numpy()
+        if np is None or len(self.names) > 64:
+            return None
+        return np.fromiter(self.bits, dtype=np.uint64, count=len(self.bits))
+
+    def _column_counts(self, masks):
+        """ Counts the users having all bits of each given mask.
+
+        Args:
+            masks (list[int]): bitsets to test
+
+        Returns:
+            list[int]: number of users matching each mask
+        """
+        rows = self._packed_rows()
+        if rows is not None:
+            np = _numpy()
+            return [int(np.count_nonzero(rows & np.uint64(m) == np.uint64(m)))
+                    for m in masks]
+        counts = [0] * len(masks)
+        for bits in self.bits:
+            for i, m in enumerate(masks):
+                if bits & m == m:
+                    counts[i] += 1
+        return counts
+
+    def rankings(self, top=None):
+        """ Ranks users by number of unlocked Achievements.
+
+        Args:
+            top (int, optional): only give the best ranked users
+
+        Returns:
+            list[tuple]: (user, unlocked count), best first
+        """
+        rows = ((-_popcount(b), u) for u, b in zip(self.users, self.bits))
+        rows = heapq.nsmallest(top, rows) if top else sorted(rows)
+        return [(u, -c) for c, u in rows]
+
+    def unlock_rates(self):
+        """ Fraction of users that unlocked each Achievement.
+
+        Returns:
+            dict: Achievement name to unlock rate
+        """
+        total = len(self.users) or 1
+        counts = self._column_counts([1 << i for i in range(len(self.names))])
+        return {n: c / total for n, c in zip(self.names, counts)}
+
+    def funnel(self):
+        """ Dependency funnel of each Achievement with dependencies: of
+        the users that unlocked all dependencies, how many went on to
+        unlock the Achievement.
+
+        Returns:
+            dict: Achievement name to {'eligible', 'unlocked', 'drop_off'}
+        """
+        names = [n for n in self.names if self._deps.get(n)]
+        dep_masks = [self._mask(self._deps[n]) for n in names]
+        full_masks = [m | (1 << self._index[n]) for n, m in zip(names, dep_masks)]
+        counts = self._column_counts(dep_masks + full_masks)
+        eligible, unlocked = counts[:len(names)], counts[len(names):]
+        res = {}
+        for name, e, u in zip(names, eligible, unlocked):
+            drop_off = 1 - u / e if e else 0.0
+            res[name] = {'eligible': e, 'unlocked': u, 'drop_off': drop_off}
+        return res
+
+    def report(self, top=10):
+        """ Gives the full aggregated report.
+
+        Args:
+            top (int): number of ranked users to include
+
+        Returns:
+            dict: JSON serializable report
+        """
+        return {
+            'users': len(self.users),
+            'skipped': len(self.skipped),
+            'rankings': [{'user': u, 'unlocked': c}
+                         for u, c in self.rankings(top)],
+            'unlock_rates': self.unlock_rates(),
+            'funnel': self.funnel(),
+        }
+
+
+def format_report(report):
+    """ Formats an aggregated report as plain text.
+
+    Args:
+        report (dict): report from Leaderboard.report
+
+    Returns:
+        str: report text
+    """
+    lines = [f'{report["users"]} users ({report["skipped"]} skipped)', '']
+    lines.append('Rankings')
+    for i, row in enumerate(report['rankings'], start=1):
+        lines.append(f'{i:>4}. {row["user"]:<30}{row["unlocked"]:>4}')
+    lines += ['', 'Unlock rates']
+    for name, rate in report['unlock_rates'].items():
+        lines.append(f'      {name:<30}{rate:>7.1%}')
+    lines += ['', 'Dependency funnel (eligible -> unlocked, drop-off)']
+    for name, row in report['funnel'].items():
+        lines.append(f'      {name:<30}{row["eligible"]:>7} ->'
+                     + f'{row["unlocked"]:>7}{row["drop_off"]:>8.1%}')
+    return '\n'.join(lines)
+
+
+def _run(args):
+    """ Runs the leaderboard command """
+    report = Leaderboard().load(args.directory).report(top=args.top)
+    if args.json:
+        print(json.dumps(report, indent=4))
+    else:
+        print(format_report(report))
+    return 0
+
+
+def add_command(commands):
+    """ Registers the leaderboard command.
+
+    Args:
+        commands: argparse subparsers action
+    """
+    parser = commands.add_parser(
+        'leaderboard', help='aggregate a directory of Achievement stores')
+    parser.add_argument('directory', help='directory of collected stores,'
+                        + ' or a SQLite store of many profiles')
+    parser.add_argument('--top', type=int, default=10,
+                        help='number of ranked users to show')
+    parser.add_argument('--json', action='store_true',
+                        help='print the report as JSON')
+    parser.set_defaults(func=_run)
+    return parser
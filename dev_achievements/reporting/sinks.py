@@ -0,0 +1,394 @@
+# sinks.py
+# --------
+# Where unlock events go. Each unlock becomes an event (Achievement,
+# time, file and the location that triggered it) handed to the
+# configured sinks: by default the bordered box on stdout, or JSON
+# Lines written to a file or file descriptor (e.g. so scripts whose
+# stdout is piped into other tools keep it clean).
+#
+# JSON Lines sinks buffer events and write them in batches, one write
+# call per batch (appending, so concurrent runs don't interleave
+# lines). Pipes are written whole lines at a time, at most PIPE_BUF
+# bytes per write (so writers sharing a pipe don't interleave lines
+# either), and only as far as they have room for, the rest staying
+# buffered, so a slow reader never blocks the script;
+# whatever is left is drained (for at most a second) when the process
+# exits.
+#
+# usage: DEV_ACHIEVEMENTS_SINK=jsonl:/tmp/unlocks.jsonl python script.py
+#        DEV_ACHIEVEMENTS_SINK=box,jsonl:fd:3 python script.py 3>unlocks
+
+import atexit
+import json
+import os
+import select
+import stat
+import sys
+import time
+import warnings
+
+from dev_achievements.processing.patterns import PatternError, compile_pattern
+from dev_achievements.utilities.constants import SINK_ENV
+from dev_achievements.utilities.utils import bordered
+
+
+# events buffered before a batch is written
+BATCH_EVENTS = 64
+
+# seconds an event stays buffered at most, while events keep coming
+# (e.g. in a notebook session)
+FLUSH_SECONDS = 1.0
+
+# most bytes kept buffered for a reader that doesn't keep up, further
+# events are dropped
+MAX_BUFFERED_BYTES = 1 << 20
+
+# seconds spent draining buffered events when the process exits
+DRAIN_SECONDS = 1.0
+
+# configured sinks (resolved from the environment on first use)
+_sinks = None
+
+
+def _position(node):
+    """ Gives the (line, column) of a node, None if it has none """
+    line = getattr(node, 'lineno', None)
+    if line is None:
+        return None
+    return (line, getattr(node, 'col_offset', 0))
+
+
+def trigger_location(achievement, nodes):
+    """ Finds the location that unlocked an Achievement: the first
+    match of its pattern, the first of its node types, or for tiered
+    Achievements the node that reached the threshold.
+
+    Args:
+        achievement (Achievement): unlocked Achievement
+        nodes (dict): table of ast.AST nodes the Achievement was
+            checked against
+
+    Returns:
+        tuple: (line, column), None if unknown (e.g. custom checks)
+    """
+    if not nodes:
+        return None
+    if achievement.pattern is not None:
+        try:
+            found = compile_pattern(achievement.pattern).matches(nodes)
+        except PatternError:
+            return None
+    else:
+        found = [n for t in achievement.node_types for n in nodes.get(t, ())]
+    positions = sorted(filter(None, map(_position, found)))
+    if not positions:
+        return None
+    threshold = getattr(achievement, 'threshold', 0)
+    if threshold:
+        # the stored counts from previous runs came first
+        stored = sum(achievement.counters.get(t.__name__, 0)
+                     for t in achievement.node_types)
+        index = min(max(threshold - stored - 1, 0), len(positions) - 1)
+        return positions[index]
+    return positions[0]
+
+
+def unlock_events(unlocked, file_path=None, nodes=None, locate=True,
+                  unlocked_at=None):
+    """ Gives the events of newly unlocked Achievements.
+
+    Args:
+        unlocked (list[Achievement]): unlocked Achievements
+        file_path (str, optional): path of source file
+        nodes (dict, optional): table of ast.AST nodes checked, for
+            the triggering locations
+        locate (bool): whether to find the triggering locations
+        unlocked_at (dict, optional): stored unlock time of each
+            Achievement, by name (defaults to now)
+
+    Returns:
+        list[dict]: events, with the Achievement (class name), title,
+            message, timestamp, file, and line and column (None if
+            unknown)
+    """
+    unlocked_at = unlocked_at or {}
+    now = time.time()
+    if file_path is not None:
+        file_path = os.path.abspath(file_path)
+    events = []
+    for a in unlocked:
+        location = trigger_location(a, nodes) if locate else None
+        line, col = location or (None, None)
+        events.append({
+            'achievement': a.__class__.__name__,
+            'title': getattr(a, 'title', None),
+            'message': a.unlock_message,
+            'timestamp': unlocked_at.get(a.__class__.__name__, now),
+            'file': file_path,
+            'line': line,
+            'col': col,
+        })
+    return events
+
+
+class Sink:
+    """ Destination of unlock events.
+
+    Attributes:
+        terminal (bool): whether the sink shows unlocks to the user
+            (notebooks display them as cell output instead)
+        locate (bool): whether the sink uses triggering locations
+    """
+    terminal = False
+    locate = True
+
+    def emit(self, events):
+        """ Hands events to the sink.
+
+        Args:
+            events (list[dict]): unlock events
+        """
+        raise NotImplementedError
+
+    def flush(self):
+        """ Writes any buffered events """
+        return
+
+    def close(self):
+        """ Writes any buffered events and releases the sink """
+        self.flush()
+        return
+
+
+class BoxSink(Sink):
+    """ Prints unlock messages in a bordered box (the default).
+
+    Args:
+        stream (file, optional): text stream to print to (defaults to
+            stdout at the time of printing)
+    """
+    terminal = True
+    locate = False
+
+    def __init__(self, stream=None):
+        self.stream = stream
+
+    def emit(self, events):
+        if events:
+            text = '\n'.join(e['message'] for e in events)
+            print('\n' + bordered(text) + '\n', file=self.stream or sys.stdout)
+        return
+
+
+class JSONLinesSink(Sink):
+    """ Writes unlock events as JSON Lines to a file or file
+    descriptor, in batches.
+
+    Attributes:
+        fd (int): file descriptor written to
+        batch (int): events buffered before a batch is written
+        interval (float): seconds an event stays buffered at most
+        dropped (int): events dropped for lack of buffer space (or,
+            for pipes, longer than PIPE_BUF)
+
+    Args:
+        target (str or int): path of file (appended to), or open file
+            descriptor (left open)
+        batch (int): events buffered before a batch is written
+        interval (float): seconds an event stays buffered at most
+    """
+    def __init__(self, target, batch=BATCH_EVENTS, interval=FLUSH_SECONDS):
+        if isinstance(target, int):
+            self.fd = target
+            self._owned = False
+        else:
+            self.fd = os.open(target,
+                              os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            self._owned = True
+        self.batch = batch
+        self.interval = interval
+        self.dropped = 0
+        self._events = 0
+        self._since = None
+        self._buffer = bytearray()
+        mode = os.fstat(self.fd).st_mode
+        self._pipe = stat.S_ISFIFO(mode) or stat.S_ISSOCK(mode)
+
+    def emit(self, events):
+        for event in events:
+            line = (json.dumps(event) + '\n').encode()
+            if len(self._buffer) + len(line) > MAX_BUFFERED_BYTES \
+                    or self._pipe and len(line) > select.PIPE_BUF:
+                self.dropped += 1
+                continue
+            self._buffer += line
+            self._events += 1
+            if self._since is None:
+                self._since = time.monotonic()
+        if self._events >= self.batch or (
+                self._since is not None
+                and time.monotonic() - self._since >= self.interval):
+            self.flush()
+        return
+
+    def _writable(self, timeout):
+        """ Whether the descriptor takes a write without blocking """
+        if not self._pipe:
+            return True
+        try:
+            return bool(select.select([], [self.fd], [], timeout)[1])
+        except (OSError, ValueError):
+            return False
+
+    def _write(self, timeout=0.0):
+        """ Writes as much of the buffer as the descriptor takes,
+        waiting at most timeout seconds for room.
+
+        Pipes get the whole lines fitting in PIPE_BUF bytes per write
+        (the size a pipe reported writable always takes whole, and
+        atomically), so writes never block, nor cut a line, without
+        changing the descriptor's flags for other processes sharing it.
+        """
+        deadline = time.monotonic() + timeout
+        while self._buffer:
+            if not self._writable(max(deadline - time.monotonic(), 0.0)):
+                break
+            chunk = self._buffer
+            if self._pipe:
+                end = self._buffer.rfind(b'\n', 0, select.PIPE_BUF)
+                chunk = self._buffer[:end + 1]
+            try:
+                written = os.write(self.fd, chunk)
+            except BlockingIOError:
+                break
+            del self._buffer[:written]
+        if not self._buffer:
+            self._events = 0
+            self._since = None
+        return
+
+    def flush(self):
+        self._write()
+        return
+
+    def close(self):
+        try:
+            self._write(DRAIN_SECONDS)
+        except OSError:
+            pass
+        lost = self.dropped + (self._events if self._buffer else 0)
+        if lost:
+            warnings.warn(f'dev_achievements: dropped {lost} unlock events')
+        self._buffer.clear()
+        self._events = self.dropped = 0
+        self._since = None
+        if self._owned:
+            os.close(self.fd)
+            self._owned = False
+        return
+
+
+def parse_sinks(spec):
+    """ Builds sinks from a comma separated spec: 'box', 'none',
+    'jsonl:PATH' or 'jsonl:fd:N'.
+
+    Args:
+        spec (str): sinks spec
+
+    Returns:
+        list[Sink]: sinks
+
+    Raises:
+        ValueError: for unknown sinks
+    """
+    sinks = []
+    for part in filter(None, (p.strip() for p in spec.split(','))):
+        kind, _, target = part.partition(':')
+        if kind == 'box' and not target:
+            sinks.append(BoxSink())
+        elif kind == 'none' and not target:
+            continue
+        elif kind == 'jsonl' and target.startswith('fd:'):
+            sinks.append(JSONLinesSink(int(target[3:])))
+        elif kind == 'jsonl' and target:
+            sinks.append(JSONLinesSink(os.path.expanduser(target)))
+        else:
+            raise ValueError(f'unknown unlock sink {part!r}')
+    return sinks
+
+
+def get_sinks():
+    """ Gives the configured sinks, set from the environment (see
+    SINK_ENV) unless set_sinks was called, and the box otherwise.
+
+    Returns:
+        list[Sink]: sinks
+    """
+    global _sinks
+    if _sinks is None:
+        spec = os.environ.get(SINK_ENV)
+        try:
+            _sinks = parse_sinks(spec) if spec is not None else [BoxSink()]
+        except (OSError, ValueError) as e:
+            warnings.warn(f'dev_achievements: {SINK_ENV} ignored ({e})')
+            _sinks = [BoxSink()]
+    return _sinks
+
+
+def set_sinks(sinks):
+    """ Replaces the configured sinks, closing the previous ones.
+
+    Args:
+        sinks (list[Sink], optional): sinks (None to use the
+            environment again)
+    """
+    global _sinks
+    close_sinks()
+    _sinks = list(sinks) if sinks is not None else None
+    return
+
+
+def shows_unlocks():
+    """ Whether any configured sink shows unlocks to the user """
+    return any(s.terminal for s in get_sinks())
+
+
+def publish(unlocked, file_path=None, nodes=None, unlocked_at=None,
+            terminal=True):
+    """ Hands the events of newly unlocked Achievements to the
+    configured sinks.
+
+    Args:
+        unlocked (list[Achievement]): unlocked Achievements
+        file_path (str, optional): path of source file
+        nodes (dict, optional): table of ast.AST nodes checked, for
+            the triggering locations
+        unlocked_at (dict, optional): stored unlock time of each
+            Achievement, by name
+        terminal (bool): whether to include the sinks showing unlocks
+            to the user
+
+    Returns:
+        list[dict]: published events
+    """
+    sinks = [s for s in get_sinks() if terminal or not s.terminal]
+    if not unlocked or not sinks:
+        return []
+    events = unlock_events(unlocked, file_path, nodes,
+                           locate=any(s.locate for s in sinks),
+                           unlocked_at=unlocked_at)
+    for sink in sinks:
+        sink.emit(events)
+    return events
+
+
+def close_sinks():
+    """ Closes the configured sinks, draining their buffers (run at
+    exit)
+    """
+    for sink in _sinks or ():
+        sink.close()
+    return
+
+
+atexit.register(close_sinks)
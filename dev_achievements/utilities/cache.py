@@ -0,0 +1,253 @@
+# cache.py
+# --------
+# Content-addressed cache of analysis results (JSON values keyed by a
+# hash of the analyzed bytes). A per-user local directory is read
+# through in front of an optional shared one (e.g. a mounted volume
+# used by a whole build farm). Entries are published atomically (temp
+# file + rename), so concurrent writers never leave a partial entry,
+# and each tier is size-bounded with LRU eviction (by modification
+# time, refreshed on every hit). Eviction runs once a process has
+# written an eighth of the bound, or on the first write of a process
+# when the tier wasn't evicted for EVICT_SECONDS (stamped by the
+# modification time of a file in the tier), so short runs each
+# writing a little don't grow the tier past its bound.
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+from dev_achievements.utilities.constants import CACHE_ENV, CACHE_PATH
+
+
+# default size bound of each cache tier, in bytes
+DEFAULT_CACHE_BYTES = 256 << 20
+
+# prefix of entries still being written
+_TEMP_PREFIX = '.tmp-'
+
+# age after which a leftover temp file (crashed writer) is removed
+_STALE_TEMP_SECONDS = 3600
+
+# seconds after which the first write of a process evicts the tier
+EVICT_SECONDS = 600
+
+# file whose modification time is the tier's last eviction
+_EVICT_STAMP = '.evicted'
+
+
+def content_key(data, salt=''):
+    """ Gives the cache key of some content.
+
+    Args:
+        data (bytes or mmap.mmap): content
+        salt (str): anything else the cached value depends on
+
+    Returns:
+        str: hex digest
+    """
+    digest = hashlib.sha256(salt.encode())
+    digest.update(data)
+    return digest.hexdigest()
+
+
+class CacheTier:
+    """ Single cache directory, entries stored as <key[:2]>/<key>.json.
+
+    Attributes:
+        path (str): cache directory
+        max_bytes (int): size bound, enforced by evicting the least
+            recently used entries
+
+    Args:
+        path (str): cache directory
+        max_bytes (int): size bound
+    """
+    def __init__(self, path, max_bytes=DEFAULT_CACHE_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._written = 0
+        self._opened = False
+
+    def _entry(self, key):
+        """ Gives the path of a key's entry """
+        return os.path.join(self.path, key[:2], key + '.json')
+
+    def get(self, key):
+        """ Reads an entry, marking it as recently used.
+
+        Args:
+            key (str): cache key
+
+        Returns:
+            cached value, None on a miss (or an unreadable entry)
+        """
+        path = self._entry(key)
+        try:
+            with open(path, 'r') as file:
+                value = json.load(file)
+        except (OSError, ValueError):
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            # read-only tier, hits just don't count as uses
+            pass
+        return value
+
+    def put(self, key, value):
+        """ Publishes an entry atomically, evicting old entries once
+        enough has been written since the last eviction (or on the first
+        write when the tier wasn't evicted for long).
+
+        Args:
+            key (str): cache key
+            value: JSON serializable value
+        """
+        path = self._entry(key)
+        temp = None
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, temp = tempfile.mkstemp(prefix=_TEMP_PREFIX,
+                                        dir=os.path.dirname(path))
+            with os.fdopen(fd, 'w') as file:
+                json.dump(value, file)
+                size = file.tell()
+            # readable by everyone sharing the cache (mkstemp uses 0600)
+            os.chmod(temp, 0o644)
+            os.replace(temp, path)
+            temp = None
+        except OSError:
+            return
+        finally:
+            if temp is not None:
+                _remove(temp)
+        self._written += size
+        if self._written > self.max_bytes // 8 or self._eviction_due():
+            self.evict()
+        return
+
+    def _eviction_due(self):
+        """ Whether this is the process' first write and the tier
+        wasn't evicted for EVICT_SECONDS
+        """
+        if self._opened:
+            return False
+        self._opened = True
+        try:
+            evicted = os.stat(os.path.join(self.path, _EVICT_STAMP)).st_mtime
+        except OSError:
+            return True
+        return time.time() - evicted >= EVICT_SECONDS
+
+    def evict(self):
+        """ Removes the least recently used entries until the tier is
+        within its size bound (and any stale temp files).
+        """
+        self._written = 0
+        self._opened = True
+        now = time.time()
+        _touch(os.path.join(self.path, _EVICT_STAMP))
+        entries = []
+        total = 0
+        for root, _, files in os.walk(self.path):
+            for name in files:
+                if name == _EVICT_STAMP:
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                if name.startswith(_TEMP_PREFIX):
+                    if now - stat.st_mtime > _STALE_TEMP_SECONDS:
+                        _remove(path)
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            _remove(path)
+            total -= size
+        return
+
+
+def _touch(path):
+    """ Creates a file or updates its modification time, if possible """
+    try:
+        with open(path, 'a'):
+            pass
+        os.utime(path)
+    except OSError:
+        pass
+    return
+
+
+def _remove(path):
+    """ Removes a file, if it's still there """
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+    return
+
+
+class ContentCache:
+    """ Local cache tier read through in front of an optional shared
+    tier: hits in the shared tier are copied to the local one, and new
+    entries are published to both.
+
+    Attributes:
+        tiers (list[CacheTier]): tiers, local first
+
+    Args:
+        shared (str, optional): shared cache directory
+        local (str): per-user local cache directory
+        max_bytes (int): size bound of each tier
+    """
+    def __init__(self, shared=None, local=CACHE_PATH,
+                 max_bytes=DEFAULT_CACHE_BYTES):
+        self.tiers = [CacheTier(local, max_bytes)]
+        if shared:
+            self.tiers.append(CacheTier(shared, max_bytes))
+
+    @classmethod
+    def from_env(cls, shared=None, **kwargs):
+        """ Gives the cache with the given shared directory (defaults to
+        the CACHE_ENV environment variable), None if there's none.
+        """
+        shared = shared or os.environ.get(CACHE_ENV)
+        if not shared:
+            return None
+        return cls(shared, **kwargs)
+
+    def get(self, key):
+        """ Reads an entry from the first tier holding it.
+
+        Args:
+            key (str): cache key
+
+        Returns:
+            cached value, None on a miss
+        """
+        for i, tier in enumerate(self.tiers):
+            value = tier.get(key)
+            if value is not None:
+                for upper in self.tiers[:i]:
+                    upper.put(key, value)
+                return value
+        return None
+
+    def put(self, key, value):
+        """ Publishes an entry to every tier.
+
+        Args:
+            key (str): cache key
+            value: JSON serializable value
+        """
+        for tier in self.tiers:
+            tier.put(key, value)
+        return
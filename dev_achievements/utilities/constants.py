@@ -5,12 +5,65 @@
 import os
 
 
+# package version
+VERSION = '1.0.3'
+
+
 # Achievement store path
 _ROOT_PATH = os.path.expanduser('~')
 STORE_PATH = os.path.join(_ROOT_PATH, '.dev_achievements/store.json')
 
+# SQLite store of many profiles (used once a profile is selected)
+STORE_DB_PATH = os.path.join(_ROOT_PATH, '.dev_achievements/store.db')
+
+# archive of feature summaries of analyzed sources, kept next to the
+# store (summaries/<profile>.jsonl next to a SQLite store)
+SUMMARIES_FILE = 'summaries.jsonl'
+
+# environment variables selecting a profile of a SQLite store, and
+# the store's path (defaults to STORE_DB_PATH)
+STORE_PROFILE_ENV = 'DEV_ACHIEVEMENTS_STORE_PROFILE'
+STORE_DB_ENV = 'DEV_ACHIEVEMENTS_STORE_DB'
+
 
 # default Achievement store data
 DEFAULT_STORE = {
     'unlocked': [],
+    'counters': {},
+    'unlocked_at': {},
+    'stats': {},
+    'quarantined': {},
+    'throttle': {},
 }
+
+
+# environment variable to skip processing the importing script
+DISABLE_ENV = 'DEV_ACHIEVEMENTS_DISABLE'
+
+# environment variable to analyze the importing script on every run
+# (no throttling of unchanged scripts)
+NO_THROTTLE_ENV = 'DEV_ACHIEVEMENTS_NO_THROTTLE'
+
+# most scripts whose throttle state is kept in the store
+MAX_THROTTLED_SCRIPTS = 256
+
+# environment variable holding the path of a profiling report to write
+PROFILE_ENV = 'DEV_ACHIEVEMENTS_PROFILE'
+
+# environment variable selecting where unlocks go, comma separated:
+# 'box' (the default), 'jsonl:PATH', 'jsonl:fd:N' or 'none'
+SINK_ENV = 'DEV_ACHIEVEMENTS_SINK'
+
+# environment variable holding the path of a metrics text file to write
+# (e.g. in the node-exporter textfile collector directory)
+METRICS_ENV = 'DEV_ACHIEVEMENTS_METRICS'
+
+# environment variable overriding the largest source file (in bytes)
+# that gets processed, larger files are skipped
+MAX_SOURCE_ENV = 'DEV_ACHIEVEMENTS_MAX_SOURCE_BYTES'
+
+# per-user local tier of the analysis cache
+CACHE_PATH = os.path.join(_ROOT_PATH, '.dev_achievements/cache')
+
+# environment variable holding a shared analysis cache directory
+CACHE_ENV = 'DEV_ACHIEVEMENTS_CACHE_DIR'
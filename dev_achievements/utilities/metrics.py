@@ -0,0 +1,270 @@
+# metrics.py
+# ----------
+# Exports analysis statistics as a Prometheus text file, as read by
+# the node-exporter textfile collector: counters of sources, bytes,
+# cache lookups and unlocks, and histograms of the duration of each
+# phase (read, parse, traversal, check, store write, ...). Metrics is a
+# Profiler, so the same (no-op when disabled) hooks feed it. The file
+# is replaced atomically, with the counts of the previous file added
+# in, so counters keep growing across runs. Concurrent runs take turns
+# (locking the file), so none of their counts are lost.
+
+import contextlib
+import os
+import re
+import tempfile
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not on Windows
+    fcntl = None
+
+from dev_achievements.utilities.profiling import Profiler
+
+
+# prefix of every metric name
+PREFIX = 'dev_achievements'
+
+# upper bounds of the duration histogram buckets (in seconds)
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+           0.5, 1.0, 2.5, 5.0, 10.0)
+
+# metric name, labels and help of each Profiler counter
+_COUNTERS = {
+    'sources': ('sources_total', (), 'Sources analyzed.'),
+    'bytes': ('source_bytes_total', (), 'Bytes of source parsed.'),
+    'skipped': ('sources_skipped_total', (),
+                'Sources skipped (over the size limit).'),
+    'errors': ('source_errors_total', (),
+               "Sources that couldn't be read or parsed."),
+    'cache_hits': ('cache_lookups_total', (('result', 'hit'),),
+                   'Analysis cache lookups.'),
+    'cache_misses': ('cache_lookups_total', (('result', 'miss'),),
+                     'Analysis cache lookups.'),
+}
+
+# sample line of a text file: name, optional labels and value
+_SAMPLE_RE = re.compile(r'^([A-Za-z_:][\w:]*)(\{.*\})?\s+(\S+)\s*$')
+
+
+def _labels(pairs):
+    """ Formats label pairs (escaping their values) """
+    if not pairs:
+        return ''
+    escaped = []
+    for key, value in pairs:
+        value = value.replace('\\', '\\\\').replace('"', '\\"') \
+            .replace('\n', '\\n')
+        escaped.append(f'{key}="{value}"')
+    return '{' + ','.join(escaped) + '}'
+
+
+def _add(families, name, kind, help_text, sample, value):
+    """ Adds a sample value to a metric family (created if needed) """
+    family = families.setdefault(
+        name, {'type': kind, 'help': help_text, 'samples': {}})
+    family['samples'][sample] = family['samples'].get(sample, 0) + value
+    return
+
+
+def _value(value):
+    """ Formats a sample value """
+    if float(value).is_integer() and abs(value) < 2 ** 53:
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metrics(Profiler):
+    """ Profiler also recording phase durations into histograms, for a
+    Prometheus text file.
+
+    Attributes:
+        histograms (dict): per phase bucket counts (one per BUCKETS
+            bound, then +Inf), sum and count of durations
+    """
+    def __init__(self):
+        super().__init__()
+        self.histograms = {}
+
+    def _record(self, table, name, wall, cpu):
+        """ Adds a timing to the given table, and phase timings to the
+        phase's histogram
+        """
+        Profiler._record(table, name, wall, cpu)
+        if table is self.phases:
+            self.observe(name, wall)
+        return
+
+    def observe(self, phase, seconds):
+        """ Adds a duration to a phase's histogram.
+
+        Args:
+            phase (str): phase name
+            seconds (float): duration
+        """
+        hist = self.histograms.get(phase)
+        if hist is None:
+            hist = self.histograms[phase] = {
+                'buckets': [0] * (len(BUCKETS) + 1), 'sum': 0.0, 'count': 0}
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                hist['buckets'][i] += 1
+        hist['buckets'][-1] += 1
+        hist['sum'] += seconds
+        hist['count'] += 1
+        return
+
+    def families(self):
+        """ Gives the recorded metrics.
+
+        Returns:
+            dict: metric families by name, each with type, help and
+                values by sample (name and labels)
+        """
+        families = {}
+        for counter, value in self.counters.items():
+            name, labels, help_text = _COUNTERS.get(
+                counter, (f'{counter}_total', (), f'Number of {counter}.'))
+            name = f'{PREFIX}_{name}'
+            _add(families, name, 'counter', help_text,
+                 name + _labels(labels), value)
+        name = f'{PREFIX}_unlocks_total'
+        for ach, value in sorted(self.unlocks.items()):
+            _add(families, name, 'counter', 'Achievements unlocked.',
+                 name + _labels((('achievement', ach),)), value)
+        name = f'{PREFIX}_phase_seconds'
+        help_text = 'Duration of each processing phase.'
+        for phase, hist in sorted(self.histograms.items()):
+            bounds = [repr(b) for b in BUCKETS] + ['+Inf']
+            for bound, value in zip(bounds, hist['buckets']):
+                _add(families, name, 'histogram', help_text, f'{name}_bucket'
+                     + _labels((('phase', phase), ('le', bound))), value)
+            labels = _labels((('phase', phase),))
+            _add(families, name, 'histogram', help_text,
+                 f'{name}_sum{labels}', hist['sum'])
+            _add(families, name, 'histogram', help_text,
+                 f'{name}_count{labels}', hist['count'])
+        return families
+
+    def write_textfile(self, file_path, accumulate=True):
+        """ Writes the metrics to a text file, atomically (through a
+        temporary file in the same directory).
+
+        Args:
+            file_path (str): path of metrics file (a .prom file in the
+                textfile collector directory)
+            accumulate (bool): whether to add the counts of the existing
+                file (under a lock), so counters don't reset on every run
+        """
+        families = self.families()
+        directory = os.path.dirname(os.path.abspath(file_path))
+        os.makedirs(directory, exist_ok=True)
+        if not accumulate:
+            _replace(file_path, families)
+            return
+        with _locked(file_path):
+            for name, family in read_textfile(file_path).items():
+                for sample, value in family['samples'].items():
+                    _add(families, name, family['type'], family['help'],
+                         sample, value)
+            _replace(file_path, families)
+        return
+
+
+@contextlib.contextmanager
+def _locked(file_path):
+    """ Holds an exclusive lock on a metrics file (created empty if
+    needed) while it's read and replaced. A waiter whose file was
+    replaced meanwhile locks the new one instead. Does nothing where
+    there's no fcntl.
+    """
+    if fcntl is None:
+        yield
+        return
+    while True:
+        fd = os.open(file_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                current = os.path.samestat(os.fstat(fd), os.stat(file_path))
+            except OSError:
+                current = False
+            if current:
+                yield
+                return
+        finally:
+            # closing the file releases the lock
+            os.close(fd)
+
+
+def _replace(file_path, families):
+    """ Atomically replaces a metrics file, through a temporary file
+    in the same directory
+    """
+    directory = os.path.dirname(os.path.abspath(file_path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.metrics-',
+                                    suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as file:
+            file.write(render(families))
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return
+
+
+def render(families):
+    """ Formats metric families in the Prometheus text format.
+
+    Args:
+        families (dict): metric families, as given by Metrics.families
+
+    Returns:
+        str: text file contents
+    """
+    lines = []
+    for name, family in families.items():
+        lines.append(f'# HELP {name} {family["help"]}')
+        lines.append(f'# TYPE {name} {family["type"]}')
+        for sample, value in family['samples'].items():
+            lines.append(f'{sample} {_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+def read_textfile(file_path):
+    """ Reads the metric families of a text file written by Metrics.
+
+    Args:
+        file_path (str): path of metrics file
+
+    Returns:
+        dict: metric families (empty if there's no readable file)
+    """
+    families = {}
+    try:
+        with open(file_path) as file:
+            lines = file.read().splitlines()
+    except OSError:
+        return families
+    family = None
+    help_text = ''
+    for line in lines:
+        if line.startswith('# HELP '):
+            help_text = line.split(' ', 3)[3] if line.count(' ') >= 3 else ''
+            continue
+        if line.startswith('# TYPE '):
+            _, _, name, kind = line.split(' ', 3)
+            family = families.setdefault(
+                name, {'type': kind, 'help': help_text, 'samples': {}})
+            continue
+        match = _SAMPLE_RE.match(line)
+        if family is None or match is None:
+            continue
+        try:
+            value = float(match.group(3))
+        except ValueError:
+            continue
+        family['samples'][match.group(1) + (match.group(2) or '')] = value
+    return families
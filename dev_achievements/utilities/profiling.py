@@ -0,0 +1,216 @@
+# profiling.py
+# ------------
+# Optional instrumentation of the Achievement process. Records wall
+# and CPU time spent in each phase (file read, parse, traversal,
+# checks, store load/write), in each Achievement check, node counts,
+# event counters (sources, bytes, cache lookups) and unlocks.
+# Disabled by default, in which case nothing is recorded.
+
+import contextlib
+import json
+import time
+
+
+# active profiler (None when profiling is disabled)
+_profiler = None
+
+# shared no-op context for disabled phases
+_NULL_CONTEXT = contextlib.nullcontext()
+
+
+class Profiler:
+    """ Accumulates timings and node counts for a JSON report.
+
+    Attributes:
+        phases (dict): timings of each processing phase
+        checks (dict): timings of each Achievement's _check_condition
+        node_counts (dict): number of AST nodes by type name
+        counters (dict): event counts by name (sources, bytes, ...)
+        unlocks (dict): number of unlocks by Achievement name
+    """
+    def __init__(self):
+        self.phases = {}
+        self.checks = {}
+        self.node_counts = {}
+        self.counters = {}
+        self.unlocks = {}
+
+    @staticmethod
+    def _record(table, name, wall, cpu):
+        """ Adds a timing to the given table """
+        entry = table.setdefault(name, {'calls': 0, 'wall': 0.0, 'cpu': 0.0})
+        entry['calls'] += 1
+        entry['wall'] += wall
+        entry['cpu'] += cpu
+        return
+
+    @contextlib.contextmanager
+    def _timed(self, table, name):
+        """ Times the wrapped block into the given table """
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            self._record(table, name, time.perf_counter() - wall,
+                         time.process_time() - cpu)
+
+    def phase(self, name):
+        """ Context manager timing a processing phase.
+
+        Args:
+            name (str): phase name
+        """
+        return self._timed(self.phases, name)
+
+    def check(self, name):
+        """ Context manager timing an Achievement check.
+
+        Args:
+            name (str): Achievement class name
+        """
+        return self._timed(self.checks, name)
+
+    def record_phase(self, name, wall, cpu=0.0):
+        """ Adds a phase timing measured elsewhere (e.g. in a worker
+        process).
+
+        Args:
+            name (str): phase name
+            wall (float): wall time (in seconds)
+            cpu (float): CPU time (in seconds)
+        """
+        self._record(self.phases, name, wall, cpu)
+        return
+
+    def count(self, name, value=1):
+        """ Adds to an event counter.
+
+        Args:
+            name (str): counter name
+            value (int): amount to add
+        """
+        self.counters[name] = self.counters.get(name, 0) + value
+        return
+
+    def count_unlocks(self, names):
+        """ Counts unlocked Achievements.
+
+        Args:
+            names (iterable[str]): names of unlocked Achievements
+        """
+        for name in names:
+            self.unlocks[name] = self.unlocks.get(name, 0) + 1
+        return
+
+    def count_nodes(self, table):
+        """ Adds node counts from a visited node table.
+
+        Args:
+            table (dict): table of ast.AST nodes in tree
+        """
+        for node_class, nodes in table.items():
+            name = node_class.__name__
+            self.node_counts[name] = self.node_counts.get(name, 0) + len(nodes)
+        return
+
+    def report(self):
+        """ Gives all recorded data.
+
+        Returns:
+            dict: JSON serializable report
+        """
+        return {
+            'phases': self.phases,
+            'achievements': self.checks,
+            'node_counts': self.node_counts,
+            'counters': self.counters,
+            'unlocks': self.unlocks,
+        }
+
+    def dump(self, file_path):
+        """ Writes the report to a JSON file.
+
+        Args:
+            file_path (str): path of report file
+        """
+        with open(file_path, 'w+') as file:
+            json.dump(self.report(), file, indent=4)
+        return
+
+
+def get_profiler():
+    """ Returns the active Profiler, or None if disabled """
+    return _profiler
+
+
+def enable(profiler=None):
+    """ Enables profiling, recording into the given (or a new) Profiler.
+
+    Args:
+        profiler (Profiler, optional): profiler to record into
+
+    Returns:
+        Profiler: the active profiler
+    """
+    global _profiler
+    _profiler = profiler if profiler is not None else Profiler()
+    return _profiler
+
+
+def disable():
+    """ Disables profiling.
+
+    Returns:
+        Profiler: the previously active profiler (or None)
+    """
+    global _profiler
+    profiler, _profiler = _profiler, None
+    return profiler
+
+
+@contextlib.contextmanager
+def profile(profiler=None):
+    """ Enables profiling for the duration of the block.
+
+    Example:
+        with profile() as profiler:
+            process_file(path)
+        report = profiler.report()
+
+    Args:
+        profiler (Profiler, optional): profiler to record into
+    """
+    previous = _profiler
+    try:
+        yield enable(profiler)
+    finally:
+        if previous is not None:
+            enable(previous)
+        else:
+            disable()
+
+
+def phase(name):
+    """ Times a processing phase on the active profiler, if any.
+
+    Args:
+        name (str): phase name
+
+    Returns:
+        A context manager (a shared no-op one when disabled)
+    """
+    if _profiler is None:
+        return _NULL_CONTEXT
+    return _profiler.phase(name)
+
+
+def count(name, value=1):
+    """ Adds to an event counter of the active profiler, if any.
+
+    Args:
+        name (str): counter name
+        value (int): amount to add
+    """
+    if _profiler is not None:
+        _profiler.count(name, value)
+    return
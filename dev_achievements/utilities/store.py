@@ -0,0 +1,261 @@
+# store.py
+# --------
+# SQLite backend of the Achievement store, holding many profiles (e.g.
+# the learners of a lab sharing one account) in a single file. Each
+# part of a profile's store is a table keyed by (profile, name), so
+# loading one profile is an indexed lookup, and progress is merged by
+# upserts in a short transaction, instead of reading and rewriting a
+# whole JSON file. The database runs in WAL mode, so readers don't
+# block the (one at a time) writers.
+
+import json
+import sqlite3
+import time
+
+
+# profile used when none is selected
+DEFAULT_PROFILE = 'default'
+
+# seconds a writer waits for another one to finish
+BUSY_TIMEOUT = 30.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS profiles (
+    profile TEXT PRIMARY KEY,
+    created REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS unlocked (
+    profile TEXT NOT NULL,
+    name TEXT NOT NULL,
+    UNIQUE (profile, name)
+);
+CREATE TABLE IF NOT EXISTS unlocked_at (
+    profile TEXT NOT NULL,
+    name TEXT NOT NULL,
+    at REAL NOT NULL,
+    PRIMARY KEY (profile, name)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS counters (
+    profile TEXT NOT NULL,
+    name TEXT NOT NULL,
+    value INTEGER NOT NULL,
+    PRIMARY KEY (profile, name)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS stats (
+    profile TEXT NOT NULL,
+    name TEXT NOT NULL,
+    field TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (profile, name, field)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS quarantined (
+    profile TEXT NOT NULL,
+    name TEXT NOT NULL,
+    reason TEXT NOT NULL,
+    PRIMARY KEY (profile, name)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS throttle (
+    profile TEXT NOT NULL,
+    path TEXT NOT NULL,
+    seen REAL NOT NULL,
+    entry TEXT NOT NULL,
+    PRIMARY KEY (profile, path)
+) WITHOUT ROWID;
+"""
+
+# tables holding a profile's store (and profile rows)
+_TABLES = ('profiles', 'unlocked', 'unlocked_at', 'counters', 'stats',
+           'quarantined', 'throttle')
+
+
+def _number(value):
+    """ Gives floats holding whole numbers back as ints """
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+class SQLiteStore:
+    """ Achievement store of one profile in a SQLite database.
+
+    Attributes:
+        path (str): path of database file
+        profile (str): name of profile
+
+    Args:
+        path (str): path of database file (created if missing)
+        profile (str, optional): name of profile
+    """
+    def __init__(self, path, profile=None):
+        self.path = path
+        self.profile = profile or DEFAULT_PROFILE
+        self._conn = None
+
+    @property
+    def conn(self):
+        """ sqlite3.Connection: connection (opened on first use) """
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT,
+                                   isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def close(self):
+        """ Closes the connection, if open """
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+        return
+
+    def _rows(self, sql):
+        """ Gives the rows of a query on the profile """
+        return self.conn.execute(sql, (self.profile,)).fetchall()
+
+    def load(self):
+        """ Loads the profile's store.
+
+        Returns:
+            dict: store, in the same shape as the JSON store
+        """
+        stats = {}
+        for name, field, value in self._rows(
+                'SELECT name, field, value FROM stats WHERE profile = ?'):
+            stats.setdefault(name, {})[field] = _number(value)
+        return {
+            'unlocked': [n for n, in self._rows(
+                'SELECT name FROM unlocked WHERE profile = ? ORDER BY rowid')],
+            'counters': dict(self._rows(
+                'SELECT name, value FROM counters WHERE profile = ?')),
+            'unlocked_at': dict(self._rows(
+                'SELECT name, at FROM unlocked_at WHERE profile = ?')),
+            'stats': stats,
+            'quarantined': dict(self._rows(
+                'SELECT name, reason FROM quarantined WHERE profile = ?')),
+            'throttle': {p: json.loads(e) for p, e in self._rows(
+                'SELECT path, entry FROM throttle WHERE profile = ?')},
+        }
+
+    def write(self, store):
+        """ Replaces the profile's store.
+
+        Args:
+            store (dict): store, in the same shape as the JSON store
+        """
+        with self._transaction() as conn:
+            for table in _TABLES:
+                conn.execute(f'DELETE FROM {table} WHERE profile = ?',
+                             (self.profile,))
+            self._merge(conn, store.get('unlocked') or (),
+                        store.get('counters'), store.get('unlocked_at'),
+                        store.get('stats'), store.get('quarantined'),
+                        store.get('throttle'))
+        return
+
+    def save_progress(self, unlocked=(), counters=None, unlocked_at=None,
+                      stats=None, quarantined=None, throttle=None,
+                      max_throttled=None):
+        """ Merges a run's progress into the profile's store, in a
+        single transaction.
+
+        Args:
+            unlocked, counters, unlocked_at, stats, quarantined,
+                throttle: progress, as given to utils.save_progress
+            max_throttled (int, optional): most scripts whose throttle
+                state is kept
+        """
+        with self._transaction() as conn:
+            self._merge(conn, unlocked, counters, unlocked_at, stats,
+                        quarantined, throttle)
+            if max_throttled is not None and throttle:
+                conn.execute(
+                    'DELETE FROM throttle WHERE profile = ? AND path NOT IN'
+                    + ' (SELECT path FROM throttle WHERE profile = ?'
+                    + ' ORDER BY seen DESC LIMIT ?)',
+                    (self.profile, self.profile, max_throttled))
+        return
+
+    def _merge(self, conn, unlocked, counters, unlocked_at, stats,
+               quarantined, throttle):
+        """ Merges progress into the profile's rows """
+        p = self.profile
+        conn.execute('INSERT OR IGNORE INTO profiles VALUES (?, ?)',
+                     (p, time.time()))
+        conn.executemany('INSERT OR IGNORE INTO unlocked VALUES (?, ?)',
+                         [(p, name) for name in unlocked])
+        conn.executemany(
+            'INSERT INTO counters VALUES (?, ?, ?)'
+            + ' ON CONFLICT (profile, name) DO UPDATE'
+            + ' SET value = value + excluded.value',
+            [(p, name, delta) for name, delta in (counters or {}).items()])
+        conn.executemany(
+            'INSERT INTO unlocked_at VALUES (?, ?, ?)'
+            + ' ON CONFLICT (profile, name) DO UPDATE'
+            + ' SET at = min(at, excluded.at)',
+            [(p, name, at) for name, at in (unlocked_at or {}).items()])
+        conn.executemany(
+            'INSERT INTO stats VALUES (?, ?, ?, ?)'
+            + ' ON CONFLICT (profile, name, field) DO UPDATE'
+            + ' SET value = value + excluded.value',
+            [(p, name, field, delta)
+             for name, deltas in (stats or {}).items()
+             for field, delta in deltas.items()])
+        conn.executemany(
+            'INSERT OR REPLACE INTO quarantined VALUES (?, ?, ?)',
+            [(p, name, reason) for name, reason in (quarantined or {}).items()])
+        conn.executemany(
+            'INSERT OR REPLACE INTO throttle VALUES (?, ?, ?, ?)',
+            [(p, path, entry['seen'], json.dumps(entry))
+             for path, entry in (throttle or {}).items()])
+        return
+
+    def _transaction(self):
+        """ Gives a context manager running a write transaction """
+        return _Transaction(self.conn)
+
+    def profiles(self):
+        """ Gives the names of all profiles in the database.
+
+        Returns:
+            list[str]: profile names, sorted
+        """
+        rows = self.conn.execute('SELECT profile FROM profiles ORDER BY 1')
+        return [name for name, in rows]
+
+    def iter_unlocked(self):
+        """ Yields the unlocked Achievements of every profile, in a
+        single pass over the index.
+
+        Yields:
+            tuple: (profile name, list of unlocked Achievement names)
+        """
+        profile, names = None, []
+        for row_profile, name in self.conn.execute(
+                'SELECT p.profile, u.name FROM profiles p LEFT JOIN unlocked u'
+                + ' ON u.profile = p.profile ORDER BY p.profile, u.rowid'):
+            if row_profile != profile:
+                if profile is not None:
+                    yield profile, names
+                profile, names = row_profile, []
+            if name is not None:
+                names.append(name)
+        if profile is not None:
+            yield profile, names
+        return
+
+
+class _Transaction:
+    """ Write transaction, taking the database's write lock up front
+    (so concurrent writers wait instead of failing midway)
+    """
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute('BEGIN IMMEDIATE')
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute('ROLLBACK' if exc_type is not None else 'COMMIT')
+        return False
@@ -0,0 +1,141 @@
+# throttle.py
+# -----------
+# Throttles the analysis of scripts run over and over (health checks,
+# shell loops): after THROTTLE_RUNS consecutive runs of an unchanged
+# script without new unlocks, its analysis is skipped for a back-off
+# window doubling on every further quiet run, until the script, a local
+# module it imports or the package (and so its catalog) changes. A
+# skipped run costs a stat of the script (and of those modules) and a
+# store lookup.
+
+import os
+import time
+
+from dev_achievements.utilities.constants import NO_THROTTLE_ENV, VERSION
+from dev_achievements.utilities.utils import load_store
+
+
+# consecutive quiet runs before analysis is skipped
+THROTTLE_RUNS = 3
+
+# first back-off window (in seconds)
+BACKOFF_SECONDS = 60.0
+
+# longest back-off window (in seconds)
+MAX_BACKOFF_SECONDS = 24 * 60 * 60.0
+
+
+def file_state(file_path):
+    """ Gives what identifies a version of a file.
+
+    Args:
+        file_path (str): path of file
+
+    Returns:
+        list: modification time (in ns) and size, None if the file
+            can't be stat'ed
+    """
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def backoff(quiet):
+    """ Gives the back-off window after a number of quiet runs.
+
+    Args:
+        quiet (int): consecutive runs of the unchanged script without
+            new unlocks
+
+    Returns:
+        float: seconds to skip analysis for (0 below THROTTLE_RUNS)
+    """
+    if quiet < THROTTLE_RUNS:
+        return 0.0
+    exponent = min(quiet - THROTTLE_RUNS, 32)
+    return min(BACKOFF_SECONDS * 2 ** exponent, MAX_BACKOFF_SECONDS)
+
+
+class ScriptRun:
+    """ A run of a script, with its throttle state from the store.
+
+    Attributes:
+        path (str): absolute path of the script
+        state (list): file state of the script (None if unknown)
+        entry (dict): stored throttle state (None if never run)
+        now (float): time of the run
+
+    Args:
+        file_path (str): path of the script
+        store (dict, optional): Achievement store (loaded if not given)
+        now (float, optional): time of the run (defaults to now)
+    """
+    def __init__(self, file_path, store=None, now=None):
+        self.path = os.path.abspath(file_path)
+        self.state = file_state(file_path)
+        self.now = now if now is not None else time.time()
+        self.entry = None
+        if self.state is not None and not os.environ.get(NO_THROTTLE_ENV):
+            if store is None:
+                store = load_store()
+            self.entry = (store.get('throttle') or {}).get(self.path)
+
+    @property
+    def unchanged(self):
+        """ bool: whether the script, the local modules it imported
+        and the package are the same as on the stored run
+        """
+        if self.entry is None or self.entry['state'] != self.state \
+                or self.entry.get('version') != VERSION:
+            return False
+        return all(file_state(path) == state
+                   for path, state in self.entry.get('modules', {}).items())
+
+    @property
+    def archived(self):
+        """ bool: whether the script's summary was archived at its
+        current state, by this version of the package
+        """
+        return self.entry is not None \
+            and self.entry.get('archived') == self.state \
+            and self.entry.get('version') == VERSION
+
+    @property
+    def skip(self):
+        """ bool: whether the script is unchanged and within its
+        back-off window
+        """
+        return self.entry is not None and self.now < self.entry['until'] \
+            and self.unchanged
+
+    def update(self, unlocked, modules=(), archived=False):
+        """ Gives the throttle state after analyzing the script.
+
+        Args:
+            unlocked (list): Achievements newly unlocked by the run
+            modules (iterable[str]): paths of the local modules the
+                analysis followed the script's imports to
+            archived (bool): whether the script's summary is archived
+                at its current state
+
+        Returns:
+            dict: throttle state by script path, to save (empty if the
+                script's state is unknown)
+        """
+        if self.state is None:
+            return {}
+        if unlocked or not self.unchanged:
+            quiet = 0
+        else:
+            quiet = self.entry['quiet'] + 1
+        return {self.path: {
+            'state': self.state,
+            'version': VERSION,
+            'modules': {path: file_state(path) for path in sorted(modules)},
+            'archived': self.state if archived else None,
+            'quiet': quiet,
+            'until': self.now + backoff(quiet),
+            'seen': self.now,
+        }}
@@ -3,11 +3,25 @@
 # Contains a bunch of utility functions to make life easier
 # throughout the rest of the codebase.
 
+import copy
 import json
 import os
 import pathlib
+import urllib.parse
 
-from dev_achievements.utilities.constants import STORE_PATH, DEFAULT_STORE
+from dev_achievements.utilities.constants import (DEFAULT_STORE,
+                                                  MAX_THROTTLED_SCRIPTS,
+                                                  STORE_DB_ENV, STORE_DB_PATH,
+                                                  STORE_PATH,
+                                                  STORE_PROFILE_ENV,
+                                                  SUMMARIES_FILE)
+from dev_achievements.utilities.profiling import phase
+
+
+# selected SQLite store (None for the JSON store at STORE_PATH), and
+# whether the environment was checked for one
+_backend = None
+_resolved = False
 
 
 def load_json(file_path):
@@ -37,11 +51,77 @@ def write_json(file_path, data):
     return
 
 
+def use_store(backend):
+    """ Selects the store all reads and writes go to.
+
+    Args:
+        backend (SQLiteStore): profile of a SQLite store, None for the
+            JSON store
+    """
+    global _backend, _resolved
+    if _backend is not None and _backend is not backend:
+        _backend.close()
+    _backend, _resolved = backend, True
+    return
+
+
+def use_profile(profile, path=None):
+    """ Selects a profile of a SQLite store (created if missing).
+
+    Args:
+        profile (str): name of profile
+        path (str, optional): path of SQLite store (defaults to
+            $DEV_ACHIEVEMENTS_STORE_DB or STORE_DB_PATH)
+
+    Returns:
+        SQLiteStore: the selected store
+    """
+    # imported here, so scripts using the JSON store don't load sqlite3
+    from dev_achievements.utilities.store import SQLiteStore
+    path = path or os.environ.get(STORE_DB_ENV) or STORE_DB_PATH
+    pathlib.Path(os.path.dirname(os.path.abspath(path))).mkdir(
+        parents=True, exist_ok=True)
+    use_store(SQLiteStore(path, profile))
+    return _backend
+
+
+def get_store():
+    """ Gives the selected SQLite store, selecting the one named by
+    the environment on first use.
+
+    Returns:
+        SQLiteStore: selected store, None for the JSON store
+    """
+    if not _resolved:
+        profile = os.environ.get(STORE_PROFILE_ENV)
+        if profile or os.environ.get(STORE_DB_ENV):
+            use_profile(profile)
+        else:
+            use_store(None)
+    return _backend
+
+
+def summaries_path():
+    """ Gives the path of the archive of feature summaries of the
+    selected store (see processing/archive.py).
+
+    Returns:
+        str: path of archive file
+    """
+    backend = get_store()
+    if backend is not None:
+        directory = os.path.dirname(os.path.abspath(backend.path))
+        name = urllib.parse.quote(backend.profile, safe='') + '.jsonl'
+        return os.path.join(directory, 'summaries', name)
+    return os.path.join(os.path.dirname(STORE_PATH), SUMMARIES_FILE)
+
+
 def load_store(field=None):
     """ Loads in Achievement store as a dict. If a field value
     is specified, the data in the field is returned. If there
     is no file in the configured STORE_PATH, the configured
-    DEFAULT_STORE is used.
+    DEFAULT_STORE is used. A selected SQLite store profile (see
+    use_profile) is loaded instead of STORE_PATH.
 
     Args:
         field (str, optional): dictionary field
@@ -50,9 +130,13 @@ def load_store(field=None):
         The whole data store, or the data in the field if one is given.
     """
     store = DEFAULT_STORE
+    backend = get_store()
     # load in store if saved
-    if os.path.isfile(STORE_PATH):
-        store = load_json(STORE_PATH)
+    with phase('store_load'):
+        if backend is not None:
+            store = backend.load()
+        elif os.path.isfile(STORE_PATH):
+            store = load_json(STORE_PATH)
     # get field if specified
     if field is not None:
         return store.get(field, None)
@@ -68,19 +152,67 @@ def write_store(data):
     Args:
         data (dict): updated Achievement store to write
     """
+    backend = get_store()
+    if backend is not None:
+        with phase('store_write'):
+            backend.write(data)
+        return
     store_dir = os.path.dirname(STORE_PATH)
-    pathlib.Path(store_dir).mkdir(parents=True, exist_ok=True)
-    return write_json(STORE_PATH, data)
+    with phase('store_write'):
+        pathlib.Path(store_dir).mkdir(parents=True, exist_ok=True)
+        write_json(STORE_PATH, data)
+    return
 
 
-def save_completed(ach_name):
-    """ Marks the given Achievement as unlocked in the store.
+def save_progress(unlocked=(), counters=None, unlocked_at=None,
+                  stats=None, quarantined=None, throttle=None):
+    """ Merges a run's progress into the store, with a single read
+    and write of the store for the whole batch.
 
     Args:
-        ach_name (Achievement): class of Achievement
+        unlocked (list[str]): names of newly unlocked Achievements
+        counters (dict, optional): counter deltas to add, by name
+        unlocked_at (dict, optional): unlock timestamps, by name (the
+            earliest one is kept)
+        stats (dict, optional): check statistic deltas to add, by
+            Achievement name
+        quarantined (dict, optional): reasons for newly quarantined
+            Achievements, by name
+        throttle (dict, optional): throttle states of scripts, by path
+            (only the most recently run are kept)
     """
-    store = load_store()
-    store['unlocked'].append(ach_name)
+    if not unlocked and not counters and not stats and not quarantined \
+            and not throttle:
+        return
+    backend = get_store()
+    if backend is not None:
+        # merged by the database, in one transaction
+        with phase('store_write'):
+            backend.save_progress(unlocked, counters, unlocked_at, stats,
+                                  quarantined, throttle,
+                                  max_throttled=MAX_THROTTLED_SCRIPTS)
+        return
+    store = copy.deepcopy(load_store())
+    saved = store.setdefault('unlocked', [])
+    saved += [name for name in unlocked if name not in saved]
+    totals = store.setdefault('counters', {})
+    for name, delta in (counters or {}).items():
+        totals[name] = totals.get(name, 0) + delta
+    times = store.setdefault('unlocked_at', {})
+    for name, timestamp in (unlocked_at or {}).items():
+        times[name] = min(timestamp, times.get(name, timestamp))
+    all_stats = store.setdefault('stats', {})
+    for name, deltas in (stats or {}).items():
+        saved_stats = all_stats.setdefault(name, {})
+        for field, delta in deltas.items():
+            saved_stats[field] = saved_stats.get(field, 0) + delta
+    store.setdefault('quarantined', {}).update(quarantined or {})
+    scripts = store.setdefault('throttle', {})
+    scripts.update(throttle or {})
+    if len(scripts) > MAX_THROTTLED_SCRIPTS:
+        recent = sorted(scripts, key=lambda p: scripts[p]['seen'])
+        for path in recent[:-MAX_THROTTLED_SCRIPTS]:
+            del scripts[path]
     write_store(store)
     return
 
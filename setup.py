@@ -5,8 +5,8 @@
 from setuptools import find_packages, setup
 
 
-# ignore unit tests
-excluded_packages = ['tests', 'tests.*']
+# ignore unit tests and benchmarks
+excluded_packages = ['tests', 'tests.*', 'benchmarks', 'benchmarks.*']
 
 # load in README as long description
 with open('README.md', 'r') as file:
@@ -25,6 +25,9 @@ setup(
     packages=find_packages(exclude=excluded_packages),
     python_requires='>=3.5',
     install_requires=[],
+    extras_require={
+        'numpy': ['numpy'],
+    },
     classifiers=[
         'Programming Language :: Python :: 3',
         'License :: OSI Approved :: MIT License',
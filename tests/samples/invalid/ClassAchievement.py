@@ -22,3 +22,10 @@ Foo()
 
 # >> CASE
 Foo
+
+
+# >> CASE
+class Foo:
+    pass
+
+module.Foo()
@@ -22,3 +22,17 @@ func()
 
 # >> CASE
 func
+
+
+# >> CASE
+def func():
+    pass
+
+obj.func()
+
+# >> CASE
+def func():
+    pass
+
+funcs[0]()
+get_func()()
@@ -11,3 +11,10 @@ print('helol world')
 
 # >> CASE
 print('helloworld', end='')
+
+
+# >> CASE
+sys.stdout.write('hello world')
+
+# >> CASE
+handlers[0]('hello world')
@@ -0,0 +1,12 @@
+# cases where LoopControlAchievement should not unlock
+
+# >> CASE
+for i in range(4):
+    pass
+
+# >> CASE
+while x:
+    x = x - 1
+
+# >> CASE
+[x for x in range(4) if x]
@@ -0,0 +1,24 @@
+# cases where LoopsBronzeAchievement should not unlock
+
+# >> CASE
+for _ in range(0):
+    pass
+for _ in range(1):
+    pass
+for _ in range(2):
+    pass
+for _ in range(3):
+    pass
+for _ in range(4):
+    pass
+for _ in range(5):
+    pass
+for _ in range(6):
+    pass
+for _ in range(7):
+    pass
+for _ in range(8):
+    pass
+
+# >> CASE
+x = [i for i in range(10)]
@@ -11,3 +11,10 @@ class Bar():
     pass
 
 Bar()
+
+
+# >> CASE
+class Foo:
+    pass
+
+Foo().method()
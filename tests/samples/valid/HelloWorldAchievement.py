@@ -8,3 +8,8 @@ print('Hello world', end='')
 
 # >> CASE
 print('Hello World')
+
+
+# >> CASE
+logger.info('start')
+print('Hello World')
@@ -0,0 +1,19 @@
+# cases where LoopControlAchievement should unlock
+
+# >> CASE
+for i in range(4):
+    break
+
+# >> CASE
+while True:
+    if x:
+        continue
+    x = 4
+
+# >> CASE
+for i in range(4):
+    while i:
+        try:
+            pass
+        finally:
+            break
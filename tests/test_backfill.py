@@ -0,0 +1,99 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+from unittest import mock
+
+from dev_achievements.processing.archive import SummaryArchive
+from dev_achievements.processing.backfill import backfill, iter_commits
+from dev_achievements.utilities import utils
+
+
+# (file contents by path, commit timestamp) of each sample commit
+SAMPLE_COMMITS = [
+    ({'a.py': 'x = 1\n'}, 1600000000),
+    ({'a.py': 'x = 1\nif x:\n    x = 2\n', 'notes.txt': 'hi'}, 1600001000),
+    ({'b.py': 'x = 1\n'}, 1600002000),
+    ({'a.py': 'x = 1\nif x:\n    x = 2\nfor i in x:\n    pass\n'}, 1600003000),
+]
+
+
+@unittest.skipIf(shutil.which('git') is None, 'git is not installed')
+class TestBackfill(unittest.TestCase):
+    """ Checks backfilling Achievements from git history """
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.repo = tmp.name
+        self._git('init', '-q')
+        for files, timestamp in SAMPLE_COMMITS:
+            self._commit(files, timestamp)
+        store = {'unlocked': [], 'counters': {}}
+        load = mock.patch('dev_achievements.processing.tree.load_store',
+                          return_value=store)
+        load.start()
+        self.addCleanup(load.stop)
+        store_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(store_dir.cleanup)
+        self.store_path = os.path.join(store_dir.name, 'store.json')
+        patcher = mock.patch.object(utils, 'STORE_PATH', self.store_path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _git(self, *args, env=None):
+        """ Runs a git command in the sample repository """
+        cmd = ['git', '-C', self.repo, '-c', 'user.name=test',
+               '-c', 'user.email=test@example.com'] + list(args)
+        subprocess.run(cmd, check=True, env=env)
+
+    def _commit(self, files, timestamp):
+        """ Commits the given files to the sample repository """
+        for path, src in files.items():
+            with open(os.path.join(self.repo, path), 'w') as file:
+                file.write(src)
+        self._git('add', '-A')
+        env = dict(os.environ, GIT_COMMITTER_DATE=f'{timestamp} +0000',
+                   GIT_AUTHOR_DATE=f'{timestamp} +0000')
+        self._git('commit', '-q', '-m', 'commit', env=env)
+
+    def test_tiered_unlock_date(self):
+        # one loop added per commit (the last files repeat earlier blobs)
+        for n in range(10):
+            self._commit({f'c{n}.py': f'for i in x{n % 8}:\n    pass\n'},
+                         1600004000 + n * 1000)
+        with mock.patch('dev_achievements.processing.tree.save_progress'):
+            stats = backfill(self.repo)
+        self.assertEqual(stats['counters']['For'], 11)
+        # the sample history has a loop, so the 9th commit makes 10
+        self.assertEqual(dict(stats['unlocked'])['LoopsBronzeAchievement'],
+                         1600012000)
+
+    def test_iter_commits(self):
+        commits = list(iter_commits(self.repo))
+        self.assertEqual([c[1] for c in commits],
+                         [t for _, t in SAMPLE_COMMITS])
+        self.assertEqual([p for p, _ in commits[1][2]], ['a.py'])
+
+    def test_backfill(self):
+        with mock.patch('dev_achievements.processing.tree.save_progress') \
+                as save:
+            stats = backfill(self.repo)
+        # b.py has the same blob as the first a.py
+        self.assertEqual(stats['blobs'], 4)
+        self.assertEqual(stats['parsed'], 3)
+        unlocked = dict(stats['unlocked'])
+        self.assertEqual(unlocked['AssignAchievement'], 1600000000)
+        self.assertEqual(unlocked['ConditionalAchievement'], 1600001000)
+        self.assertEqual(unlocked['LoopsAchievement'], 1600003000)
+        # each file counts what was added to it
+        self.assertEqual(stats['counters']['Assign'], 3)
+        names, counters, unlocked_at = save.call_args[0]
+        # checks over history don't count towards quarantine
+        self.assertNotIn('stats', save.call_args[1])
+        self.assertEqual(unlocked_at['LoopsAchievement'], 1600003000)
+        # each parsed blob is archived, dated by its commit
+        entries = SummaryArchive().load()
+        self.assertEqual(sorted(e['at'] for e in entries.values()),
+                         [1600000000, 1600001000, 1600003000])
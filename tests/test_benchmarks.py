@@ -0,0 +1,28 @@
+import ast
+import unittest
+
+from benchmarks.generator import generate_source
+from benchmarks.run import compare
+
+
+class TestBenchmarks(unittest.TestCase):
+    """ Checks the benchmark source generator and baseline comparison """
+
+    def test_generator_is_deterministic(self):
+        self.assertEqual(generate_source(500, seed=4),
+                         generate_source(500, seed=4))
+        self.assertNotEqual(generate_source(500, seed=4),
+                            generate_source(500, seed=5))
+
+    def test_generator_output_parses(self):
+        for depth in range(1, 5):
+            src = generate_source(1000, max_depth=depth, call_density=0.6)
+            with self.subTest(depth=depth):
+                self.assertGreaterEqual(len(src.splitlines()), 1000)
+                ast.parse(src)
+
+    def test_compare_threshold(self):
+        baseline = {'1000': {'visit': {'seconds': 1.0}}}
+        slow = {'1000': {'visit': {'seconds': 1.5}}}
+        self.assertEqual(compare(slow, baseline, 0.6), [])
+        self.assertEqual(len(compare(slow, baseline, 0.2)), 1)
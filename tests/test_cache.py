@@ -0,0 +1,105 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from dev_achievements.utilities import cache
+from dev_achievements.utilities.constants import CACHE_ENV
+
+
+class TestCache(unittest.TestCase):
+    """ Checks the content-addressed, tiered analysis cache """
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.local = os.path.join(tmp.name, 'local')
+        self.shared = os.path.join(tmp.name, 'shared')
+
+    def _files(self, path):
+        """ Gives the names of all files under path (but the eviction
+        stamp)
+        """
+        return [n for _, _, files in os.walk(path) for n in files
+                if n != cache._EVICT_STAMP]
+
+    def test_content_key(self):
+        key = cache.content_key(b'x = 1')
+        self.assertEqual(key, cache.content_key(b'x = 1'))
+        self.assertNotEqual(key, cache.content_key(b'x = 2'))
+        self.assertNotEqual(key, cache.content_key(b'x = 1', salt='v2'))
+
+    def test_read_through(self):
+        writer = cache.ContentCache(self.shared, local=self.local + '-a')
+        writer.put('ab12', {'counts': {'For': 1}})
+        reader = cache.ContentCache(self.shared, local=self.local)
+        self.assertEqual(self._files(self.local), [])
+        self.assertEqual(reader.get('ab12'), {'counts': {'For': 1}})
+        # copied to the local tier on a shared hit
+        self.assertEqual(self._files(self.local), ['ab12.json'])
+        self.assertIsNone(reader.get('cd34'))
+
+    def test_unreadable_entry_is_a_miss(self):
+        tier = cache.CacheTier(self.shared)
+        tier.put('ab12', [1])
+        with open(tier._entry('ab12'), 'w') as file:
+            file.write('{"trunc')
+        self.assertIsNone(tier.get('ab12'))
+
+    def test_concurrent_writers(self):
+        tier = cache.CacheTier(self.shared)
+        value = {'counts': {str(i): i for i in range(2000)}}
+        threads = [threading.Thread(target=tier.put, args=('ab12', value))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self._files(self.shared), ['ab12.json'])
+        with open(tier._entry('ab12')) as file:
+            self.assertEqual(json.load(file), value)
+
+    def test_lru_eviction(self):
+        tier = cache.CacheTier(self.shared, max_bytes=10 ** 6)
+        for i, key in enumerate(['aa01', 'bb02', 'cc03']):
+            tier.put(key, 'x' * 100)
+            os.utime(tier._entry(key), (i, i))
+        # reading aa01 makes bb02 the least recently used
+        tier.get('aa01')
+        tier.max_bytes = 250
+        tier.evict()
+        self.assertEqual(sorted(self._files(self.shared)),
+                         ['aa01.json', 'cc03.json'])
+
+    def test_short_runs_evict(self):
+        for i, key in enumerate(['aa01', 'bb02', 'cc03']):
+            # each run (process) writes one entry, far below an eighth
+            # of the bound
+            tier = cache.CacheTier(self.shared, max_bytes=250)
+            tier.put(key, 'x' * 100)
+            os.utime(tier._entry(key), (i, i))
+            os.utime(os.path.join(self.shared, cache._EVICT_STAMP), (0, 0))
+        self.assertEqual(sorted(self._files(self.shared)),
+                         ['bb02.json', 'cc03.json'])
+
+    def test_read_only_hit(self):
+        tier = cache.CacheTier(self.shared)
+        tier.put('ab12', [1])
+        with mock.patch.object(os, 'utime', side_effect=PermissionError):
+            self.assertEqual(tier.get('ab12'), [1])
+
+    def test_failed_write_leaves_no_temp(self):
+        tier = cache.CacheTier(self.shared)
+        with mock.patch.object(os, 'replace', side_effect=OSError):
+            tier.put('ab12', [1])
+        self.assertEqual(self._files(self.shared), [])
+
+    def test_from_env(self):
+        with mock.patch.dict(os.environ, {CACHE_ENV: ''}):
+            self.assertIsNone(cache.ContentCache.from_env())
+        with mock.patch.dict(os.environ, {CACHE_ENV: self.shared}):
+            shared = cache.ContentCache.from_env(local=self.local)
+        self.assertEqual([t.path for t in shared.tiers],
+                         [self.local, self.shared])
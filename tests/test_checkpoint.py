@@ -0,0 +1,90 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from dev_achievements.processing import scanner
+from dev_achievements.processing.checkpoint import Checkpoint
+
+
+# sample sources, by name within the sample directory
+SAMPLE_SOURCES = {
+    'a.py': 'x = 1\n',
+    'b.py': 'for i in range(3):\n    pass\n',
+    'c.py': 'def f():\n    return [1]\n\nf()\n',
+    'd.py': 'while False:\n    break\n',
+}
+
+
+class TestCheckpoint(unittest.TestCase):
+    """ Checks resuming scans from checkpoints """
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.directory = os.path.join(tmp.name, 'src')
+        os.makedirs(self.directory)
+        for name, src in SAMPLE_SOURCES.items():
+            self._write(name, src)
+        self.manifest = os.path.join(tmp.name, 'scan.checkpoint')
+
+    def _write(self, name, src):
+        with open(os.path.join(self.directory, name), 'w') as file:
+            file.write(src)
+
+    def _interrupted_scan(self, after):
+        """ Scans, killing the scan after some sources """
+        scan_source = scanner.scan_source
+        calls = []
+
+        def dying(*args, **kwargs):
+            if len(calls) == after:
+                raise KeyboardInterrupt
+            calls.append(args)
+            return scan_source(*args, **kwargs)
+
+        with mock.patch.object(scanner, 'scan_source', dying):
+            with self.assertRaises(KeyboardInterrupt):
+                scanner.scan([self.directory], workers=1,
+                             checkpoint=Checkpoint(self.manifest))
+        return
+
+    def test_resume(self):
+        whole = scanner.scan([self.directory], workers=1)
+        self._interrupted_scan(after=2)
+        resumed = scanner.scan([self.directory], workers=1,
+                               checkpoint=Checkpoint(self.manifest))
+        self.assertEqual(resumed['resumed'], 2)
+        self.assertEqual(resumed['sources'], whole['sources'])
+        self.assertEqual(resumed['summary'], whole['summary'])
+        self.assertEqual(sorted(resumed['unlocked']), sorted(whole['unlocked']))
+        again = scanner.scan([self.directory], workers=1,
+                             checkpoint=Checkpoint(self.manifest))
+        self.assertEqual(again['resumed'], len(SAMPLE_SOURCES))
+
+    def test_revalidation(self):
+        scanner.scan([self.directory], workers=1,
+                     checkpoint=Checkpoint(self.manifest))
+        # touched but unchanged, then changed
+        path = os.path.join(self.directory, 'a.py')
+        os.utime(path, ns=(0, 0))
+        self._write('b.py', 'class B:\n    pass\n')
+        report = scanner.scan([self.directory], workers=1,
+                              checkpoint=Checkpoint(self.manifest))
+        self.assertEqual(report['resumed'], len(SAMPLE_SOURCES) - 1)
+        self.assertNotIn('For', report['summary']['counts'])
+        self.assertEqual(report['summary']['counts']['ClassDef'], 1)
+
+    def test_other_options(self):
+        scanner.scan([self.directory], workers=1,
+                     checkpoint=Checkpoint(self.manifest))
+        checkpoint = Checkpoint(self.manifest, {'max_bytes': 10})
+        self.assertEqual(checkpoint.load(), {})
+
+    def test_cut_short(self):
+        scanner.scan([self.directory], workers=1,
+                     checkpoint=Checkpoint(self.manifest))
+        with open(self.manifest, 'a') as file:
+            file.write('{"name": "e.py", "by')
+        self.assertEqual(len(Checkpoint(self.manifest).load()),
+                         len(SAMPLE_SOURCES))
@@ -0,0 +1,77 @@
+import ast
+import os
+import unittest
+from unittest import mock
+
+from benchmarks.generator import generate_source
+from dev_achievements.achievements import *
+from benchmarks import codegen
+from dev_achievements.processing.visitor import Visitor, build_table
+
+
+# sample sources, see tests/test.py
+SAMPLE_SRCS_DIR = 'tests/samples/{valid}'
+CASE_DELIM = '>> CASE'
+
+
+class TestCodegen(unittest.TestCase):
+    """ Checks the generated, specialized checker against the generic
+    Achievement checks
+    """
+
+    def test_matches_samples(self):
+        checker = codegen.compile_checker()
+        for valid in ('valid', 'invalid'):
+            directory = SAMPLE_SRCS_DIR.format(valid=valid)
+            for file_name in sorted(os.listdir(directory)):
+                if not file_name.endswith('.py'):
+                    continue
+                name = file_name[:-len('.py')]
+                with open(os.path.join(directory, file_name)) as file:
+                    cases = file.read().split(CASE_DELIM)
+                for i, case in enumerate(cases[1:] or cases):
+                    tree = ast.parse(case)
+                    ach = [a for a in checker.achievements
+                           if a.__name__ == name][0]
+                    expected = ach()._check_condition(build_table(tree))
+                    with self.subTest(sample=file_name, case=i):
+                        self.assertEqual(checker(tree)[name], expected)
+
+    def test_unlocks_match_visitor(self):
+        tree = ast.parse(generate_source(2000, seed=3))
+        store = {'unlocked': [], 'counters': {'For': 95}}
+        with mock.patch('dev_achievements.processing.tree.load_store',
+                        return_value=store):
+            v = Visitor()
+        v.visit(tree)
+        expected = [a.__class__ for a in v.check_achievements()]
+        checker = codegen.compile_checker(counters={'For': 95})
+        self.assertEqual(checker.unlocks(tree), expected)
+        self.assertIn(LoopsSilverAchievement, expected)
+
+    def test_cached_per_store_state(self):
+        checker = codegen.compile_checker()
+        self.assertIs(codegen.compile_checker(), checker)
+        self.assertIsNot(codegen.compile_checker(counters={'For': 5}),
+                         checker)
+        unlocked = codegen.compile_checker(['AssignAchievement'])
+        self.assertNotIn(AssignAchievement, unlocked.achievements)
+        self.assertNotIn('f_AssignAchievement', unlocked.source)
+
+    def test_direct_and_fallback_patterns(self):
+        class DirectAchievement(Achievement, abstract=True):
+            pattern = 'For > Break'
+
+        class JoinAchievement(Achievement, abstract=True):
+            pattern = 'FunctionDef >> Call(func: Name(id in FunctionDef.name))'
+
+        checker = codegen._compile((DirectAchievement, JoinAchievement), ())
+        self.assertEqual(checker._fallbacks, [JoinAchievement])
+        for src, direct, join in (
+                ('for i in x:\n    break', True, False),
+                ('for i in x:\n    if i:\n        break', False, False),
+                ('def f():\n    f()', False, True)):
+            with self.subTest(src=src):
+                results = checker(ast.parse(src))
+                self.assertEqual(results['DirectAchievement'], direct)
+                self.assertEqual(results['JoinAchievement'], join)
@@ -0,0 +1,53 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from dev_achievements.achievements import Achievement
+from dev_achievements.processing import corpus
+
+
+# sample corpus files
+SAMPLE_FILES = {
+    'calls.py': 'import os\nos.path.join("a")\nfuncs[0]()\nget()()\n',
+    'pkg/broken.py': 'def broken(:\n',
+    'pkg/notes.txt': 'not python',
+}
+
+
+class CrashingAchievement(Achievement, abstract=True):
+    """ Achievement whose check always raises """
+    __slots__ = ()
+
+    def _check_condition(self, nodes):
+        return nodes[None]
+
+
+class TestCorpus(unittest.TestCase):
+    """ Checks the corpus stress runner """
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.directory = tmp.name
+        for name, src in SAMPLE_FILES.items():
+            path = os.path.join(self.directory, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as file:
+                file.write(src)
+
+    def test_no_crashes_on_complex_callees(self):
+        report = corpus.run_corpus([self.directory], workers=1)
+        self.assertEqual(report['files'], 2)
+        self.assertEqual(report['errors'], 1)
+        self.assertEqual(report['crashes'], {})
+        self.assertEqual(corpus.gate_failures(report), [])
+
+    def test_crashes_reported(self):
+        achievements = Achievement.subclasses() + [CrashingAchievement]
+        with mock.patch.object(Achievement, 'subclasses',
+                               return_value=achievements):
+            report = corpus.run_corpus([self.directory], workers=1)
+        self.assertEqual(report['crashes']['CrashingAchievement']['count'], 1)
+        self.assertEqual(len(corpus.gate_failures(report)), 1)
+        self.assertEqual(corpus.gate_failures(report, max_crashes=1), [])
@@ -0,0 +1,100 @@
+import ast
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from dev_achievements.achievements import Achievement
+from dev_achievements.processing import dedupe, scanner
+from dev_achievements.processing.summary import summarize
+from dev_achievements.processing.visitor import build_table
+
+
+# sources sharing definitions (at different positions, with calls of
+# functions and classes defined in other parts of the module)
+SHARED = '''
+def helper(items):
+    for item in items:
+        if item:
+            break
+    return Point(1, 2)
+
+
+class Point:
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+'''
+FIRST = 'import os\n' + SHARED + '\nhelper([1])\n'
+SECOND = '"""Vendored copy."""\nx = 1\n\n' + SHARED
+THIRD = 'def helper(items):\n    return items\n\nhelper(Point)\n'
+
+
+def _summaries(sources, memo):
+    """ Gives the plain and deduplicated summaries of sources """
+    pairs = []
+    for src in sources:
+        data = src.encode()
+        tree = ast.parse(data)
+        pairs.append((summarize(build_table(tree)),
+                      dedupe.summarize_source(data, tree, memo)))
+    return pairs
+
+
+class TestDedupe(unittest.TestCase):
+    """ Checks summaries put together from memoized definitions """
+
+    def test_same_summary(self):
+        memo = dedupe.SubtreeMemo()
+        for plain, deduped in _summaries([FIRST, SECOND, THIRD], memo):
+            self.assertEqual(plain, deduped)
+
+    def test_reuse(self):
+        memo = dedupe.SubtreeMemo()
+        _summaries([FIRST, SECOND], memo)
+        self.assertEqual(memo.subtrees, 4)
+        self.assertEqual(memo.reused, 2)
+        self.assertEqual(len(memo), 2)
+
+    def test_joins_across_parts(self):
+        # the call of helper only matches with THIRD's own definition
+        memo = dedupe.SubtreeMemo()
+        (_, first), (_, third) = _summaries([FIRST, THIRD], memo)
+        calls = 'Call(func: Name(id in FunctionDef.name))'
+        classes = 'Call(func: Name(id in ClassDef.name))'
+        self.assertTrue(first['patterns'][calls])
+        self.assertTrue(first['patterns'][classes])
+        self.assertTrue(third['patterns'][calls])
+        self.assertFalse(third['patterns'][classes])
+
+    def test_bounded(self):
+        memo = dedupe.SubtreeMemo(max_entries=1)
+        _summaries([FIRST, FIRST], memo)
+        self.assertEqual(len(memo), 1)
+        self.assertEqual(memo.reused, 0)
+
+    def test_undecomposable(self):
+        class ModuleCall(Achievement, abstract=True):
+            pattern = 'Module > Expr'
+
+        catalog = Achievement.subclasses() + [ModuleCall]
+        with mock.patch.object(Achievement, 'subclasses',
+                               return_value=catalog):
+            memo = dedupe.SubtreeMemo()
+            for plain, deduped in _summaries([FIRST], memo):
+                self.assertEqual(plain, deduped)
+        self.assertEqual(memo.subtrees, 0)
+
+    def test_scan_report(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for name, src in (('a.py', FIRST), ('b.py', SECOND)):
+                with open(os.path.join(directory, name), 'w') as file:
+                    file.write(src)
+            with mock.patch.object(scanner, '_memo', dedupe.SubtreeMemo()):
+                report = scanner.scan([directory], workers=1)
+            plain = scanner.scan([directory], workers=1, dedupe=False)
+        self.assertEqual(report['subtrees'], 4)
+        self.assertEqual(report['reused'], 2)
+        self.assertEqual(report['dedupe'], 0.5)
+        self.assertEqual(plain['subtrees'], 0)
+        self.assertEqual(report['summary'], plain['summary'])
@@ -0,0 +1,57 @@
+import os
+import tempfile
+import unittest
+
+from dev_achievements.achievements import *
+from dev_achievements.reporting import features
+from dev_achievements.reporting.features import np
+
+
+# sample sources, and the presence-style Achievements each unlocks
+SAMPLE_SOURCES = [
+    ('x = [1, 2]', {'AssignAchievement', 'ListAchievement'}),
+    ('for i in x:\n    pass', {'LoopsAchievement', 'PassAchievement'}),
+    ('y = {1: 2} if 3 else 4 << 1',
+     {'AssignAchievement', 'DictAchievement', 'ConditionalAchievement',
+      'BitwiseOperatorsAchievement'}),
+    ('def broken(:', set()),
+]
+
+
+@unittest.skipIf(np is None, 'numpy is not installed')
+class TestFeatures(unittest.TestCase):
+    """ Checks the vectorized feature and Achievement matrices """
+
+    def setUp(self):
+        self.sources = [src for src, _ in SAMPLE_SOURCES]
+
+    def test_feature_matrix(self):
+        counts = features.feature_matrix(self.sources)
+        self.assertEqual(counts.shape,
+                         (len(self.sources), len(features.NODE_TYPES)))
+        col = features.NODE_TYPES.index('Assign')
+        self.assertEqual(list(counts[:, col]), [1, 0, 1, 0])
+        self.assertEqual(counts[3].sum(), 0)
+
+    def test_memmap_output(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'counts.npy')
+            features.feature_matrix(self.sources, out=path)
+            counts = np.load(path, mmap_mode='r')
+            expected = features.feature_matrix(self.sources)
+            self.assertTrue((counts == expected).all())
+            del counts
+
+    def test_achievement_matrix_matches_checks(self):
+        counts = features.feature_matrix(self.sources)
+        matrix, names = features.achievement_matrix(counts)
+        self.assertNotIn('FunctionAchievement', names)
+        for i, (src, expected) in enumerate(SAMPLE_SOURCES):
+            unlocked = {n for n, u in zip(names, matrix[i]) if u}
+            with self.subTest(source=src):
+                self.assertEqual(unlocked, expected)
+
+    def test_rejects_non_presence(self):
+        counts = features.feature_matrix(self.sources)
+        with self.assertRaises(ValueError):
+            features.achievement_matrix(counts, [FunctionAchievement])
@@ -0,0 +1,107 @@
+import ast
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from dev_achievements.achievements import *
+from dev_achievements.processing import imports
+from dev_achievements.processing.visitor import build_table
+
+
+# sample project, by file path within the project directory
+SAMPLE_PROJECT = {
+    'main.py': (
+        'import helpers\n'
+        'import pkg.shapes as shapes\n'
+        'from pkg import tools\n'
+        'from pkg.api import area\n'
+        'import json\n'
+        'helpers.greet()\n'
+        'shapes.Square()\n'
+        'area(2)\n'
+        'json.dumps({})\n'
+    ),
+    'helpers.py': 'def greet():\n    print("hi")\n',
+    'pkg/__init__.py': '',
+    'pkg/shapes.py': 'class Square:\n    pass\n',
+    'pkg/api.py': 'from .geometry import area\n',
+    'pkg/geometry.py': 'def area(side):\n    return side * side\n',
+    'pkg/tools.py': 'from . import *\n',
+    'broken.py': 'def broken(:\n',
+}
+
+
+class TestImports(unittest.TestCase):
+    """ Checks building the import graph of a project """
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = os.path.realpath(tmp.name)
+        for name, src in SAMPLE_PROJECT.items():
+            path = os.path.join(self.root, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as file:
+                file.write(src)
+
+    def _path(self, name):
+        """ Gives the absolute path of a sample project file """
+        return os.path.join(self.root, *name.split('/'))
+
+    def test_resolve_module(self):
+        self.assertEqual(imports.resolve_module('pkg.shapes', self.root),
+                         self._path('pkg/shapes.py'))
+        self.assertEqual(imports.resolve_module('pkg', self.root),
+                         self._path('pkg/__init__.py'))
+        self.assertIsNone(imports.resolve_module('json', self.root))
+
+    def test_graph(self):
+        project = imports.Project(self._path('main.py'))
+        graph = project.graph
+        self.assertEqual(graph[self._path('main.py')], {
+            self._path('helpers.py'), self._path('pkg/shapes.py'),
+            self._path('pkg/tools.py'), self._path('pkg/api.py')})
+        self.assertEqual(graph[self._path('pkg/tools.py')],
+                         {self._path('pkg/__init__.py')})
+        self.assertEqual(graph[self._path('pkg/api.py')],
+                         {self._path('pkg/geometry.py')})
+        self.assertNotIn(self._path('broken.py'), graph)
+
+    def test_parsed_once(self):
+        tree = ast.parse(SAMPLE_PROJECT['main.py'])
+        project = imports.Project(self._path('main.py'), tree)
+        with mock.patch.object(imports, 'read_source',
+                               wraps=imports.read_source) as read:
+            project.graph
+            list(project.cross_module_calls())
+            project.symbols
+        read_paths = [c.args[0] for c in read.call_args_list]
+        self.assertEqual(len(read_paths), len(set(read_paths)))
+        self.assertNotIn(self._path('main.py'), read_paths)
+
+    def test_cross_module_calls(self):
+        project = imports.Project(self._path('main.py'))
+        calls = {found for _, found in project.cross_module_calls()}
+        self.assertEqual(calls, {
+            (self._path('helpers.py'), 'greet'),
+            (self._path('pkg/shapes.py'), 'Square'),
+            (self._path('pkg/geometry.py'), 'area')})
+        symbols = project.symbols
+        self.assertIs(symbols[(self._path('pkg/shapes.py'), 'Square')],
+                      ast.ClassDef)
+
+    def test_achievements(self):
+        path = self._path('main.py')
+        table = build_table(ast.parse(SAMPLE_PROJECT['main.py']))
+        self.assertFalse(ModuleAchievement()._check_condition(table))
+        table.project = imports.Project(path)
+        self.assertTrue(ModuleAchievement()._check_condition(table))
+        self.assertTrue(CrossModuleCallAchievement()._check_condition(table))
+
+    def test_single_file(self):
+        path = self._path('helpers.py')
+        table = build_table(ast.parse(SAMPLE_PROJECT['helpers.py']))
+        table.project = imports.Project(path)
+        self.assertFalse(ModuleAchievement()._check_condition(table))
+        self.assertFalse(CrossModuleCallAchievement()._check_condition(table))
@@ -0,0 +1,74 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from dev_achievements.achievements import *
+from dev_achievements.reporting.leaderboard import Leaderboard, iter_stores
+
+
+# unlocked Achievements of each sample user
+SAMPLE_STORES = {
+    'alice': ['AssignAchievement', 'ConditionalAchievement',
+              'LoopsAchievement'],
+    'bob': ['AssignAchievement', 'ConditionalAchievement'],
+    'carol': ['AssignAchievement'],
+    'dave/store': ['FutureAchievement'],
+}
+
+
+class TestLeaderboard(unittest.TestCase):
+    """ Checks aggregation of a directory of Achievement stores """
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.directory = tmp.name
+        for user, unlocked in SAMPLE_STORES.items():
+            path = os.path.join(self.directory, user + '.json')
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as file:
+                json.dump({'unlocked': unlocked}, file)
+        with open(os.path.join(self.directory, 'broken.json'), 'w') as file:
+            file.write('{not json')
+        self.board = Leaderboard().load(self.directory)
+
+    def test_iter_stores(self):
+        users = [u for u, _ in iter_stores(self.directory)]
+        self.assertIn('dave', users)
+        self.assertIn('alice', users)
+
+    def test_rankings(self):
+        self.assertEqual(self.board.rankings(top=2),
+                         [('alice', 3), ('bob', 2)])
+        self.assertEqual(self.board.skipped,
+                         [os.path.join(self.directory, 'broken.json')])
+
+    def test_unlock_rates(self):
+        rates = self.board.unlock_rates()
+        self.assertEqual(rates['AssignAchievement'], 0.75)
+        self.assertEqual(rates['ClassAchievement'], 0.0)
+        # unknown Achievements get their own column
+        self.assertEqual(rates['FutureAchievement'], 0.25)
+
+    def test_funnel(self):
+        funnel = self.board.funnel()
+        self.assertEqual(funnel['LoopsAchievement'],
+                         {'eligible': 2, 'unlocked': 1, 'drop_off': 0.5})
+        self.assertNotIn('AssignAchievement', funnel)
+
+    def test_matrix(self):
+        matrix = self.board.matrix()
+        self.assertEqual(len(matrix), 4)
+
+    def test_lazy_imports(self):
+        code = ('import sys\n'
+                + 'import dev_achievements.reporting.leaderboard\n'
+                + 'print("numpy" in sys.modules, "sqlite3" in sys.modules)')
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = dict(os.environ, DEV_ACHIEVEMENTS_DISABLE='1')
+        out = subprocess.run([sys.executable, '-c', code], cwd=root, env=env,
+                             capture_output=True, text=True, check=True)
+        self.assertEqual(out.stdout.split(), ['False', 'False'])
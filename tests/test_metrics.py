@@ -0,0 +1,108 @@
+import ast
+import contextlib
+import io
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from dev_achievements import build_tree, process_tree
+from dev_achievements.processing import scanner
+from dev_achievements.utilities import metrics, profiling, utils
+
+
+class TestMetrics(unittest.TestCase):
+    """ Checks the Prometheus text file exporter """
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.directory = tmp.name
+        self.src_path = os.path.join(tmp.name, 'script.py')
+        with open(self.src_path, 'w') as file:
+            file.write('for i in range(3):\n    x = i\n')
+        self.prom_path = os.path.join(tmp.name, 'textfile',
+                                      'dev_achievements.prom')
+
+    def test_histogram(self):
+        recorder = metrics.Metrics()
+        recorder.observe('parse', 0.003)
+        recorder.observe('parse', 20.0)
+        hist = recorder.histograms['parse']
+        self.assertEqual(hist['count'], 2)
+        self.assertEqual(hist['buckets'][metrics.BUCKETS.index(0.0025)], 0)
+        self.assertEqual(hist['buckets'][metrics.BUCKETS.index(0.005)], 1)
+        self.assertEqual(hist['buckets'][-1], 2)
+
+    def test_pipeline_hooks(self):
+        with profiling.profile(metrics.Metrics()) as recorder:
+            build_tree(self.src_path)
+        self.assertEqual(recorder.counters['sources'], 1)
+        self.assertEqual(recorder.counters['bytes'],
+                         os.path.getsize(self.src_path))
+        self.assertEqual(set(recorder.histograms), {'read', 'parse'})
+
+    def test_render(self):
+        recorder = metrics.Metrics()
+        recorder.count('cache_hits', 3)
+        recorder.count('cache_misses')
+        recorder.count_unlocks(['LoopsAchievement'])
+        recorder.observe('store_write', 0.01)
+        text = metrics.render(recorder.families())
+        self.assertIn('# TYPE dev_achievements_cache_lookups_total counter\n'
+                      'dev_achievements_cache_lookups_total{result="hit"} 3\n'
+                      'dev_achievements_cache_lookups_total{result="miss"} 1\n',
+                      text)
+        self.assertIn('dev_achievements_unlocks_total'
+                      '{achievement="LoopsAchievement"} 1\n', text)
+        self.assertIn('dev_achievements_phase_seconds_bucket'
+                      '{phase="store_write",le="+Inf"} 1\n', text)
+
+    def test_write_accumulates(self):
+        for _ in range(2):
+            recorder = metrics.Metrics()
+            recorder.count('sources', 2)
+            recorder.observe('parse', 0.5)
+            recorder.write_textfile(self.prom_path)
+        families = metrics.read_textfile(self.prom_path)
+        sources = families['dev_achievements_sources_total']['samples']
+        self.assertEqual(sources['dev_achievements_sources_total'], 4)
+        parse = families['dev_achievements_phase_seconds']['samples']
+        self.assertEqual(
+            parse['dev_achievements_phase_seconds_count{phase="parse"}'], 2)
+        self.assertEqual(os.listdir(os.path.dirname(self.prom_path)),
+                         ['dev_achievements.prom'])
+
+    def test_concurrent_writers(self):
+        def run():
+            recorder = metrics.Metrics()
+            recorder.count('sources')
+            recorder.write_textfile(self.prom_path)
+        threads = [threading.Thread(target=run) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        sources = metrics.read_textfile(self.prom_path)[
+            'dev_achievements_sources_total']['samples']
+        self.assertEqual(sources['dev_achievements_sources_total'], 8)
+
+    def test_process_tree(self):
+        with mock.patch.object(utils, 'STORE_PATH',
+                               os.path.join(self.directory, 'store.json')), \
+                contextlib.redirect_stdout(io.StringIO()), \
+                profiling.profile(metrics.Metrics()) as recorder:
+            process_tree(ast.parse('x = 1\n'), self.src_path)
+        self.assertEqual(dict(recorder.unlocks), {'AssignAchievement': 1})
+        self.assertEqual(recorder.histograms['check']['count'], 1)
+        self.assertIn('dev_achievements_unlocks_total'
+                      '{achievement="AssignAchievement"} 1\n',
+                      metrics.render(recorder.families()))
+
+    def test_scan(self):
+        with profiling.profile(metrics.Metrics()) as recorder:
+            report = scanner.scan([self.src_path], workers=1)
+        self.assertEqual(recorder.counters['sources'], 1)
+        self.assertEqual(recorder.histograms['source']['count'], 1)
+        self.assertEqual(sorted(recorder.unlocks), sorted(report['unlocked']))
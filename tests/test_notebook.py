@@ -0,0 +1,71 @@
+import ast
+import gc
+import unittest
+import weakref
+from unittest import mock
+
+from dev_achievements.achievements import *
+from dev_achievements.notebook import NotebookSession
+
+
+class TestNotebookSession(unittest.TestCase):
+    """ Checks incremental processing of notebook cells """
+
+    def setUp(self):
+        save = mock.patch('dev_achievements.processing.tree.save_progress')
+        self.saved = save.start()
+        self.addCleanup(save.stop)
+        self._start(['AssignAchievement', 'ConditionalAchievement',
+                     'LoopsAchievement'])
+
+    def _start(self, unlocked):
+        """ Starts a session with the given Achievements unlocked """
+        store = {'unlocked': unlocked, 'counters': {}}
+        with mock.patch('dev_achievements.processing.tree.load_store',
+                        return_value=store):
+            self.session = NotebookSession()
+        return
+
+    def _run_cell(self, src):
+        """ Passes a cell through the session as IPython would """
+        tree = ast.parse(src)
+        self.assertIs(self.session.visit(tree), tree)
+        return [a.__class__ for a in self.session.unlocked]
+
+    def test_unlocks_across_cells(self):
+        self.assertNotIn(FunctionAchievement, self._run_cell('def f(): pass'))
+        self.assertIn(FunctionAchievement, self._run_cell('f()'))
+
+    def test_counter_deltas_per_cell(self):
+        self._run_cell('for i in x: pass')
+        self._run_cell('for i in x: pass\nwhile x: pass')
+        deltas = [c[0][1] for c in self.saved.call_args_list]
+        self.assertEqual(deltas[0]['For'], 1)
+        self.assertEqual(deltas[1]['For'], 1)
+        self.assertEqual(deltas[1]['While'], 1)
+        self.assertNotIn('While', deltas[0])
+
+    def test_joins_across_cells(self):
+        # the first cell caches the (empty) defined function names
+        self.assertNotIn(FunctionAchievement, self._run_cell('print(1)'))
+        self.assertIn(FunctionAchievement,
+                      self._run_cell('def f(): pass\nf()'))
+
+    def test_facts_of_earlier_cells(self):
+        self._start(['AssignAchievement'])
+        # loops can't unlock before conditionals
+        self.assertEqual(self._run_cell('while x:\n    break'), [])
+        unlocked = self._run_cell('if x:\n    pass')
+        for ach in (ConditionalAchievement, LoopsAchievement,
+                    LoopControlAchievement):
+            self.assertIn(ach, unlocked)
+
+    def test_cells_not_kept(self):
+        tree = ast.parse('def f(): pass\nfor i in x: pass')
+        self.session.visit(tree)
+        ref = weakref.ref(tree.body[0])
+        del tree
+        gc.collect()
+        self.assertIsNone(ref())
+        self.assertEqual(self.session.ach_tree.counters['For'], 1)
+        self.assertIn('f', self.session.joined[ast.FunctionDef, 'name'])
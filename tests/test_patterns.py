@@ -0,0 +1,85 @@
+import ast
+import unittest
+
+from dev_achievements.processing.patterns import (NodeTable, PatternError,
+                                                  compile_pattern)
+from dev_achievements.processing.visitor import build_table
+
+
+# sample source for matching
+SAMPLE_SRC = '''
+def f(x):
+    for i in x:
+        if i:
+            break
+    while x:
+        continue
+    return x
+
+class C:
+    pass
+
+f(1)
+obj.f()
+print('Hello World', 2)
+print(3, 'hello world')
+'''
+
+
+class TestPatterns(unittest.TestCase):
+    """ Checks compiling and evaluating tree patterns """
+
+    def setUp(self):
+        self.table = build_table(ast.parse(SAMPLE_SRC))
+
+    def _match(self, pattern, table=None):
+        """ Gives the matched node class names """
+        matches = compile_pattern(pattern).matches(table or self.table)
+        return [n.__class__.__name__ for n in matches]
+
+    def test_single_step(self):
+        self.assertEqual(len(self._match('Call')), 4)
+        self.assertEqual(self._match('Break|Continue'), ['Break', 'Continue'])
+
+    def test_relations(self):
+        self.assertEqual(self._match('For >> Break'), ['For'])
+        self.assertEqual(self._match('For > Break'), [])
+        self.assertEqual(self._match('If > Break'), ['If'])
+        self.assertEqual(self._match('FunctionDef >> For|While >> Break'),
+                         ['FunctionDef'])
+        self.assertEqual(self._match('ClassDef >> Break'), [])
+
+    def test_join(self):
+        calls = compile_pattern('Call(func: Name(id in FunctionDef.name))')
+        self.assertEqual([c.func.id for c in calls.matches(self.table)], ['f'])
+        self.assertEqual(calls.joins, {(ast.FunctionDef, 'name')})
+        self.assertEqual(calls.join_count, 1)
+        self.assertFalse(compile_pattern(
+            'Call(func: Name(id in ClassDef.name))').exists(self.table))
+
+    def test_literals(self):
+        pattern = "Call(func: Name(id == 'print'), " \
+            + "args[0]: Constant(value ~ '(?i)hello world'))"
+        self.assertEqual(len(self._match(pattern)), 1)
+        self.assertEqual(len(self._match("Name(id == 'obj')")), 1)
+
+    def test_regex_escapes(self):
+        table = build_table(ast.parse('y = "123"\nz = "it\'s"\n'))
+        digits = compile_pattern(r"Constant(value ~ '^\d+$')")
+        self.assertEqual([c.value for c in digits.matches(table)], ['123'])
+        quote = compile_pattern(r"Constant(value == 'it\'s')")
+        self.assertTrue(quote.exists(table))
+
+    def test_plain_dict_table(self):
+        table = {}
+        for node in ast.walk(ast.parse(SAMPLE_SRC)):
+            table.setdefault(node.__class__, []).append(node)
+        self.assertNotIsInstance(table, NodeTable)
+        self.assertEqual(self._match('For >> Break', table), ['For'])
+
+    def test_invalid_patterns(self):
+        for pattern in ['Foo', 'Call(', 'For >', 'Call(func ? 1)',
+                        "Name(id ~ '(')", 'Call(func: Name) Name']:
+            with self.subTest(pattern=pattern):
+                with self.assertRaises(PatternError):
+                    compile_pattern(pattern)
@@ -0,0 +1,126 @@
+import ast
+import contextlib
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from dev_achievements.processing import precommit
+from dev_achievements.processing.precommit import (DiffVisitor,
+                                                   process_staged,
+                                                   staged_changes)
+
+
+# committed source, and the staged version adding a loop and a list
+BASE_SRC = 'x = 1\n\ndef f():\n    return x\n'
+STAGED_SRC = 'x = 1\n\ndef f():\n    for i in [1, 2]:\n        pass\n' \
+    + '    return x\n'
+
+
+class TestDiffVisitor(unittest.TestCase):
+    """ Checks only nodes on changed lines are recorded """
+
+    def _visit(self, src, ranges):
+        """ Visits the source, giving the recorded node classes """
+        with mock.patch('dev_achievements.processing.visitor.AchievementTree'):
+            v = DiffVisitor(ranges)
+        v.visit(ast.parse(src))
+        return set(v.table)
+
+    def test_only_changed_lines(self):
+        nodes = self._visit(STAGED_SRC, [(4, 5)])
+        self.assertIn(ast.For, nodes)
+        self.assertIn(ast.List, nodes)
+        self.assertIn(ast.Pass, nodes)
+        # def head and the rest of the file are unchanged
+        self.assertNotIn(ast.FunctionDef, nodes)
+        self.assertNotIn(ast.Assign, nodes)
+        self.assertNotIn(ast.Return, nodes)
+
+    def test_changed_head(self):
+        nodes = self._visit(STAGED_SRC, [(3, 3)])
+        self.assertIn(ast.FunctionDef, nodes)
+        self.assertIn(ast.arguments, nodes)
+        self.assertNotIn(ast.For, nodes)
+
+
+@unittest.skipIf(shutil.which('git') is None, 'git is not installed')
+class TestProcessStaged(unittest.TestCase):
+    """ Checks processing of the staged changes of a repository """
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.repo = tmp.name
+        self._git('init', '-q')
+        self._write('a.py', BASE_SRC)
+        self._git('add', '-A')
+        self._git('commit', '-q', '-m', 'base')
+        self._write('a.py', STAGED_SRC)
+        self._git('add', '-A')
+        # unstaged changes are ignored
+        self._write('a.py', STAGED_SRC + 'y = {}\n')
+
+    def _git(self, *args):
+        """ Runs a git command in the sample repository """
+        cmd = ['git', '-C', self.repo, '-c', 'user.name=test',
+               '-c', 'user.email=test@example.com'] + list(args)
+        subprocess.run(cmd, check=True)
+
+    def _write(self, path, src):
+        """ Writes a file in the sample repository """
+        with open(os.path.join(self.repo, path), 'w') as file:
+            file.write(src)
+
+    def test_staged_changes(self):
+        self.assertEqual(staged_changes(self.repo), {'a.py': [(4, 5)]})
+
+    def test_path_with_space(self):
+        self._write('my module.py', 'x = 1\n')
+        self._git('add', '-A')
+        self.assertEqual(staged_changes(self.repo)['my module.py'], [(1, 1)])
+
+    def test_errors_never_fail(self):
+        args = mock.Mock(repo=self.repo)
+        with mock.patch('dev_achievements.processing.tree.load_store',
+                        side_effect=ValueError('corrupt store')), \
+                contextlib.redirect_stderr(io.StringIO()) as err:
+            self.assertEqual(precommit._run(args), 0)
+        self.assertIn('corrupt store', err.getvalue())
+
+    def test_hook_imports(self):
+        # the hook only imports what processing staged changes needs
+        heavy = ['numpy', 'sqlite3', 'dev_achievements.processing.scanner',
+                 'dev_achievements.processing.replay',
+                 'dev_achievements.reporting.leaderboard']
+        code = ('import contextlib, io, sys\n'
+                + 'from dev_achievements.__main__ import main\n'
+                + 'with contextlib.redirect_stdout(io.StringIO()):\n'
+                + f'    main(["precommit", {self.repo!r}])\n'
+                + f'print(",".join(m for m in {heavy!r} if m in sys.modules))')
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = dict(os.environ, HOME=self.repo, DEV_ACHIEVEMENTS_DISABLE='1')
+        env.pop('DEV_ACHIEVEMENTS_STORE_PROFILE', None)
+        env.pop('DEV_ACHIEVEMENTS_STORE_DB', None)
+        out = subprocess.run([sys.executable, '-c', code], cwd=root, env=env,
+                             capture_output=True, text=True, check=True)
+        self.assertEqual(out.stdout.strip(), '')
+
+    def test_process_staged(self):
+        store = {'unlocked': ['AssignAchievement', 'ConditionalAchievement'],
+                 'counters': {}}
+        with mock.patch('dev_achievements.processing.tree.load_store',
+                        return_value=store), \
+                mock.patch('dev_achievements.processing.tree.save_progress') \
+                as save, contextlib.redirect_stdout(io.StringIO()) as out:
+            unlocked = process_staged(self.repo)
+        self.assertIn('Achievement Unlocked: Loops!', out.getvalue())
+        names = [a.__class__.__name__ for a in unlocked]
+        self.assertIn('LoopsAchievement', names)
+        self.assertIn('ListAchievement', names)
+        self.assertNotIn('DictAchievement', names)
+        self.assertEqual(save.call_args[0][1]['For'], 1)
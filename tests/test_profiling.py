@@ -0,0 +1,40 @@
+import os
+import tempfile
+import unittest
+
+from dev_achievements import build_tree
+from dev_achievements.achievements import LoopsAchievement
+from dev_achievements.processing.visitor import Visitor
+from dev_achievements.utilities import profiling
+
+
+class TestProfiling(unittest.TestCase):
+    """ Checks the profiling instrumentation """
+
+    def setUp(self):
+        fd, self.src_path = tempfile.mkstemp(suffix='.py')
+        with os.fdopen(fd, 'w') as file:
+            file.write('for i in range(3):\n    x = i\n')
+        self.addCleanup(os.remove, self.src_path)
+
+    def test_disabled_by_default(self):
+        self.assertIsNone(profiling.get_profiler())
+        self.assertIs(profiling.phase('read'), profiling.phase('parse'))
+
+    def test_phases_recorded(self):
+        with profiling.profile() as profiler:
+            build_tree(self.src_path)
+        self.assertIsNone(profiling.get_profiler())
+        self.assertEqual(set(profiler.phases), {'read', 'parse'})
+        self.assertEqual(profiler.phases['parse']['calls'], 1)
+
+    def test_checks_and_node_counts(self):
+        tree = build_tree(self.src_path)
+        v = Visitor()
+        v.visit(tree)
+        with profiling.profile() as profiler:
+            LoopsAchievement().check(v.table)
+            profiler.count_nodes(v.table)
+        report = profiler.report()
+        self.assertIn('LoopsAchievement', report['achievements'])
+        self.assertEqual(report['node_counts']['For'], 1)
@@ -0,0 +1,153 @@
+import ast
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from dev_achievements import process_file
+from dev_achievements.achievements import *
+from dev_achievements.processing import replay
+from dev_achievements.processing.archive import SummaryArchive
+from dev_achievements.processing.summary import summarize
+from dev_achievements.processing.visitor import build_table
+from dev_achievements.utilities import throttle, utils
+
+
+# catalog from before HelloWorldAchievement was added
+OLD_CATALOG = [a for a in Achievement.subclasses()
+               if a is not HelloWorldAchievement]
+
+
+class TestReplay(unittest.TestCase):
+    """ Checks replaying archived summaries against new Achievements """
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.directory = tmp.name
+        patcher = mock.patch.object(utils, 'STORE_PATH',
+                                    os.path.join(tmp.name, 'store.json'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.archive = SummaryArchive()
+
+    def _write(self, name, src):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w') as file:
+            file.write(src)
+        return path
+
+    def _archive(self, name, src, at, achievements=None):
+        """ Archives a source summarized with the given catalog """
+        path = self._write(name, src)
+        table = build_table(ast.parse(src))
+        self.archive.record([{'name': path, 'at': at,
+                              'state': throttle.file_state(path),
+                              'summary': summarize(table, achievements)}])
+        return path
+
+    def test_process_file(self):
+        path = self._write('script.py', 'x = 1\n')
+        with mock.patch.dict(os.environ, {throttle.NO_THROTTLE_ENV: '1'}), \
+                contextlib.redirect_stdout(io.StringIO()):
+            process_file(path)
+            process_file(path)
+        entries = SummaryArchive(utils.summaries_path()).load()
+        self.assertEqual(list(entries), [os.path.abspath(path)])
+        self.assertEqual(entries[path]['summary']['counts']['Assign'], 1)
+
+    def test_archived_once_per_state(self):
+        path = self._write('script.py', 'x = 1\n')
+        with contextlib.redirect_stdout(io.StringIO()):
+            process_file(path)
+            process_file(path)
+            with open(path, 'a') as file:
+                file.write('y = 2\n')
+            process_file(path)
+        with open(utils.summaries_path()) as file:
+            self.assertEqual(len(file.readlines()), 2)
+
+    def test_size_bound(self):
+        archive = SummaryArchive(max_bytes=2000)
+        for i in range(40):
+            archive.record([{'name': f'{i}.py', 'at': float(i),
+                             'summary': {'counts': {'Assign': i}}}])
+        self.assertLessEqual(os.path.getsize(archive.path), 2000)
+        entries = SummaryArchive(archive.path).load()
+        self.assertIn('39.py', entries)
+        self.assertNotIn('0.py', entries)
+
+    def test_dated_unlocks(self):
+        self._archive('a.py', 'x = 1\n', 100.0)
+        self._archive('b.py', 'if y:\n    pass\n', 200.0)
+        self._archive('c.py', 'for i in y:\n    pass\n', 50.0)
+        store = {'unlocked': ['PassAchievement'], 'counters': {}}
+        with mock.patch.object(replay, 'scan_source') as scan_source:
+            report = replay.replay(self.archive, store, save=False)
+        scan_source.assert_not_called()
+        unlocked = dict(report['unlocked'])
+        self.assertEqual(unlocked['AssignAchievement'], 100.0)
+        # loops were written first, but unlock once their dependencies do
+        self.assertEqual(unlocked['LoopsAchievement'], 200.0)
+        self.assertNotIn('PassAchievement', unlocked)
+        self.assertEqual(report['stale'], 0)
+
+    def test_new_pattern(self):
+        self._archive('hello.py', "print('hello world')\n", 10.0, OLD_CATALOG)
+        self._archive('other.py', 'x = 1\n', 20.0, OLD_CATALOG)
+        report = replay.replay(self.archive, {'unlocked': []})
+        self.assertEqual(report['stale'], 2)
+        self.assertEqual(report['reparsed'], 2)
+        self.assertEqual(dict(report['unlocked'])['HelloWorldAchievement'],
+                         10.0)
+        self.assertEqual(utils.load_store()['unlocked_at'],
+                         dict(report['unlocked']))
+        # the compacted archive holds the new facts
+        entries = SummaryArchive(self.archive.path).load()
+        self.assertEqual(len(entries), 2)
+        self.assertFalse(any(replay.lacks_facts(e['summary'],
+                                                [HelloWorldAchievement])
+                             for e in entries.values()))
+
+    def test_unavailable(self):
+        path = self._archive('hello.py', "x = 1\nprint('hello world')\n",
+                             10.0, OLD_CATALOG)
+        os.remove(path)
+        report = replay.replay(self.archive, {'unlocked': []}, save=False)
+        self.assertEqual(report['unavailable'], 1)
+        self.assertNotIn('HelloWorldAchievement', dict(report['unlocked']))
+        self.assertIn('AssignAchievement', dict(report['unlocked']))
+
+    def test_changed_file(self):
+        path = self._archive('hello.py', "x = 1\nprint('hello world')\n",
+                             10.0, OLD_CATALOG)
+        with open(path, 'a') as file:
+            file.write('y = 2\n')
+        report = replay.replay(self.archive, {'unlocked': []}, save=False)
+        # its facts can't be dated by the archived entry anymore
+        self.assertEqual(report['unavailable'], 1)
+        self.assertNotIn('HelloWorldAchievement', dict(report['unlocked']))
+
+    def test_old_schema(self):
+        path = self._write('a.py', 'x = 1\n')
+        self.archive.record([{'name': path, 'at': 1.0,
+                              'state': throttle.file_state(path),
+                              'summary': {'version': 0, 'nodes': {}}}])
+        report = replay.replay(self.archive, {'unlocked': []}, save=False)
+        self.assertEqual(report['reparsed'], 1)
+        self.assertEqual(dict(report['unlocked'])['AssignAchievement'], 1.0)
+
+    def test_tiered_counters(self):
+        self._archive('a.py', 'x = 1\nif x:\n    for i in x:\n        pass\n',
+                      5.0)
+        store = {'unlocked': ['AssignAchievement', 'ConditionalAchievement',
+                              'LoopsAchievement'],
+                 'counters': {'For': 9}}
+        report = replay.replay(self.archive, store, save=False)
+        # the stored counters already count the archived source's loop
+        self.assertNotIn('LoopsBronzeAchievement', dict(report['unlocked']))
+        store['counters']['For'] = 10
+        report = replay.replay(self.archive, store, save=False)
+        self.assertIn('LoopsBronzeAchievement', dict(report['unlocked']))
@@ -0,0 +1,118 @@
+import io
+import os
+import tarfile
+import tempfile
+import unittest
+import zipfile
+
+from dev_achievements.processing import scanner
+from dev_achievements.utilities.cache import ContentCache
+
+
+# sample sources, by name within the sample directory/archives
+SAMPLE_SOURCES = {
+    'a.py': 'x = 1\nif x:\n    x = 2\n',
+    'pkg/b.py': 'for i in range(3):\n    pass\n',
+    'pkg/broken.py': 'def broken(:\n',
+    'pkg/data.txt': 'not python',
+}
+
+
+class TestScanner(unittest.TestCase):
+    """ Checks scanning files, directories and archives """
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.directory = os.path.join(tmp.name, 'src')
+        for name, src in SAMPLE_SOURCES.items():
+            path = os.path.join(self.directory, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as file:
+                file.write(src)
+        self.zip_path = os.path.join(tmp.name, 'submission.zip')
+        with zipfile.ZipFile(self.zip_path, 'w') as archive:
+            for name, src in SAMPLE_SOURCES.items():
+                archive.writestr(name, src)
+        self.tar_path = os.path.join(tmp.name, 'sdist.tar.gz')
+        with tarfile.open(self.tar_path, 'w:gz') as archive:
+            for name, src in SAMPLE_SOURCES.items():
+                info = tarfile.TarInfo(name)
+                info.size = len(src.encode())
+                archive.addfile(info, io.BytesIO(src.encode()))
+        self.bad_path = os.path.join(tmp.name, 'bad.whl')
+        with open(self.bad_path, 'w') as file:
+            file.write('not a zip')
+
+    def test_iter_sources(self):
+        sources = list(scanner.iter_sources([self.directory]))
+        names = [os.path.relpath(n, self.directory) for n, _ in sources]
+        self.assertEqual(names, ['a.py', os.path.join('pkg', 'b.py'),
+                                 os.path.join('pkg', 'broken.py')])
+        self.assertTrue(all(data is None for _, data in sources))
+
+    def test_iter_archives(self):
+        for path in (self.zip_path, self.tar_path):
+            sources = dict(scanner.iter_sources([path]))
+            with self.subTest(archive=path):
+                self.assertEqual(len(sources), 3)
+                member = path + scanner.MEMBER_SEP + 'pkg/b.py'
+                self.assertEqual(sources[member],
+                                 SAMPLE_SOURCES['pkg/b.py'].encode())
+
+    def test_bad_archive(self):
+        errors = []
+        self.assertEqual(list(scanner.iter_sources([self.bad_path],
+                                                   errors=errors)), [])
+        self.assertEqual(errors[0][0], self.bad_path)
+
+    def test_scan(self):
+        paths = [self.directory, self.zip_path, self.tar_path, self.bad_path]
+        report = scanner.scan(paths, workers=1)
+        self.assertEqual(report['sources'], 9)
+        self.assertEqual(report['errors'], 4)
+        self.assertEqual(report['summary']['counts']['For'], 3)
+        self.assertIn('LoopsAchievement', report['unlocked'])
+        self.assertNotIn('FunctionAchievement', report['unlocked'])
+
+    def test_scan_parallel(self):
+        serial = scanner.scan([self.zip_path], workers=1)
+        parallel = scanner.scan([self.zip_path], workers=2)
+        self.assertEqual(serial['summary'], parallel['summary'])
+        self.assertEqual(serial['unlocked'], parallel['unlocked'])
+
+    def test_scan_split(self):
+        report = scanner.scan([self.directory], workers=1, split_above=0)
+        whole = scanner.scan([self.directory], workers=1)
+        self.assertEqual(report['summary'], whole['summary'])
+        self.assertEqual(report['errors'], 1)
+
+    def test_scan_cached(self):
+        shared = ContentCache(os.path.join(self.directory, 'shared'),
+                              local=os.path.join(self.directory, 'local'))
+        first = scanner.scan([self.zip_path], workers=1, cache=shared)
+        second = scanner.scan([self.zip_path], workers=1, cache=shared)
+        self.assertEqual(first['cached'], 0)
+        self.assertEqual(second['cached'], 2)
+        self.assertEqual(first['summary'], second['summary'])
+
+    def test_scan_cache_bound(self):
+        directory = os.path.join(self.directory, 'many')
+        os.makedirs(directory)
+        for n in range(40):
+            with open(os.path.join(directory, f'm{n}.py'), 'w') as file:
+                file.write(f'x{n} = {n}\n')
+        shared = os.path.join(self.directory, 'shared')
+        cache = ContentCache(shared, local=os.path.join(self.directory,
+                                                        'local'),
+                             max_bytes=4096)
+        scanner.scan([directory], workers=2, cache=cache)
+        for tier in cache.tiers:
+            size = sum(os.path.getsize(os.path.join(root, name))
+                       for root, _, files in os.walk(tier.path)
+                       for name in files)
+            with self.subTest(tier=tier.path):
+                self.assertLessEqual(size, 4096 + 4096 // 8)
+        # the most recently written entries are kept
+        last = scanner.scan([os.path.join(directory, 'm39.py')], cache=cache)
+        self.assertEqual(last['cached'], 1)
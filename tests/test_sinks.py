@@ -0,0 +1,143 @@
+import ast
+import contextlib
+import io
+import json
+import os
+import select
+import tempfile
+import unittest
+import warnings
+from unittest import mock
+
+from dev_achievements import process_tree
+from dev_achievements.achievements import *
+from dev_achievements.processing.visitor import Visitor
+from dev_achievements.reporting import sinks
+from dev_achievements.utilities import utils
+
+
+def _table(src):
+    """ Gives the node table of the source """
+    v = Visitor()
+    v.visit(ast.parse(src))
+    return v.table
+
+
+class TestSinks(unittest.TestCase):
+    """ Checks the unlock event sinks """
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        patcher = mock.patch.object(utils, 'STORE_PATH',
+                                    os.path.join(tmp.name, 'store.json'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(sinks.set_sinks, None)
+        self.events_path = os.path.join(tmp.name, 'unlocks.jsonl')
+
+    def _events(self):
+        with open(self.events_path) as file:
+            return [json.loads(line) for line in file]
+
+    def test_trigger_location(self):
+        table = _table('x = 1\nif x:\n    y = 2\n'
+                       + "print('Hello World')\n")
+        self.assertEqual(sinks.trigger_location(AssignAchievement(), table),
+                         (1, 0))
+        self.assertEqual(
+            sinks.trigger_location(HelloWorldAchievement(), table), (4, 0))
+        self.assertIsNone(sinks.trigger_location(ModuleAchievement(), table))
+
+    def test_tiered_location(self):
+        table = _table('for a in b: pass\n' * 4)
+        bronze = LoopsBronzeAchievement(counters={'For': 7})
+        self.assertEqual(sinks.trigger_location(bronze, table), (3, 0))
+
+    def test_batches(self):
+        sink = sinks.JSONLinesSink(self.events_path, batch=3)
+        self.addCleanup(sink.close)
+        events = sinks.unlock_events([AssignAchievement()], 'script.py')
+        sink.emit(events * 2)
+        self.assertEqual(os.path.getsize(self.events_path), 0)
+        sink.emit(events)
+        self.assertEqual(len(self._events()), 3)
+        sink.emit(events)
+        sink.close()
+        self.assertEqual(len(self._events()), 4)
+
+    def test_full_pipe(self):
+        read_fd, write_fd = os.pipe()
+        self.addCleanup(os.close, read_fd)
+        self.addCleanup(os.close, write_fd)
+        os.set_blocking(read_fd, False)
+        sink = sinks.JSONLinesSink(write_fd, batch=1)
+        events = sinks.unlock_events([AssignAchievement()], 'script.py')
+        # the reader never reads, so the pipe fills but emit never blocks
+        for _ in range(100000 // len(json.dumps(events[0]))):
+            sink.emit(events)
+        self.assertTrue(sink._buffer)
+        received = b''
+        with contextlib.suppress(BlockingIOError):
+            while True:
+                received += os.read(read_fd, 1 << 16)
+        self.assertTrue(received.endswith(b'\n'))
+        with mock.patch.object(sinks, 'DRAIN_SECONDS', 0.0), \
+                warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            sink.close()
+
+    def test_pipe_whole_lines(self):
+        read_fd, write_fd = os.pipe()
+        self.addCleanup(os.close, read_fd)
+        self.addCleanup(os.close, write_fd)
+        sink = sinks.JSONLinesSink(write_fd, batch=100)
+        events = sinks.unlock_events([AssignAchievement()], 'script.py')
+        writes = []
+        real_write = os.write
+        def write(fd, data):
+            writes.append(bytes(data))
+            return real_write(fd, data)
+        with mock.patch.object(sinks.os, 'write', write):
+            sink.emit(events * 100)
+        self.assertGreater(len(writes), 1)
+        for data in writes:
+            self.assertLessEqual(len(data), select.PIPE_BUF)
+            self.assertTrue(data.endswith(b'\n'))
+        # lines that can't be written whole are dropped
+        sink.emit([dict(events[0], file='x' * select.PIPE_BUF)])
+        self.assertEqual(sink.dropped, 1)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            sink.close()
+
+    def test_parse(self):
+        parsed = sinks.parse_sinks(f'box, jsonl:{self.events_path},none')
+        self.assertEqual([type(s) for s in parsed],
+                         [sinks.BoxSink, sinks.JSONLinesSink])
+        parsed[1].close()
+        self.assertEqual(sinks.parse_sinks('none'), [])
+        with self.assertRaises(ValueError):
+            sinks.parse_sinks('syslog')
+
+    def test_process_tree(self):
+        sinks.set_sinks([sinks.JSONLinesSink(self.events_path)])
+        tree = ast.parse('x = 1\n')
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            process_tree(tree, 'script.py')
+        sinks.close_sinks()
+        self.assertEqual(out.getvalue(), '')
+        event, = self._events()
+        self.assertEqual(event['achievement'], 'AssignAchievement')
+        self.assertEqual(event['timestamp'],
+                         utils.load_store()['unlocked_at']['AssignAchievement'])
+        self.assertEqual(event['file'], os.path.abspath('script.py'))
+        self.assertEqual((event['line'], event['col']), (1, 0))
+
+    def test_default_box(self):
+        with mock.patch.dict(os.environ):
+            os.environ.pop(sinks.SINK_ENV, None)
+            sinks.set_sinks(None)
+            with contextlib.redirect_stdout(io.StringIO()) as out:
+                process_tree(ast.parse('x = 1\n'))
+        self.assertIn('Achievement Unlocked: Variables!', out.getvalue())
@@ -0,0 +1,61 @@
+import mmap
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from dev_achievements import build_tree
+from dev_achievements.processing import source
+from dev_achievements.processing.scanner import scan_source
+from dev_achievements.utilities.constants import MAX_SOURCE_ENV
+
+
+class TestSource(unittest.TestCase):
+    """ Checks reading sources as bytes """
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.directory = tmp.name
+
+    def _write(self, name, data):
+        """ Writes bytes to a file in the temporary directory """
+        path = os.path.join(self.directory, name)
+        with open(path, 'wb') as file:
+            file.write(data)
+        return path
+
+    def test_coding_cookie(self):
+        path = self._write('latin.py', b'# -*- coding: latin-1 -*-\n'
+                           + b'name = "caf\xe9"\n')
+        with source.read_source(path) as src:
+            self.assertEqual(src.encoding, 'iso-8859-1')
+        tree = build_tree(path)
+        self.assertEqual(tree.body[0].value.value, 'caf\xe9')
+
+    def test_bom(self):
+        path = self._write('bom.py', b'\xef\xbb\xbfx = "\xc3\xa9"\n')
+        with source.read_source(path) as src:
+            self.assertEqual(src.encoding, 'utf-8-sig')
+        self.assertEqual(build_tree(path).body[0].value.value, '\xe9')
+
+    def test_mmap(self):
+        data = b'x = 1\n' * (source.MMAP_THRESHOLD // 6 + 1)
+        path = self._write('large.py', data)
+        with source.read_source(path) as src:
+            self.assertIsInstance(src.data, mmap.mmap)
+            self.assertEqual(src.size, len(data))
+        self.assertTrue(src.data.closed)
+        self.assertEqual(len(build_tree(path).body), len(data) // 6)
+
+    def test_size_limit(self):
+        path = self._write('big.py', b'x = 1\n' * 10)
+        with self.assertRaises(source.SourceSkipped) as ctx:
+            source.read_source(path, max_bytes=10)
+        self.assertIn('60 bytes', ctx.exception.reason)
+        with mock.patch.dict(os.environ, {MAX_SOURCE_ENV: '10'}):
+            self.assertEqual(source.max_source_bytes(), 10)
+            result = scan_source((path, None))
+        self.assertIsNone(result['error'])
+        self.assertIsNone(result['summary'])
+        self.assertIn('byte limit', result['skipped'])
@@ -0,0 +1,65 @@
+import ast
+import unittest
+
+from benchmarks.generator import generate_source
+from dev_achievements.processing import split
+from dev_achievements.processing.summary import summarize
+from dev_achievements.processing.visitor import build_table
+
+
+def _whole(data):
+    """ Summarizes the source parsed as a whole """
+    return summarize(build_table(ast.parse(data)))
+
+
+class TestSplit(unittest.TestCase):
+    """ Checks summarizing large sources in parallel chunks """
+
+    def test_boundaries(self):
+        data = (b'x = 1\n'
+                b'if x:\n    y = 2\nelse:\n    y = 3\n'
+                b'@decorator\ndef f():\n    pass\n'
+                b's = """\nnot = a statement\n"""\n'
+                b'try:\n    pass\nfinally:\n    pass\n')
+        starts = split.find_boundaries(data, 1)
+        lines = [data[s:].split(b'\n')[0] for s in starts]
+        self.assertEqual(lines, [b'x = 1', b'if x:', b'@decorator',
+                                 b's = """', b'not = a statement',
+                                 b'"""', b'try:'])
+
+    def test_summary_matches_whole(self):
+        data = generate_source(2000).encode()
+        summary, chunks = split.summarize_split(data, workers=1,
+                                                chunk_bytes=2 ** 12)
+        self.assertGreater(chunks, 1)
+        self.assertEqual(summary, _whole(data))
+
+    def test_join_across_chunks(self):
+        data = b'def f():\n    pass\n' + b'x = 1\n' * 100 + b'f()\n'
+        summary, chunks = split.summarize_split(data, workers=1,
+                                                chunk_bytes=64)
+        self.assertGreater(chunks, 1)
+        self.assertTrue(summary['patterns'][
+            'Call(func: Name(id in FunctionDef.name))'])
+
+    def test_fallback(self):
+        # cut inside a string, and a def only mentioned in a string
+        data = (b'x = 1\ns = """\n' + b'y = 2\n' * 50 + b'"""\n'
+                + b'z = """\ndef g(): pass\n"""\ng()\n')
+        summary, chunks = split.summarize_split(data, workers=1,
+                                                chunk_bytes=64)
+        self.assertEqual(chunks, 1)
+        self.assertEqual(summary, _whole(data))
+
+    def test_encoding(self):
+        data = (b'# -*- coding: latin-1 -*-\n'
+                + b'name = "caf\xe9"\n' * 50)
+        summary, chunks = split.summarize_split(data, workers=1,
+                                                chunk_bytes=64)
+        self.assertGreater(chunks, 1)
+        self.assertEqual(summary, _whole(data))
+
+    def test_syntax_error(self):
+        with self.assertRaises(SyntaxError):
+            split.summarize_split(b'x = 1\n' * 50 + b'def (:\n',
+                                  workers=1, chunk_bytes=64)
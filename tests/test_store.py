@@ -0,0 +1,82 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from dev_achievements.reporting.leaderboard import Leaderboard
+from dev_achievements.utilities import utils
+from dev_achievements.utilities.store import SQLiteStore
+
+
+class TestSQLiteStore(unittest.TestCase):
+    """ Checks the SQLite store of many profiles """
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, 'lab', 'store.db')
+        self.json_path = os.path.join(tmp.name, 'store.json')
+        patcher = mock.patch.object(utils, 'STORE_PATH', self.json_path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(utils.use_store, None)
+
+    def test_profiles_are_separate(self):
+        utils.use_profile('ada', self.path)
+        utils.save_progress(['AssignAchievement'], {'For': 2},
+                            {'AssignAchievement': 10.0})
+        utils.save_progress(['ListAchievement', 'AssignAchievement'],
+                            {'For': 3}, {'AssignAchievement': 5.0},
+                            stats={'ListAchievement': {'checks': 1}},
+                            quarantined={'ListAchievement': 'raised'})
+        store = utils.load_store()
+        self.assertEqual(store['unlocked'],
+                         ['AssignAchievement', 'ListAchievement'])
+        self.assertEqual(store['counters'], {'For': 5})
+        self.assertEqual(store['unlocked_at'], {'AssignAchievement': 5.0})
+        self.assertEqual(store['stats'], {'ListAchievement': {'checks': 1}})
+        self.assertEqual(store['quarantined'], {'ListAchievement': 'raised'})
+        utils.use_profile('grace', self.path)
+        self.assertEqual(utils.load_store(field='unlocked'), [])
+        self.assertFalse(os.path.exists(self.json_path))
+
+    def test_write_replaces(self):
+        utils.use_profile('ada', self.path)
+        utils.save_progress(['AssignAchievement'], {'For': 2})
+        utils.write_store({'unlocked': ['LoopsAchievement'], 'counters': {}})
+        store = utils.load_store()
+        self.assertEqual(store['unlocked'], ['LoopsAchievement'])
+        self.assertEqual(store['counters'], {})
+
+    def test_throttle_bounded(self):
+        utils.use_profile('ada', self.path)
+        with mock.patch.object(utils, 'MAX_THROTTLED_SCRIPTS', 2):
+            for i in range(4):
+                entry = {'state': [0, 0], 'quiet': 0, 'until': 0.0,
+                         'seen': float(i)}
+                utils.save_progress(throttle={f'/s{i}.py': entry})
+        self.assertEqual(sorted(utils.load_store()['throttle']),
+                         ['/s2.py', '/s3.py'])
+
+    def test_environment(self):
+        env = {utils.STORE_PROFILE_ENV: 'ada', utils.STORE_DB_ENV: self.path}
+        with mock.patch.dict(os.environ, env):
+            utils.use_store(None)
+            utils._resolved = False
+            self.assertEqual(utils.get_store().profile, 'ada')
+        utils.use_store(None)
+        utils._resolved = False
+        self.assertIsNone(utils.get_store())
+
+    def test_leaderboard(self):
+        for profile, unlocked in (('ada', ['AssignAchievement']),
+                                  ('grace', []),
+                                  ('linus', ['AssignAchievement',
+                                             'ListAchievement'])):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            store = SQLiteStore(self.path, profile)
+            store.save_progress(unlocked, {'For': 1})
+            store.close()
+        board = Leaderboard().load(self.path)
+        self.assertEqual(board.users, ['ada', 'grace', 'linus'])
+        self.assertEqual(board.report()['users'], 3)
@@ -0,0 +1,46 @@
+import ast
+import unittest
+
+from dev_achievements.achievements import *
+from dev_achievements.processing.summary import (merge_summaries, met,
+                                                 resolve, summarize)
+from dev_achievements.processing.visitor import build_table
+
+
+def _summary(src):
+    """ Summarizes the given source """
+    return summarize(build_table(ast.parse(src)))
+
+
+class TestSummary(unittest.TestCase):
+    """ Checks feature summaries and evaluating Achievements on them """
+
+    def test_met(self):
+        summary = _summary('def f(): pass\nf()\nx = [1]')
+        self.assertTrue(met(summary, AssignAchievement))
+        self.assertTrue(met(summary, FunctionAchievement))
+        self.assertFalse(met(summary, ClassAchievement))
+        self.assertFalse(met(summary, SampleAchievement))
+        self.assertFalse(met(summary, LoopsBronzeAchievement))
+        self.assertTrue(met(summary, LoopsBronzeAchievement, {'For': 10}))
+
+    def test_missing_facts(self):
+        summary = _summary('x = 1')
+        del summary['patterns'][FunctionAchievement.pattern]
+        self.assertIsNone(met(summary, FunctionAchievement))
+
+    def test_unlocked_custom_checks(self):
+        table = build_table(ast.parse('x = 1'))
+        summary = summarize(table, unlocked=['SampleAchievement'])
+        self.assertIsNone(met(summary, SampleAchievement))
+        self.assertFalse(met(summary, ModuleAchievement))
+
+    def test_merge_and_resolve(self):
+        merged = merge_summaries([_summary('x = 1'), _summary('if y: pass'),
+                                  _summary('for i in y: pass')])
+        self.assertEqual(merged['counts']['Pass'], 2)
+        unlocked = resolve(merged)
+        for name in ('AssignAchievement', 'ConditionalAchievement',
+                     'LoopsAchievement', 'PassAchievement'):
+            self.assertIn(name, unlocked)
+        self.assertEqual(resolve(merged, unlocked), [])
@@ -0,0 +1,118 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from dev_achievements import process_file
+from dev_achievements.achievements import *
+from dev_achievements.utilities import profiling, throttle, utils
+
+
+class TestThrottle(unittest.TestCase):
+    """ Checks throttling the analysis of unchanged scripts """
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        patcher = mock.patch.object(utils, 'STORE_PATH',
+                                    os.path.join(tmp.name, 'store.json'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.src_path = os.path.join(tmp.name, 'health_check.py')
+        with open(self.src_path, 'w') as file:
+            file.write('x = 1\n')
+
+    def test_backoff(self):
+        runs = throttle.THROTTLE_RUNS
+        self.assertEqual(throttle.backoff(runs - 1), 0.0)
+        self.assertEqual(throttle.backoff(runs), throttle.BACKOFF_SECONDS)
+        self.assertEqual(throttle.backoff(runs + 2),
+                         4 * throttle.BACKOFF_SECONDS)
+        self.assertEqual(throttle.backoff(10 ** 6),
+                         throttle.MAX_BACKOFF_SECONDS)
+
+    def test_quiet_runs(self):
+        store = {'throttle': {}}
+        now = 1000.0
+        for quiet in range(throttle.THROTTLE_RUNS + 1):
+            run = throttle.ScriptRun(self.src_path, store, now)
+            self.assertFalse(run.skip)
+            store['throttle'].update(run.update([]))
+            self.assertEqual(store['throttle'][run.path]['quiet'], quiet)
+        self.assertTrue(throttle.ScriptRun(self.src_path, store, now).skip)
+        later = now + throttle.BACKOFF_SECONDS
+        self.assertFalse(throttle.ScriptRun(self.src_path, store, later).skip)
+
+    def test_unlocks_reset(self):
+        run = throttle.ScriptRun(self.src_path, {}, 0.0)
+        entry = {'state': run.state, 'quiet': 5, 'until': 0.0, 'seen': 0.0}
+        store = {'throttle': {run.path: entry}}
+        run = throttle.ScriptRun(self.src_path, store, 1.0)
+        self.assertEqual(run.update(['LoopsAchievement'])[run.path]['quiet'], 0)
+
+    def test_file_change_resets(self):
+        store = {'throttle': {}}
+        for _ in range(throttle.THROTTLE_RUNS + 1):
+            store['throttle'].update(
+                throttle.ScriptRun(self.src_path, store, 0.0).update([]))
+        with open(self.src_path, 'a') as file:
+            file.write('y = 2\n')
+        run = throttle.ScriptRun(self.src_path, store, 0.0)
+        self.assertFalse(run.skip)
+        self.assertEqual(run.update([])[run.path]['quiet'], 0)
+
+    def test_process_file(self):
+        with profiling.profile() as profiler, \
+                contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(throttle.THROTTLE_RUNS + 3):
+                process_file(self.src_path)
+        self.assertEqual(profiler.counters['sources'],
+                         throttle.THROTTLE_RUNS + 1)
+        self.assertEqual(profiler.counters['throttled'], 2)
+        store = utils.load_store()
+        self.assertEqual(list(store['throttle']),
+                         [os.path.abspath(self.src_path)])
+
+    def test_disabled(self):
+        with mock.patch.dict(os.environ, {throttle.NO_THROTTLE_ENV: '1'}):
+            store = {'throttle': {}}
+            for _ in range(throttle.THROTTLE_RUNS + 2):
+                run = throttle.ScriptRun(self.src_path, store, 0.0)
+                self.assertFalse(run.skip)
+                store['throttle'].update(run.update([]))
+
+    def test_upgrade_resets(self):
+        store = {'throttle': {}}
+        for _ in range(throttle.THROTTLE_RUNS + 1):
+            store['throttle'].update(
+                throttle.ScriptRun(self.src_path, store, 0.0).update([]))
+        self.assertTrue(throttle.ScriptRun(self.src_path, store, 0.0).skip)
+        with mock.patch.object(throttle, 'VERSION', '99.0.0'):
+            run = throttle.ScriptRun(self.src_path, store, 0.0)
+            self.assertFalse(run.skip)
+            self.assertEqual(run.update([])[run.path]['quiet'], 0)
+
+    def test_module_change_resets(self):
+        module = os.path.join(os.path.dirname(self.src_path), 'helpers.py')
+        with open(module, 'w') as file:
+            file.write('f = print\n')
+        with open(self.src_path, 'w') as file:
+            file.write('import helpers\nhelpers.f()\n')
+        # only the Achievements following imports are left to unlock
+        project = (ModuleAchievement, CrossModuleCallAchievement)
+        utils.save_progress([a.__name__ for a in Achievement.subclasses()
+                             if a not in project])
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(throttle.THROTTLE_RUNS + 1):
+                process_file(self.src_path)
+        entry = utils.load_store()['throttle'][os.path.abspath(self.src_path)]
+        self.assertEqual(list(entry['modules']), [module])
+        self.assertTrue(throttle.ScriptRun(self.src_path).skip)
+        with open(module, 'a') as file:
+            file.write('\ndef f():\n    pass\n')
+        self.assertFalse(throttle.ScriptRun(self.src_path).skip)
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            process_file(self.src_path)
+        self.assertIn('Calling across modules!', out.getvalue())
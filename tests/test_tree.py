@@ -0,0 +1,188 @@
+import ast
+import os
+import tempfile
+import unittest
+import warnings
+from unittest import mock
+
+from dev_achievements.achievements import *
+from dev_achievements.processing import tree as tree_module
+from dev_achievements.processing.tree import AchievementTree
+from dev_achievements.utilities import utils
+from dev_achievements.utilities.constants import VERSION
+from dev_achievements.processing.visitor import build_table
+
+
+class CrashingAchievement(Achievement, abstract=True):
+    """ Achievement whose check always raises """
+    __slots__ = ()
+
+    def _check_condition(self, nodes):
+        """ Raises """
+        raise AttributeError('func has no id')
+
+
+class TestAchievementTree(unittest.TestCase):
+    """ Checks lazy construction of the Achievement tree frontier """
+
+    def _build_tree(self, unlocked, **store):
+        """ Builds a tree with the given store contents, without
+        touching the real Achievement store.
+
+        Args:
+            unlocked (list): names of unlocked Achievements
+            **store: other store fields
+
+        Returns:
+            AchievementTree: tree with patched store
+        """
+        store = dict(store, unlocked=list(unlocked), counters={'For': 9})
+        load = mock.patch('dev_achievements.processing.tree.load_store',
+                          return_value=store)
+        save = mock.patch('dev_achievements.processing.tree.save_progress')
+        with load:
+            tree = AchievementTree()
+        self.saved = save.start()
+        self.addCleanup(save.stop)
+        return tree
+
+    def test_nodes_are_lazy(self):
+        tree = self._build_tree([])
+        self.assertEqual(tree.nodes, {})
+
+    def test_queue_is_frontier(self):
+        tree = self._build_tree(['AssignAchievement'])
+        queued = {n.__class__ for n in tree.queue}
+        self.assertNotIn(AssignAchievement, queued)
+        self.assertIn(ConditionalAchievement, queued)
+        # dependencies not yet unlocked
+        self.assertNotIn(LoopsAchievement, queued)
+        self.assertEqual(set(tree.nodes), queued)
+
+    def test_unlock_extends_frontier(self):
+        tree = self._build_tree(['AssignAchievement'])
+        tree.queue
+        tree.nodes[ConditionalAchievement].unlocked = True
+        self.assertEqual(tree.pending, ['ConditionalAchievement'])
+        self.saved.assert_not_called()
+        queued = {n.__class__ for n in tree.queue}
+        self.assertNotIn(ConditionalAchievement, queued)
+        self.assertIn(LoopsAchievement, queued)
+
+    def test_metadata_is_class_level(self):
+        ach = LoopsAchievement()
+        self.assertFalse(hasattr(ach, '__dict__'))
+        self.assertEqual(ach.title, LoopsAchievement.title)
+        self.assertIsInstance(LoopsAchievement.dependencies, tuple)
+
+    def test_save_is_batched(self):
+        tree = self._build_tree([])
+        for node in tree.queue:
+            node.unlocked = True
+        tree.save({'For': 1})
+        self.saved.assert_called_once()
+        unlocked, counters, unlocked_at = self.saved.call_args[0]
+        self.assertIn('AssignAchievement', unlocked)
+        self.assertEqual(counters, {'For': 1})
+        self.assertEqual(set(unlocked_at), set(unlocked))
+        self.assertEqual(tree.pending, [])
+
+    def test_tiered_uses_stored_counters(self):
+        unlocked = [a.__name__ for a in LoopsAchievement.dependencies]
+        tree = self._build_tree(unlocked + ['LoopsAchievement'])
+        tree.queue
+        bronze = tree.nodes[LoopsBronzeAchievement]
+        self.assertFalse(bronze.check({}))
+        self.assertTrue(bronze.check({ast.While: [None]}))
+        self.assertNotIn(TieredAchievement, Achievement.subclasses())
+
+    def test_check_order_by_cost(self):
+        stats = {'AssignAchievement': {'checks': 10, 'hits': 0,
+                                       'seconds': 1.0, 'strikes': 0},
+                 'ListAchievement': {'checks': 10, 'hits': 9,
+                                     'seconds': 0.01, 'strikes': 0}}
+        tree = self._build_tree([], stats=stats)
+        order = [n.__class__ for n in tree.queue]
+        self.assertEqual(order[-1], AssignAchievement)
+        self.assertEqual(order[-2], ListAchievement)
+
+    def test_crashing_check_is_quarantined(self):
+        achievements = Achievement.subclasses() + [CrashingAchievement]
+        patch = mock.patch.object(Achievement, 'subclasses',
+                                  return_value=achievements)
+        patch.start()
+        self.addCleanup(patch.stop)
+        tree = self._build_tree([])
+        table = build_table(ast.parse('x = 1'))
+        for _ in range(3):
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter('always')
+                tree.check(table)
+            self.assertIn('func has no id', str(caught[-1].message))
+            tree.save()
+        self.assertIn('AssignAchievement', tree.unlocked)
+        self.assertIn('quarantined', str(caught[-1].message))
+        self.assertIn('CrashingAchievement', tree.quarantined)
+        self.assertNotIn(CrashingAchievement,
+                         [n.__class__ for n in tree.queue])
+        kwargs = self.saved.call_args[1]
+        self.assertIn('CrashingAchievement', kwargs['quarantined'])
+        self.assertEqual(tree.stats['CrashingAchievement']['strikes'], 3)
+
+    def test_over_budget_is_a_strike(self):
+        tree = self._build_tree([])
+        tree.budget = -1
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            tree.check(build_table(ast.parse('pass')))
+        self.assertIn('budget', str(caught[0].message))
+        self.assertTrue(all(s['strikes'] == 1
+                            for s in tree.run_stats.values()))
+
+    def test_large_input_not_quarantined(self):
+        tree = self._build_tree([])
+        # only the per node budget, so the allowance scales with input
+        tree.budget = 0.0
+        table = build_table(ast.parse("print('x')\n" * 20000))
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            for _ in range(tree_module.QUARANTINE_STRIKES + 1):
+                tree.check(table)
+                tree.save()
+        self.assertEqual(tree.quarantined, {})
+        self.assertGreater(tree.stats['HelloWorldAchievement']['checks'],
+                           tree_module.QUARANTINE_STRIKES)
+
+    def test_clean_check_clears_strikes(self):
+        stats = {'AssignAchievement': {'checks': 2, 'hits': 0,
+                                       'seconds': 0.1, 'strikes': 2}}
+        tree = self._build_tree([], stats=stats)
+        tree.check(build_table(ast.parse('x = 1')))
+        self.assertEqual(tree.run_stats['AssignAchievement']['strikes'], -2)
+
+    def test_upgrade_releases(self):
+        stats = {'AssignAchievement': {'checks': 3, 'hits': 0,
+                                       'seconds': 0.1, 'strikes': 3}}
+        quarantined = {'AssignAchievement': '[0.0.1] raised KeyError',
+                       'ConditionalAchievement': f'[{VERSION}] raised KeyError'}
+        tree = self._build_tree([], stats=stats, quarantined=quarantined)
+        self.assertEqual(list(tree.quarantined), ['ConditionalAchievement'])
+        queued = {n.__class__ for n in tree.queue}
+        self.assertIn(AssignAchievement, queued)
+        self.assertNotIn(ConditionalAchievement, queued)
+        self.assertEqual(tree.run_stats['AssignAchievement']['strikes'], -3)
+
+    def test_release(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        with mock.patch.object(utils, 'STORE_PATH',
+                               os.path.join(tmp.name, 'store.json')):
+            utils.save_progress(
+                stats={'AssignAchievement': {'strikes': 3}},
+                quarantined={'AssignAchievement': f'[{VERSION}] raised',
+                             'ListAchievement': f'[{VERSION}] raised'})
+            self.assertEqual(tree_module.release(['AssignAchievement']),
+                             ['AssignAchievement'])
+            store = utils.load_store()
+        self.assertEqual(list(store['quarantined']), ['ListAchievement'])
+        self.assertEqual(store['stats']['AssignAchievement']['strikes'], 0)
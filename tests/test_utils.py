@@ -0,0 +1,73 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from dev_achievements.utilities import utils
+
+
+# modules importing the package doesn't load, until their feature is used
+LAZY_MODULES = ['sqlite3', 'dev_achievements.reporting.sinks',
+                'dev_achievements.utilities.metrics',
+                'dev_achievements.processing.archive',
+                'dev_achievements.processing.summary', 'tempfile']
+
+
+def _loaded_on_import(modules):
+    """ Gives which of the modules importing the package loads, in a
+    fresh interpreter
+    """
+    code = ('import sys, dev_achievements\n'
+            + f'print(",".join(m for m in {modules!r} if m in sys.modules))')
+    env = dict(os.environ, DEV_ACHIEVEMENTS_DISABLE='1')
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    out = subprocess.run([sys.executable, '-c', code], cwd=root, env=env,
+                         capture_output=True, text=True, check=True).stdout
+    return list(filter(None, out.strip().split(',')))
+
+
+class TestStore(unittest.TestCase):
+    """ Checks reading and writing the Achievement store """
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        path = os.path.join(tmp.name, 'nested', 'store.json')
+        patcher = mock.patch.object(utils, 'STORE_PATH', path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_default_store(self):
+        self.assertEqual(utils.load_store(field='unlocked'), [])
+
+    def test_save_progress_merges(self):
+        utils.save_progress(['AssignAchievement'], {'For': 2})
+        utils.save_progress(['AssignAchievement', 'ListAchievement'],
+                            {'For': 3, 'While': 1})
+        store = utils.load_store()
+        self.assertEqual(store['unlocked'],
+                         ['AssignAchievement', 'ListAchievement'])
+        self.assertEqual(store['counters'], {'For': 5, 'While': 1})
+        # default store is left untouched
+        self.assertEqual(utils.DEFAULT_STORE['unlocked'], [])
+
+    def test_save_progress_stats(self):
+        stats = {'ListAchievement': {'checks': 1, 'seconds': 0.5}}
+        utils.save_progress(stats=stats)
+        utils.save_progress(stats=stats,
+                            quarantined={'ListAchievement': 'raised'})
+        store = utils.load_store()
+        self.assertEqual(store['stats']['ListAchievement'],
+                         {'checks': 2, 'seconds': 1.0})
+        self.assertEqual(store['quarantined'], {'ListAchievement': 'raised'})
+
+    def test_save_progress_single_write(self):
+        with mock.patch.object(utils, 'write_store') as write:
+            utils.save_progress(['AssignAchievement'], {'For': 1})
+            utils.save_progress([], {})
+        write.assert_called_once()
+
+    def test_lazy_imports(self):
+        self.assertEqual(_loaded_on_import(LAZY_MODULES), [])